@@ -0,0 +1,194 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Small benchmark harness shared by the benchmark scripts.
+
+            A benchmark is a name, a callable taking no arguments and optionally
+            the number of bytes one call processes. run() times each of them and
+            returns a results dict which can be saved as JSON, and compare()
+            checks a set of results against a stored baseline:
+
+              results = run([Benchmark("octet.encode", func, 1), ...])
+              save(results, "codec.json")
+              regressions = compare(results, load("baseline.json"), 0.10)
+
+            Timings are the best of several repeats, each repeat running enough
+            iterations to last at least 'min_time' seconds.
+
+            The scripts share their command line through option_parser() and
+            finish(), which saves and compares the results as asked:
+
+              parser = option_parser()
+              opts, args = parser.parse_args(argv)
+              return finish(run(benchmarks(), opts.filter, opts.min_time), opts)
+          """
+
+import re, sys, time
+from optparse import OptionParser
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+# --------------------
+# --------------------
+class Benchmark:
+  """
+  a named callable to be timed
+  """
+
+  # --------------------------------------------
+  def __init__(self, name, func, nbytes = None):
+    """
+    initializations...
+    """
+    self.name = name
+    self.func = func
+    self.nbytes = nbytes
+
+# ----------------------------------------------------------------------
+def measure(func, min_time = 0.1, repeat = 3, timer = time.time):
+  """
+  returns the best time in seconds taken by a single call of 'func'
+  """
+  n = 1
+  while True:
+    start = timer()
+    for i in xrange(n):
+      func()
+    elapsed = timer() - start
+    if elapsed >= min_time:
+      break
+    n *= 2
+  best = elapsed / n
+  for r in xrange(repeat - 1):
+    start = timer()
+    for i in xrange(n):
+      func()
+    best = min(best, (timer() - start) / n)
+  return best
+
+# -----------------------------------------------------------------------------
+def run(benchmarks, pattern = None, min_time = 0.1, repeat = 3, out = None):
+  """
+  times every benchmark whose name matches the regular expression 'pattern'
+  and returns {name: {'seconds': s, 'ops': n [, 'bytes': n, 'mbps': n]}}.
+  Progress is printed to 'out' if given
+  """
+  if pattern:
+    pattern = re.compile(pattern)
+  results = {}
+  for b in benchmarks:
+    if pattern and not pattern.search(b.name):
+      continue
+    seconds = measure(b.func, min_time, repeat)
+    result = {"seconds": seconds, "ops": 1.0 / max(seconds, 1e-12)}
+    if b.nbytes is not None:
+      result["bytes"] = b.nbytes
+      result["mbps"] = b.nbytes / max(seconds, 1e-12) / (1024 * 1024)
+    results[b.name] = result
+    if out:
+      out.write("%-40s %12.3f us %14.0f ops/s\n" % (b.name, seconds * 1e6,
+                                                     result["ops"]))
+  return results
+
+# --------------------------
+def save(results, path):
+  """
+  writes 'results' to the file 'path' as JSON
+  """
+  f = open(path, "w")
+  try:
+    json.dump(results, f, indent = 2, sort_keys = True)
+  finally:
+    f.close()
+
+# ----------------
+def load(path):
+  """
+  reads results previously written by save()
+  """
+  f = open(path)
+  try:
+    return json.load(f)
+  finally:
+    f.close()
+
+# ------------------------------------------------
+def compare(results, baseline, threshold = 0.10):
+  """
+  returns a list of (name, baseline seconds, seconds, ratio) for every
+  benchmark that is more than 'threshold' (a fraction) slower than in
+  'baseline'. Benchmarks missing from either side are ignored
+  """
+  regressions = []
+  names = [name for name in results.keys() if baseline.has_key(name)]
+  names.sort()
+  for name in names:
+    before = baseline[name]["seconds"]
+    now = results[name]["seconds"]
+    if before > 0 and now > before * (1 + threshold):
+      regressions.append((name, before, now, now / before))
+  return regressions
+
+# ----------------------------------------
+def report(regressions, out = sys.stdout):
+  """
+  prints the output of compare()
+  """
+  for name, before, now, ratio in regressions:
+    out.write("REGRESSION %-40s %10.3f us -> %10.3f us (%+.1f%%)\n" %
+              (name, before * 1e6, now * 1e6, (ratio - 1) * 100))
+
+# ---------------------------------------------------
+def option_parser(usage = "usage: %prog [options]"):
+  """
+  returns an OptionParser with the options shared by the benchmark scripts,
+  to which a script can add its own
+  """
+  parser = OptionParser(usage = usage)
+  parser.add_option("-o", "--output", help = "write results as JSON to this file")
+  parser.add_option("-b", "--baseline",
+                    help = "compare against the results in this file")
+  parser.add_option("-t", "--threshold", type = "float", default = 0.10,
+                    help = "allowed slowdown against the baseline, as a "
+                           "fraction [default: %default]")
+  parser.add_option("-f", "--filter",
+                    help = "only run benchmarks matching this regular expression")
+  parser.add_option("-m", "--min-time", type = "float", default = 0.1,
+                    help = "minimum seconds per timing run [default: %default]")
+  return parser
+
+# -----------------------------------------------
+def finish(results, opts, out = sys.stdout):
+  """
+  saves 'results' and compares them with the baseline as the options parsed
+  by an option_parser() ask. Returns the exit status of the script: 1 if
+  there were regressions, 0 otherwise
+  """
+  if opts.output:
+    save(results, opts.output)
+  if opts.baseline:
+    regressions = compare(results, load(opts.baseline), opts.threshold)
+    report(regressions, out)
+    if regressions:
+      return 1
+  return 0
@@ -0,0 +1,173 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Table driven packing and unpacking of AMQP bit fields.
+
+            Adjacent bit fields are packed into octets, first bit in the least
+            significant position, with the last octet padded with zeros. Rather
+            than shifting one bit at a time, whole runs of bits are handled with
+            one lookup per octet into the two 256 entry tables below.
+
+            BitsMixin adds encode_bits(seq)/decode_bits(n) to a Codec. The output
+            is identical to calling encode_bit/decode_bit once per bit, and the
+            two styles can be freely mixed on the same codec.
+          """
+
+from qpid.codec import Codec
+
+# octet -> tuple of the 8 bits it carries, least significant first
+UNPACK = [tuple([(byte >> i) & 1 != 0 for i in range(8)]) for byte in range(256)]
+
+# tuple of 8 bits, least significant first -> packed octet
+PACK = {}
+for byte in range(256):
+  PACK[UNPACK[byte]] = chr(byte)
+del byte
+
+PADDING = (False,) * 7
+
+# ----------------------
+def pack_bits(bits):
+  """
+  returns the string of octets carrying the sequence of bits 'bits'
+  """
+  bits = map(bool, bits)
+  if len(bits) % 8:
+    bits.extend(PADDING[:8 - len(bits) % 8])
+  return "".join([PACK[tuple(bits[i:i + 8])] for i in xrange(0, len(bits), 8)])
+
+# ------------------------------
+def unpack_bits(octets, n = None):
+  """
+  returns a list of the first 'n' bits carried by the string 'octets' (all of
+  them if 'n' is not given)
+  """
+  bits = []
+  for c in octets:
+    bits.extend(UNPACK[ord(c)])
+  if n is not None:
+    del bits[n:]
+  return bits
+
+# ---------------
+# ---------------
+class BitsMixin:
+  """
+  mixin for Codec subclasses adding batch bit encoding and decoding
+  """
+
+  # --------------------------
+  def encode_bits(self, seq):
+    """
+    queues a whole run of bits for encoding. Like encode_bit, the bits are
+    packed when the next non bit value is written or the codec is flushed
+    """
+    self.outgoing_bits.extend(map(bool, seq))
+
+  # ------------------------
+  def decode_bits(self, n):
+    """
+    decodes and returns a list of 'n' bits, consuming whatever is left of a
+    partially read octet first
+    """
+    bits = self.incoming_bits[:n]
+    del self.incoming_bits[:n]
+    need = n - len(bits)
+    if need > 0:
+      octets = self.read((need + 7) // 8)
+      rest = unpack_bits(octets)
+      bits.extend(rest[:need])
+      self.incoming_bits.extend(rest[need:])
+    return bits
+
+  # --------------------
+  def flushbits(self):
+    """
+    packs any queued bits using the lookup tables and writes them out
+    """
+    if self.outgoing_bits:
+      octets = pack_bits(self.outgoing_bits)
+      del self.outgoing_bits[:]
+      self.write(octets)
+
+# -------------------------------
+# -------------------------------
+class BitCodec(BitsMixin, Codec):
+  """
+  Codec with batch bit support
+  """
+  pass
+
+# cache of field layouts, keyed by the fields SpecContainer and its length
+# (errata only ever append to a container, see spec.apply_errata). It is
+# cleared when full, so that the containers of specs loaded over and over
+# are not kept alive by it
+LAYOUTS = {}
+LAYOUT_CACHE_SIZE = 1024
+
+# --------------------
+def layout(fields):
+  """
+  returns the fields of a method grouped into runs, i.e. a list of
+  (type, count) pairs where count is only ever greater than one for runs of
+  adjacent bit fields
+  """
+  key = (fields, len(fields))
+  try:
+    return LAYOUTS[key]
+  except KeyError:
+    pass
+  result = []
+  for f in fields:
+    if f.type == "bit" and result and result[-1][0] == "bit":
+      result[-1] = ("bit", result[-1][1] + 1)
+    else:
+      result.append((f.type, 1))
+  if len(LAYOUTS) >= LAYOUT_CACHE_SIZE:
+    LAYOUTS.clear()
+  LAYOUTS[key] = result
+  return result
+
+# ------------------------------------------
+def encode_fields(codec, fields, values):
+  """
+  encodes 'values' according to the types of 'fields' (e.g. method.fields),
+  handing each run of adjacent bit fields to the codec in one go
+  """
+  i = 0
+  for type, count in layout(fields):
+    if type == "bit":
+      codec.encode_bits(values[i:i + count])
+    else:
+      codec.encode(type, values[i])
+    i += count
+
+# ---------------------------------
+def decode_fields(codec, fields):
+  """
+  decodes and returns a list of values according to the types of 'fields'
+  """
+  values = []
+  for type, count in layout(fields):
+    if type == "bit":
+      values.extend(codec.decode_bits(count))
+    else:
+      values.append(codec.decode(type))
+  return values
@@ -0,0 +1,387 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Recording and replaying of the frames sent and received by a codec.
+
+            CaptureStream wraps the stream of a Codec and hands every complete
+            frame written or read through it to a CaptureWriter, which appends
+            it to a capture file as a record:
+
+              timestamp (double), channel (short), direction (octet),
+              frame size (long), frame
+
+            after the 8 byte magic at the start of the file. The offset of every
+            record is also appended to the sidecar index file (path + ".idx"),
+            as an unsigned longlong:
+
+              writer = CaptureWriter("session.cap")
+              codec = Codec(CaptureStream(spec, socket.makefile(), writer))
+
+            A Replayer maps a capture file and, using its index (rebuilt by
+            scanning the records if it is missing or behind), gives random
+            access to the records and re-emits the frames into any object with
+            a write method, e.g. a stream, a RingBuffer, or another codec's
+            stream, at the original speed, scaled, or as fast as possible:
+
+              Replayer("session.cap").replay(out, speed = 2.0, direction = OUT)
+
+            A CaptureWriter opened on an existing capture file brings its index
+            up to date the same way before appending to it.
+
+            framescan.decode_file (and decode_capture.py) decode the frames of
+            these files too, with a pool of processes.
+          """
+
+import mmap, os, threading, time
+from struct import pack, unpack_from, calcsize
+import frames
+
+MAGIC = "QPIDCAP1"
+
+RECORD = "!dHBL"
+RECORD_SIZE = calcsize(RECORD)
+
+INDEX = "!Q"
+INDEX_SIZE = calcsize(INDEX)
+
+# directions of the frames
+OUT, IN = 0, 1
+
+# ----------------------------
+def record_end(data, offset):
+  """
+  returns the offset just past the record at 'offset' in 'data'
+  """
+  return offset + RECORD_SIZE + unpack_from(RECORD, data, offset)[3]
+
+# ----------------------------
+def load_offsets(path, data):
+  """
+  returns the offsets of the complete records in 'data', the contents of
+  the capture file 'path', from its index file as far as it goes and by
+  scanning the records after that, along with how many of them came from
+  the index file
+  """
+  offsets = []
+  try:
+    f = open(path + ".idx", "rb")
+    try:
+      index = f.read()
+    finally:
+      f.close()
+    for i in xrange(0, len(index) - len(index) % INDEX_SIZE, INDEX_SIZE):
+      offsets.append(unpack_from(INDEX, index, i)[0])
+  except IOError:
+    pass
+  size = len(data)
+  def complete(offset):
+    return offset + RECORD_SIZE <= size and record_end(data, offset) <= size
+  # drop the entries of records that did not fully make it to the file
+  while offsets and not complete(offsets[-1]):
+    offsets.pop()
+  indexed = len(offsets)
+  if offsets:
+    offset = record_end(data, offsets[-1])
+  else:
+    offset = len(MAGIC)
+  while complete(offset):
+    offsets.append(offset)
+    offset = record_end(data, offset)
+  return offsets, indexed
+
+# ---------------------
+# ---------------------
+class CaptureWriter:
+  """
+  appends frame records to a capture file and its index
+  """
+
+  # ----------------------------------------------
+  def __init__(self, path, timer = time.time):
+    """
+    opens (or creates) the capture file 'path' for appending
+    """
+    self.path = path
+    self.timer = timer
+    self.lock = threading.Lock()
+    if os.path.exists(path) and os.path.getsize(path):
+      self.offset = self.resume()
+      self.file = open(path, "ab")
+      self.index = open(path + ".idx", "ab")
+    else:
+      self.file = open(path, "wb")
+      self.file.write(MAGIC)
+      self.index = open(path + ".idx", "wb")
+      self.offset = len(MAGIC)
+
+  # -------------------
+  def resume(self):
+    """
+    brings the index of the existing capture file up to date with its
+    records and cuts off a record that did not fully make it to the file,
+    so that the records appended follow on from the last complete one.
+    Returns the offset of the end of that record
+    """
+    f = open(self.path, "r+b")
+    try:
+      data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+      try:
+        if data[:len(MAGIC)] != MAGIC:
+          raise ValueError("not a capture file: %s" % self.path)
+        offsets, indexed = load_offsets(self.path, data)
+        if offsets:
+          end = record_end(data, offsets[-1])
+        else:
+          end = len(MAGIC)
+        size = len(data)
+      finally:
+        data.close()
+      if end < size:
+        f.truncate(end)
+    finally:
+      f.close()
+    index = self.path + ".idx"
+    if os.path.exists(index) and \
+       os.path.getsize(index) == indexed * INDEX_SIZE:
+      mode, offsets = "ab", offsets[indexed:]
+    else:
+      mode = "wb"
+    f = open(index, mode)
+    try:
+      f.write("".join([pack(INDEX, offset) for offset in offsets]))
+    finally:
+      f.close()
+    return end
+
+  # ---------------------------------------------------------------------
+  def record(self, frame, direction, channel = None, timestamp = None):
+    """
+    appends the frame 'frame' (a string) sent or received in 'direction'.
+    The channel defaults to that of the frame header and the timestamp to
+    the current time
+    """
+    if channel is None:
+      channel = unpack_from("!H", frame, 1)[0]
+    if timestamp is None:
+      timestamp = self.timer()
+    self.lock.acquire()
+    try:
+      self.file.write(pack(RECORD, timestamp, channel, direction, len(frame)))
+      self.file.write(frame)
+      self.index.write(pack(INDEX, self.offset))
+      self.offset += RECORD_SIZE + len(frame)
+    finally:
+      self.lock.release()
+
+  # ----------------
+  def flush(self):
+    """
+    flushes the capture and index files, the index last so that it never
+    points past the records
+    """
+    self.lock.acquire()
+    try:
+      self.file.flush()
+      self.index.flush()
+    finally:
+      self.lock.release()
+
+  # ----------------
+  def close(self):
+    """
+    closes the capture and index files
+    """
+    self.flush()
+    self.file.close()
+    self.index.close()
+
+# --------------------
+# --------------------
+class CaptureStream:
+  """
+  stream wrapper recording the frames passing through it
+  """
+
+  # ------------------------------------------------------
+  def __init__(self, spec, stream, writer):
+    """
+    initializations. Frames written to 'stream' are recorded as OUT, frames
+    read from it as IN, and are told apart by the frame end of 'spec'
+    """
+    self.stream = stream
+    self.writer = writer
+    self.end = frames.frame_constants(spec)[1]
+    self.outgoing = ""
+    self.incoming = ""
+    # bytes dropped because they did not parse as frames
+    self.dropped = 0
+
+  # ------------------------------------------
+  def capture(self, buffer, direction):
+    """
+    records the complete frames at the start of 'buffer' and returns what
+    is left of it
+    """
+    offset = 0
+    size = len(buffer)
+    while size - offset >= frames.HEADER_SIZE:
+      last = offset + frames.HEADER_SIZE + \
+             unpack_from("!L", buffer, offset + 3)[0]
+      if last >= size:
+        break
+      if ord(buffer[last]) != self.end:
+        # lost track of the frames, start over with the next data
+        self.dropped += size - offset
+        return ""
+      self.writer.record(buffer[offset:last + 1], direction)
+      offset = last + 1
+    return buffer[offset:]
+
+  # ------------------
+  def write(self, s):
+    """
+    writes 's' to the stream, recording the frames it completes
+    """
+    self.stream.write(s)
+    self.outgoing = self.capture(self.outgoing + s, OUT)
+
+  # -----------------
+  def read(self, n):
+    """
+    reads from the stream, recording the frames read
+    """
+    s = self.stream.read(n)
+    self.incoming = self.capture(self.incoming + s, IN)
+    return s
+
+  # ----------------
+  def flush(self):
+    """
+    flushes the stream and the capture
+    """
+    self.stream.flush()
+    self.writer.flush()
+
+  # ----------------
+  def close(self):
+    """
+    closes the stream, the writer may be shared and is left open
+    """
+    self.stream.close()
+
+  # ---------------------------
+  def __getattr__(self, name):
+    """
+    anything else is the stream's
+    """
+    return getattr(self.stream, name)
+
+# ----------------
+# ----------------
+class Replayer:
+  """
+  random access to, and replay of, the records of a capture file
+  """
+
+  # ------------------------
+  def __init__(self, path):
+    """
+    maps the capture file 'path' and loads or rebuilds its index
+    """
+    self.path = path
+    f = open(path, "rb")
+    try:
+      self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    finally:
+      f.close()
+    if self.map[:len(MAGIC)] != MAGIC:
+      self.map.close()
+      raise ValueError("not a capture file: %s" % path)
+    self.offsets = self.load_index()
+
+  # ---------------------
+  def load_index(self):
+    """
+    returns the list of record offsets, from the index file as far as it
+    goes and by scanning the records after that
+    """
+    return load_offsets(self.path, self.map)[0]
+
+  # -----------------
+  def __len__(self):
+    """
+    returns the number of records
+    """
+    return len(self.offsets)
+
+  # ------------------------
+  def __getitem__(self, i):
+    """
+    returns the record 'i' as (timestamp, channel, direction, frame)
+    """
+    offset = self.offsets[i]
+    timestamp, channel, direction, length = unpack_from(RECORD, self.map, offset)
+    start = offset + RECORD_SIZE
+    return timestamp, channel, direction, self.map[start:start + length]
+
+  # ------------------
+  def __iter__(self):
+    """
+    iterates over the records
+    """
+    for i in xrange(len(self.offsets)):
+      yield self[i]
+
+  # -------------------------------------------------------------------------
+  def replay(self, out, speed = 1.0, direction = None, start = 0, stop = None,
+             sleep = time.sleep, timer = time.time):
+    """
+    writes the frames of records 'start' to 'stop' in 'direction' (all of
+    them if None) to 'out', spaced as they were captured divided by 'speed',
+    or as fast as possible if 'speed' is None. Returns the number of frames
+    written
+    """
+    if stop is None:
+      stop = len(self.offsets)
+    first = None
+    count = 0
+    for i in xrange(start, stop):
+      timestamp, channel, d, frame = self[i]
+      if direction is not None and d != direction:
+        continue
+      if speed:
+        if first is None:
+          first = timestamp
+          began = timer()
+        delay = began + (timestamp - first) / speed - timer()
+        if delay > 0:
+          sleep(delay)
+      out.write(frame)
+      count += 1
+    if hasattr(out, "flush"):
+      out.flush()
+    return count
+
+  # ----------------
+  def close(self):
+    """
+    unmaps the capture file
+    """
+    self.map.close()
@@ -18,10 +18,22 @@
 # under the License.
 #
 
-import unittest
+import unittest, os, shutil, tempfile, threading, errno
 from qpid.codec import Codec
 from cStringIO import StringIO
 from qpid.reference import ReferenceId
+from qpid import bits
+from qpid.bits import BitCodec
+from qpid.codecstats import instrument, uninstrument
+from qpid.ringbuffer import RingBuffer, Transport
+from qpid.capture import CaptureWriter, CaptureStream, Replayer, IN, OUT
+from qpid.compression import CompressingCodec, MARKER
+from qpid.fieldtable import TypedTableCodec, register, TYPES, PYTHON
+from qpid import spec as qpid_spec
+from qpid import frames, framescan
+from qpid.testlib import SpecTestBase, SPEC_XML
+from decimal import Decimal
+from datetime import datetime
 
 __doc__ = """
     
@@ -52,7 +64,7 @@ __doc__ = """
 
 """
 
-        
+
 # --------------------------------------
 # --------------------------------------
 class BaseDataTypes(unittest.TestCase):
@@ -329,6 +341,120 @@ class BitTestCase(BaseDataTypes):
         """
         self.failUnlessEqual(self.readFunc('decode_bit', '\x00'), 0, 'decode bit 0 FAILED...') 
             
+# -----------------------------------
+# -----------------------------------
+class BitsTestCase(BaseDataTypes): 
+
+    """
+    Handles batch bit encoding/decoding (qpid/bits.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        uses a codec with batch bit support
+        """
+        self.codec = BitCodec(StringIO())
+
+    # -------------------------------
+    def encodeSingly(self, *bits):
+        """
+        helper function - encodes 'bits' one at a time with a plain codec
+        """
+        codec = Codec(StringIO())
+        for bit in bits:
+            codec.encode_bit(bit)
+        codec.flush()
+        return codec.stream.getvalue()
+
+    # -------------------------
+    def test_bits_ten(self):
+        """
+        sends in 1110100111 as one run [same result as BitTestCase.test_bit3]
+        """
+        self.codec.encode_bits((1,1,1,0,0,1,0,1,1,1))
+        self.codec.flush()
+        self.failUnlessEqual(self.codec.stream.getvalue(), '\xa7\x03', 'batch bit encoding FAILED...')
+
+    # ----------------------------------------
+    def test_bits_match_single_encoding(self):
+        """
+        runs of every length up to 3 octets must match bit by bit encoding
+        """
+        for n in range(25):
+            bits = [(i * 7) % 3 == 0 for i in range(n)]
+            codec = BitCodec(StringIO())
+            codec.encode_bits(bits)
+            codec.flush()
+            self.failUnlessEqual(codec.stream.getvalue(), self.encodeSingly(*bits), '%d bit run encoding FAILED...' % n)
+
+    # -----------------------------------
+    def test_bits_mixed_with_single(self):
+        """
+        encode_bit and encode_bits calls share the same octets
+        """
+        self.codec.encode_bit(1)
+        self.codec.encode_bits((1, 1))
+        self.codec.encode_bit(0)
+        self.codec.encode_bits((0, 1, 0, 1, 1, 1))
+        self.codec.flush()
+        self.failUnlessEqual(self.codec.stream.getvalue(), '\xa7\x03', 'mixed bit encoding FAILED...')
+
+    # ----------------------------------
+    def test_bits_flushed_by_octet(self):
+        """
+        a non bit value terminates the run
+        """
+        self.codec.encode_bits((1, 1))
+        self.codec.encode_octet(7)
+        self.codec.encode_bits((0, 1))
+        self.codec.flush()
+        self.failUnlessEqual(self.codec.stream.getvalue(), '\x03\x07\x02', 'bit run termination FAILED...')
+
+    # ---------------------------
+    def test_bits_decode(self):
+        """
+        decode 10 bits out of two octets
+        """
+        self.failUnlessEqual(self.readFunc('decode_bits', '\xa7\x03', 10), [True,True,True,False,False,True,False,True,True,True], 'batch bit decoding FAILED...')
+
+    # ---------------------------------
+    def test_bits_decode_mixed(self):
+        """
+        decode_bit and decode_bits calls consume the same octets
+        """
+        self.codec.stream = StringIO('\xa7\x03')
+        self.failUnlessEqual(self.codec.decode_bit(), True, 'mixed bit decoding FAILED...')
+        self.failUnlessEqual(self.codec.decode_bits(8), [True,True,False,False,True,False,True,True], 'mixed bit decoding FAILED...')
+        self.failUnlessEqual(self.codec.decode_bit(), True, 'mixed bit decoding FAILED...')
+
+    # --------------------------------
+    def test_layout_cache(self):
+        """
+        layouts follow fields appended to a container, and the cache of them stays bounded
+        """
+        size = bits.LAYOUT_CACHE_SIZE
+        bits.LAYOUT_CACHE_SIZE = 4
+        try:
+            for i in range(10):
+                fields = qpid_spec.SpecContainer()
+                for j, type in enumerate(['bit', 'bit', 'short', 'bit']):
+                    fields.add(qpid_spec.Field('f%d' % j, j, type, []))
+                self.failUnlessEqual(bits.layout(fields), [('bit', 2), ('short', 1), ('bit', 1)], 'layout FAILED...')
+                self.failUnless(len(bits.LAYOUTS) <= 4, 'layout cache bound FAILED...')
+            fields.add(qpid_spec.Field('f4', 4, 'bit', []))
+            self.failUnlessEqual(bits.layout(fields), [('bit', 2), ('short', 1), ('bit', 2)], 'appended field FAILED...')
+        finally:
+            bits.LAYOUT_CACHE_SIZE = size
+
+    # ----------------------------------------
+    def readFunc(self, functionName, *args):
+        """
+        helper function - like BaseDataTypes.readFunc but passes on the remaining arguments
+        """
+        self.codec.stream = StringIO(args[0])
+        return getattr(self.codec, functionName)(*args[1:])
+            
 # -----------------------------------
 # -----------------------------------
 class StringTestCase(BaseDataTypes): 
@@ -497,6 +623,736 @@ class ContentTestCase(BaseDataTypes):
         """
         self.failUnlessEqual(self.readFunc('decode_content', '\x01\x00\x00\x00\x07dummyId').id, 'dummyId', 'reference content decode FAILED...') 
     
+# ------------------------------------------
+# ------------------------------------------
+class InstrumentationTestCase(BaseDataTypes):
+
+    """
+    Handles per type codec instrumentation (qpid/codecstats.py)
+    """
+
+    # -------------------------------
+    def test_encode_counts(self):
+        """
+        calls and bytes are recorded per type, nested calls are not counted twice
+        """
+        stats = instrument(self.codec)
+        self.codec.encode_octet(1)
+        self.codec.encode_shortstr('hello')
+        self.codec.encode('shortstr', 'world')
+        snapshot = stats.snapshot()
+        self.failUnlessEqual(snapshot['octet']['encode']['calls'], 1, 'octet call count FAILED...')
+        self.failUnlessEqual(snapshot['octet']['encode']['bytes'], 1, 'octet byte count FAILED...')
+        self.failUnlessEqual(snapshot['shortstr']['encode']['calls'], 2, 'shortstr call count FAILED...')
+        self.failUnlessEqual(snapshot['shortstr']['encode']['bytes'], 12, 'shortstr byte count FAILED...')
+
+    # -------------------------------
+    def test_decode_counts(self):
+        """
+        decoding is recorded separately from encoding
+        """
+        self.codec.stream = StringIO('\x00\x00\x00\x0bhello world')
+        stats = instrument(self.codec)
+        self.failUnlessEqual(self.codec.decode_longstr(), 'hello world', 'instrumented decode FAILED...')
+        self.failUnlessEqual(stats.snapshot(), {'longstr': {'decode': {'calls': 1, 'bytes': 15, 'time': stats.snapshot()['longstr']['decode']['time']}}}, 'decode snapshot FAILED...')
+
+    # -------------------------------
+    def test_uninstrument(self):
+        """
+        once removed, the plain class methods are used again
+        """
+        stats = instrument(self.codec)
+        self.failUnless(uninstrument(self.codec) is stats, 'uninstrument FAILED...')
+        self.codec.encode_long(5)
+        self.failUnlessEqual(stats.snapshot(), {}, 'uninstrumented codec still recording...')
+        self.failUnlessEqual(self.codec.encode_long.im_func, Codec.encode_long.im_func, 'class method not restored...')
+
+# ---------------------------------------
+# ---------------------------------------
+class RingBufferTestCase(BaseDataTypes):
+
+    """
+    Handles a shared memory ring (qpid/ringbuffer.py) used as the codec stream
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        a small ring, so that values wrap around its end
+        """
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'ring')
+        self.codec = Codec(RingBuffer(self.path, 16, create=True, timeout=10))
+
+    # ------------------
+    def tearDown(self):
+        """
+        closes and removes the ring
+        """
+        BaseDataTypes.tearDown(self)
+        shutil.rmtree(self.dir)
+
+    # ---------------------------
+    def test_wrap_around(self):
+        """
+        values written across the end of the ring read back intact
+        """
+        for i in range(10):
+            self.codec.encode_shortstr('value %d' % i)
+            self.codec.encode_long(i)
+            self.codec.flush()
+            self.failUnlessEqual(self.codec.decode_shortstr(), 'value %d' % i, 'shortstr through ring FAILED...')
+            self.failUnlessEqual(self.codec.decode_long(), i, 'long through ring FAILED...')
+
+    # -------------------------------
+    def test_other_process(self):
+        """
+        a writer in another process, filling the ring many times over, is read in order up to EOF
+        """
+        pid = os.fork()
+        if pid == 0:
+            try:
+                codec = Codec(RingBuffer(self.path, timeout=10))
+                for i in range(1000):
+                    codec.encode_long(i)
+                    codec.encode_shortstr('x' * (i % 20))
+                codec.flush()
+                codec.stream.close()
+            finally:
+                os._exit(0)
+        try:
+            for i in range(1000):
+                self.failUnlessEqual(self.codec.decode_long(), i, 'long from other process FAILED...')
+                self.failUnlessEqual(self.codec.decode_shortstr(), 'x' * (i % 20), 'shortstr from other process FAILED...')
+            self.failUnlessEqual(self.codec.stream.read(1), '', 'EOF after writer closed FAILED...')
+        finally:
+            os.waitpid(pid, 0)
+
+    # -------------------------------
+    def test_reader_closed(self):
+        """
+        a writer blocked on a full ring fails with EPIPE once the reader closes, and so do later writes
+        """
+        reader = RingBuffer(self.path)
+        timer = threading.Timer(0.2, reader.close)
+        timer.start()
+        try:
+            self.codec.stream.write('x' * 32)
+            self.fail('write to a closed ring did not fail...')
+        except IOError, e:
+            self.failUnlessEqual(e.errno, errno.EPIPE, 'blocked writer error FAILED...')
+        timer.join()
+        self.failUnlessRaises(IOError, self.codec.stream.write, 'x')
+
+# -----------------------------------------
+# -----------------------------------------
+class TransportTestCase(SpecTestBase):
+
+    """
+    Handles method frames carried over a pair of rings (qpid/ringbuffer.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        the two ends of a transport, in this process
+        """
+        SpecTestBase.setUp(self)
+        self.spec = qpid_spec.load(self.specfile)
+        a_b, b_a = os.path.join(self.dir, 'a-b'), os.path.join(self.dir, 'b-a')
+        self.a = Transport(self.spec, RingBuffer(a_b, 4096, True, 10), RingBuffer(b_a, 4096, True, 10))
+        self.b = Transport(self.spec, RingBuffer(b_a, timeout=10), RingBuffer(a_b, timeout=10), 1)
+
+    # ------------------
+    def tearDown(self):
+        """
+        closes the rings
+        """
+        for ring in (self.a.outgoing, self.a.incoming, self.b.outgoing, self.b.incoming):
+            ring.close()
+        SpecTestBase.tearDown(self)
+
+    # -----------------------------
+    def test_invoke_receive(self):
+        """
+        invoked methods are received as frames, in order, in both directions
+        """
+        ack = self.spec.parse_method('basic.ack')
+        declare = self.spec.parse_method('queue.declare')
+        self.a.invoke(ack, (5, True))
+        self.a.invoke(declare, declare.arguments(queue='q', arguments={'x': 1}))
+        self.b.invoke(ack, (6, False))
+        frame = self.b.receive()
+        self.failUnlessEqual((frame.method, frame.channel, frame.values()), (ack, 0, (5, True)), 'first frame FAILED...')
+        self.failUnlessEqual(self.b.receive()['arguments'], {'x': 1}, 'second frame FAILED...')
+        self.failUnlessEqual(self.a.receive().values(), (6, False), 'reverse frame FAILED...')
+
+    # -----------------------------
+    def test_content(self):
+        """
+        methods with content are refused before anything is sent, and go through without it
+        """
+        publish = self.spec.parse_method('basic.publish')
+        self.failUnlessRaises(ValueError, self.a.invoke, publish, publish.arguments(exchange='x'), 'body')
+        self.a.invoke(publish, publish.arguments(exchange='x'))
+        frame = self.b.receive()
+        self.failUnlessEqual((frame.method, frame['exchange']), (publish, 'x'), 'publish without content FAILED...')
+
+    # -----------------------------
+    def test_closed(self):
+        """
+        receive returns None once the other side has closed, and raises on a truncated frame
+        """
+        self.a.outgoing.close()
+        self.failUnlessEqual(self.b.receive(), None, 'receive after close FAILED...')
+        self.b.outgoing.write(frames.encode_method(self.spec.parse_method('basic.ack'), (1, False))[:-3])
+        self.b.outgoing.close()
+        try:
+            self.a.receive()
+            self.fail('truncated frame not detected...')
+        except IOError, e:
+            self.failUnlessEqual(e.errno, errno.EPIPE, 'truncated frame error FAILED...')
+
+# ------------------------------------
+# ------------------------------------
+class CaptureTestCase(BaseDataTypes):
+
+    """
+    Handles recording and replaying frames through a capture file (qpid/capture.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        a codec whose stream is captured
+        """
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'session.cap')
+        self.times = [100.0]
+        self.writer = CaptureWriter(self.path, timer=lambda: self.times[0])
+        self.end = 206
+        self.codec = Codec(CaptureStream(self.loadSpec(SPEC_XML), StringIO(), self.writer))
+
+    # ----------------------------
+    def loadSpec(self, xml):
+        """
+        helper function - loads the spec 'xml'
+        """
+        specfile = os.path.join(self.dir, 'amqp.xml')
+        f = open(specfile, 'w')
+        f.write(xml)
+        f.close()
+        return qpid_spec.load(specfile)
+
+    # ------------------
+    def tearDown(self):
+        """
+        closes and removes the capture
+        """
+        self.writer.close()
+        shutil.rmtree(self.dir)
+
+    # ----------------------------------------------
+    def writeFrame(self, channel, payload):
+        """
+        helper function - encodes a frame field by field, as a codec user would
+        """
+        self.codec.encode_octet(1)
+        self.codec.encode_short(channel)
+        self.codec.encode_long(len(payload))
+        self.codec.write(payload)
+        self.codec.encode_octet(self.end)
+        self.codec.flush()
+
+    # -------------------------------
+    def test_record_and_read(self):
+        """
+        frames written and read are recorded with their channel, direction and time
+        """
+        self.writeFrame(1, 'hello')
+        self.times[0] = 101.5
+        self.writeFrame(2, 'world!')
+        stream = self.codec.stream.stream
+        self.codec.stream.stream = StringIO(stream.getvalue())
+        self.failUnlessEqual(self.codec.read(20), stream.getvalue()[:20], 'captured read FAILED...')
+        self.codec.stream.flush()
+        replayer = Replayer(self.path)
+        self.failUnlessEqual(len(replayer), 3, 'record count FAILED...')
+        self.failUnlessEqual(replayer[0], (100.0, 1, OUT, stream.getvalue()[:13]), 'first record FAILED...')
+        self.failUnlessEqual(replayer[1][:3], (101.5, 2, OUT), 'second record FAILED...')
+        self.failUnlessEqual(replayer[2][1:], (1, IN, stream.getvalue()[:13]), 'incoming record FAILED...')
+        replayer.close()
+
+    # -------------------------------
+    def test_spec_frame_end(self):
+        """
+        frames are told apart by the frame end of the spec rather than the default one
+        """
+        spec = self.loadSpec(SPEC_XML.replace('name="frame end" value="206"', 'name="frame end" value="165"'))
+        self.codec = Codec(CaptureStream(spec, StringIO(), self.writer))
+        self.end = 165
+        self.writeFrame(1, 'hello')
+        self.failUnlessEqual(self.codec.stream.dropped, 0, 'spec frame end FAILED...')
+        self.end = 206
+        self.writeFrame(2, 'world!')
+        self.failUnlessEqual(self.codec.stream.dropped, 14, 'default frame end FAILED...')
+        self.codec.stream.flush()
+        replayer = Replayer(self.path)
+        self.failUnlessEqual([record[1] for record in replayer], [1], 'recorded frames FAILED...')
+        replayer.close()
+
+    # -------------------------------
+    def test_replay(self):
+        """
+        replay re-emits the frames spaced as captured, scaled by the speed, and rebuilds a missing index
+        """
+        for i in range(5):
+            self.times[0] = 100.0 + i
+            self.writeFrame(i, 'x' * i)
+        self.writer.close()
+        os.unlink(self.path + '.idx')
+        self.writer = CaptureWriter(self.path)
+        replayer = Replayer(self.path)
+        out = StringIO()
+        slept = []
+        self.failUnlessEqual(replayer.replay(out, speed=2.0, sleep=slept.append, timer=lambda: 0.0), 5, 'replay count FAILED...')
+        self.failUnlessEqual(out.getvalue(), self.codec.stream.stream.getvalue(), 'replayed bytes FAILED...')
+        self.failUnlessEqual(slept, [0.5, 1.0, 1.5, 2.0], 'replay pacing FAILED...')
+        self.failUnlessEqual(replayer.replay(StringIO(), speed=None, direction=IN), 0, 'direction filter FAILED...')
+        replayer.close()
+
+    # -------------------------------
+    def test_resume(self):
+        """
+        a writer reopened on a capture whose index is behind and whose last record is partial extends the index first
+        """
+        for i in range(3):
+            self.writeFrame(i, 'x' * i)
+        self.writer.close()
+        index = open(self.path + '.idx', 'r+b')
+        index.truncate(10)
+        index.close()
+        f = open(self.path, 'ab')
+        f.write('\x00' * 5)
+        f.close()
+        self.writer = CaptureWriter(self.path)
+        self.codec.stream.writer = self.writer
+        for i in range(3, 5):
+            self.writeFrame(i, 'x' * i)
+        self.writer.flush()
+        self.failUnlessEqual(os.path.getsize(self.path + '.idx'), 40, 'index size FAILED...')
+        replayer = Replayer(self.path)
+        self.failUnlessEqual([record[1] for record in replayer], range(5), 'resumed records FAILED...')
+        self.failUnlessEqual(''.join([record[3] for record in replayer]), self.codec.stream.stream.getvalue(), 'resumed frames FAILED...')
+        replayer.close()
+
+# ----------------------------------------
+# ----------------------------------------
+class CompressionTestCase(BaseDataTypes):
+
+    """
+    Handles compressed longstr and content values (qpid/compression.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        a compressing codec
+        """
+        self.codec = CompressingCodec(StringIO())
+
+    # ------------------------------
+    def encoded(self, value):
+        """
+        helper function - returns the wire bytes of 'value' encoded as a longstr
+        """
+        self.codec.stream = StringIO()
+        self.codec.encode_longstr(value)
+        return self.codec.stream.getvalue()
+
+    # ------------------------------
+    def readBack(self, data):
+        """
+        helper function - decodes the longstr 'data' with a compressing codec
+        """
+        return CompressingCodec(StringIO(data)).decode_longstr()
+
+    # ------------------------------
+    def test_compressed(self):
+        """
+        values above the threshold are compressed and decompressed transparently
+        """
+        value = 'abcdefgh' * 4096
+        for compression in ('zlib', 'bz2'):
+            self.codec.compression = compression
+            data = self.encoded(value)
+            self.failUnless(len(data) < len(value) / 10, '%s compression FAILED...' % compression)
+            self.failUnlessEqual(self.readBack(data), value, '%s round trip FAILED...' % compression)
+
+    # ------------------------------
+    def test_uncompressed(self):
+        """
+        short and incompressible values are sent as plain longstrs
+        """
+        for v in ('short', os.urandom(4096)):
+            plain = Codec(StringIO())
+            plain.encode_longstr(v)
+            self.failUnlessEqual(self.encoded(v), plain.stream.getvalue(), 'plain encoding FAILED...')
+            self.failUnlessEqual(self.readBack(self.encoded(v)), v, 'plain round trip FAILED...')
+
+    # ------------------------------
+    def test_marker_escape(self):
+        """
+        plain values starting with the marker read back unchanged
+        """
+        value = MARKER + 'not compressed'
+        self.failUnlessEqual(self.readBack(self.encoded(value)), value, 'marker escape FAILED...')
+
+    # ------------------------------
+    def test_content(self):
+        """
+        inline content is compressed too
+        """
+        value = 'content ' * 1024
+        self.codec.stream = StringIO()
+        self.codec.encode_content(value)
+        data = self.codec.stream.getvalue()
+        self.failUnless(len(data) < len(value), 'content compression FAILED...')
+        self.failUnlessEqual(CompressingCodec(StringIO(data)).decode_content(), value, 'content round trip FAILED...')
+
+    # ------------------------------
+    def test_bounded(self):
+        """
+        values inflating past their declared length or the codec limit fail early
+        """
+        for compression in ('zlib', 'bz2'):
+            self.codec.compression = compression
+            data = self.encoded('a' * (1 << 20))
+            forged = data.replace('\x00\x10\x00\x00', '\x00\x00\x01\x00', 1)
+            self.failIfEqual(forged, data, 'forged length FAILED...')
+            self.failUnlessRaises(ValueError, self.readBack, forged)
+            codec = CompressingCodec(StringIO(data))
+            codec.limit = 1000
+            self.failUnlessRaises(ValueError, codec.decode_longstr)
+
+    # ------------------------------
+    def test_unknown(self):
+        """
+        an unknown compression raises ValueError
+        """
+        self.codec.compression = 'zlib'
+        data = self.encoded('x' * 4096).replace('zlib', 'lzma')
+        self.failUnlessRaises(ValueError, self.readBack, data)
+
+# ---------------------------------------
+# ---------------------------------------
+class TypedTableTestCase(BaseDataTypes):
+
+    """
+    Handles field tables of typed values (qpid/fieldtable.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        a typed table codec
+        """
+        self.codec = TypedTableCodec(StringIO())
+
+    # ------------------------------
+    def roundTrip(self, table):
+        """
+        helper function - encodes 'table' and decodes it back
+        """
+        return TypedTableCodec(StringIO(self.callFunc('encode_table', table))).decode_table()
+
+    # ------------------------------
+    def test_legacy_encoding(self):
+        """
+        strings and small non negative integers encode as with the plain codec
+        """
+        table = {'$key1': 'value1', 'count': 5}
+        plain = Codec(StringIO())
+        plain.encode_table(table)
+        self.failUnlessEqual(self.callFunc('encode_table', table), plain.stream.getvalue(), 'legacy encoding FAILED...')
+
+    # ------------------------------
+    def test_typed_values(self):
+        """
+        booleans, integers of each width, floats, decimals, timestamps and void round trip
+        """
+        table = {'flag': True, 'neg': -5, 'big': -2**40, 'huge': 2**63 + 1, 'price': 1.5,
+                 'amount': Decimal('3.14'), 'at': datetime(2007, 5, 19, 12, 0, 0), 'none': None}
+        self.failUnlessEqual(self.roundTrip(table), table, 'typed values FAILED...')
+
+    # ------------------------------
+    def test_nested(self):
+        """
+        nested tables and arrays round trip
+        """
+        table = {'headers': {'x': [1, 'a', None, {'y': False}]}, 'list': [2.5, []]}
+        self.failUnlessEqual(self.roundTrip(table), table, 'nested values FAILED...')
+
+    # ------------------------------
+    def test_custom_type(self):
+        """
+        registered types are encoded with their own code
+        """
+        class Point:
+            def __init__(self, x):
+                self.x = x
+        register('x', lambda codec, p: codec.encode_long(p.x), lambda codec: Point(codec.decode_long()), Point)
+        try:
+            self.failUnlessEqual(self.roundTrip({'p': Point(3)})['p'].x, 3, 'custom type FAILED...')
+        finally:
+            del TYPES['x'], PYTHON[Point]
+
+    # ------------------------------
+    def test_invalid(self):
+        """
+        unknown values, out of range integers and invalid names raise ValueError
+        """
+        for table in ({'o': object()}, {'n': 2**64}, {'1key': 1}):
+            self.failUnlessRaises(ValueError, self.codec.encode_table, table)
+        self.failUnlessRaises(ValueError, self.readFunc, 'decode_table', '\x00\x00\x00\x03\x01k?')
+
+    # ------------------------------
+    def test_decimal_range(self):
+        """
+        decimals need a scale of at most 255 and an unscaled value within a signed long
+        """
+        table = {'min': Decimal('-2147483648'), 'max': Decimal('2147483647'), 'scale': Decimal('1E-255'), 'big': Decimal('1E+9')}
+        self.failUnlessEqual(self.roundTrip(table), table, 'decimal round trip FAILED...')
+        for value in (Decimal('2147483648'), Decimal('-2147483649'), Decimal('1E-256'), Decimal('1E+10'),
+                      Decimal('21474836.48'), Decimal('NaN'), Decimal('Infinity')):
+            self.failUnlessRaises(ValueError, self.codec.encode_table, {'d': value})
+
+# -----------------------------------------------
+# -----------------------------------------------
+class TypedArgumentsTestCase(SpecTestBase):
+
+    """
+    Handles typed field tables passed as method arguments (qpid/validation.py, qpid/frames.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        loads the spec
+        """
+        SpecTestBase.setUp(self)
+        self.spec = qpid_spec.load(self.specfile)
+        self.declare = self.spec.parse_method('queue.declare')
+
+    # ---------------------------------
+    def test_validation(self):
+        """
+        the values the typed table codec encodes pass validation, the others do not
+        """
+        table = {'ttl': 1.5, 'n': -1, 'at': datetime(2007, 5, 19), 'nested': {'l': [None, Decimal('1.5')]}}
+        self.declare.validate(self.declare.arguments(queue='q', arguments=table))
+        for bad in ({'o': object()}, {'l': [object()]}, {'n': {'1key': 1}}, {'n': 2**64},
+                    {'d': Decimal('1E-256')}, {'l': [Decimal('2147483648')]}):
+            self.failUnlessRaises(ValueError, self.declare.validate, self.declare.arguments(queue='q', arguments=bad))
+
+    # ---------------------------------
+    def test_frames(self):
+        """
+        typed tables go through encode_method, decode_method and lazily decoded frames
+        """
+        table = {'ttl': 1.5, 'n': -1, 'flag': True}
+        args = self.declare.arguments(queue='q', durable=True, arguments=table)
+        data = frames.encode_method(self.declare, args, 1)
+        method, decoded = frames.decode_method(self.spec, frames.decode_frame(data)[2])
+        self.failUnlessEqual(decoded[-1], table, 'typed table decode FAILED...')
+        self.failUnlessEqual(frames.decode_lazy(self.spec, data)[0]['arguments'], table, 'lazy typed table decode FAILED...')
+
+# -----------------------------------------
+# -----------------------------------------
+class FramesTestCase(SpecTestBase):
+
+    """
+    Handles whole frames and their lazy decoding (qpid/frames.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        loads the spec and the arguments of a frame with every field type
+        """
+        SpecTestBase.setUp(self)
+        self.spec = qpid_spec.load(self.specfile)
+        self.types = self.spec.parse_method('test.types')
+        bits = dict([('b%d' % i, i % 3 == 0) for i in range(9)])
+        self.args = self.types.arguments(octet=255, short=65535, long=2**32 - 1, longlong=2**64 - 1,
+                                         timestamp=1181000000, flag=True, shortstr='short', longstr='x' * 300,
+                                         table={'key': 'value', 'n': 1}, **bits)
+
+    # ---------------------------------
+    def test_round_trip(self):
+        """
+        encode_method and decode_method agree on every field type, with runs of bits packed
+        """
+        data = frames.encode_method(self.types, self.args, 3)
+        type, channel, payload, offset = frames.decode_frame(data)
+        self.failUnlessEqual((type, channel, offset), (frames.FRAME_METHOD, 3, len(data)), 'frame header FAILED...')
+        method, args = frames.decode_method(self.spec, payload)
+        self.failUnless(method is self.types, 'decoded method FAILED...')
+        self.failUnlessEqual(tuple(args), self.args, 'decoded arguments FAILED...')
+        # flag alone in one octet, b0..b7 in the next and b8 in a third
+        self.failUnlessEqual([layout for layout in frames.layout(self.types.fields) if layout[0] == 'bit'], [('bit', 1), ('bit', 9)], 'bit runs FAILED...')
+
+    # ---------------------------------
+    def test_lazy(self):
+        """
+        a lazily decoded frame gives the same arguments by index, by name and all at once
+        """
+        data = frames.encode_method(self.types, self.args, 3)
+        frame, offset = frames.decode_lazy(self.spec, data + 'next')
+        self.failUnlessEqual(offset, len(data), 'next frame offset FAILED...')
+        self.failUnlessEqual(frame.raw, data, 'raw frame FAILED...')
+        for i, f in enumerate(self.types.fields):
+            self.failUnlessEqual(frame[f.name], self.args[i], 'lazy %s FAILED...' % f.name)
+        self.failUnlessEqual(frame.values(), self.args, 'lazy values FAILED...')
+        self.failUnlessEqual(frame.longstr, 'x' * 300, 'attribute access FAILED...')
+        self.failUnlessEqual(frames.field_offsets(self.types, data)[0], (frames.HEADER_SIZE + 4, 'octet', None), 'field offsets FAILED...')
+
+    # ---------------------------------
+    def test_arguments_field(self):
+        """
+        the 'arguments' table field is not hidden by the frame
+        """
+        declare = self.spec.parse_method('queue.declare')
+        data = frames.encode_method(declare, declare.arguments(queue='q', arguments={'x': 'y'}))
+        frame = frames.decode_lazy(self.spec, data)[0]
+        self.failUnlessEqual(frame.arguments, {'x': 'y'}, 'arguments field FAILED...')
+        self.failUnlessEqual(frame['queue'], 'q', 'queue field FAILED...')
+
+    # ---------------------------------
+    def test_bad_frames(self):
+        """
+        partial frames are not decoded yet, corrupt ones raise ValueError
+        """
+        data = frames.encode_method(self.types, self.args)
+        self.failUnlessEqual(frames.decode_lazy(self.spec, data[:-1]), None, 'partial frame FAILED...')
+        self.failUnlessEqual(frames.decode_frame(data[:5]), None, 'partial header FAILED...')
+        self.failUnlessRaises(ValueError, frames.decode_lazy, self.spec, data[:-1] + '\x00')
+        self.failUnlessRaises(ValueError, frames.decode_frame, data[:-1] + '\x00')
+        short = frames.encode_frame(frames.FRAME_METHOD, 0, data[frames.HEADER_SIZE:frames.HEADER_SIZE + 10])
+        frame = frames.decode_lazy(self.spec, short)[0]
+        self.failUnlessRaises(ValueError, frame.value, 7)
+
+    # ---------------------------------
+    def test_template(self):
+        """
+        frames emitted by a template are those encode_method gives for the same values
+        """
+        template = self.types.template(3, shortstr='short', longstr='x' * 300, table={'key': 'value'})
+        names = template.variables
+        self.failUnlessEqual(names[:6], ['octet', 'short', 'long', 'longlong', 'timestamp', 'flag'], 'template variables FAILED...')
+        for i in range(64):
+            values = dict([(name, i % 2 == 1) for name in names if name[0] == 'b'])
+            values.update(octet=i, short=i * 1000, long=2**32 - 1 - i, longlong=2**64 - 1 - i, timestamp=1181000000 + i,
+                          flag=i % 3 == 0, b3=i % 4 == 0)
+            expected = frames.encode_method(self.types, self.types.arguments(shortstr='short', longstr='x' * 300,
+                                                                             table={'key': 'value'}, **values), 3)
+            self.failUnlessEqual(template(*[values[name] for name in names]), expected, 'template frame FAILED...')
+            self.failUnlessEqual(template(**values), expected, 'template by name FAILED...')
+        ack = self.spec.parse_method('basic.ack').template(multiple=True)
+        self.failUnlessEqual(ack(7, channel=5), frames.encode_method(self.spec.parse_method('basic.ack'), (7, True), 5), 'template channel FAILED...')
+        self.failUnlessRaises(TypeError, ack)
+        self.failUnlessRaises(TypeError, ack, 1, bogus=2)
+        self.failUnlessRaises(ValueError, ack, -1)
+        self.failUnlessRaises(ValueError, self.types.template)
+        self.failUnlessRaises(TypeError, self.types.template, nonesuch=1)
+
+# ----------------------------------------
+# ----------------------------------------
+class FrameScanTestCase(SpecTestBase):
+
+    """
+    Handles decoding captured frame streams in parallel (qpid/framescan.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        writes a stream of 6000 frames, raw and as a capture file
+        """
+        SpecTestBase.setUp(self)
+        spec = qpid_spec.load(self.specfile)
+        declare, ack = spec.parse_method('queue.declare'), spec.parse_method('basic.ack')
+        self.frames = []
+        for i in range(6000):
+            if i % 3 == 0:
+                data = frames.encode_method(declare, declare.arguments(queue='q%d' % i, durable=i % 2 == 0, arguments={'n': i}), i % 5)
+            elif i % 3 == 1:
+                data = frames.encode_method(ack, ack.arguments(delivery_tag=i, multiple=True), i % 5)
+            else:
+                data = frames.encode_frame(3, i % 5, 'body %d' % i)
+            self.frames.append(data)
+        self.raw = os.path.join(self.dir, 'frames.bin')
+        self.write(self.raw, ''.join(self.frames))
+        self.capture = os.path.join(self.dir, 'session.cap')
+        writer = CaptureWriter(self.capture)
+        for data in self.frames:
+            writer.record(data, OUT)
+        writer.close()
+
+    # ---------------------------
+    def write(self, path, data):
+        """
+        helper function - writes 'data' to the file 'path'
+        """
+        f = open(path, 'wb')
+        f.write(data)
+        f.close()
+
+    # ---------------------------------
+    def test_parallel(self):
+        """
+        decoding in 3 processes gives the frames decoded in this process, for raw streams and capture files
+        """
+        local = list(framescan.decode_file(self.raw, self.specfile, processes=1, size=16 * 1024))
+        self.failUnlessEqual(len(local), 6000, 'frame count FAILED...')
+        self.failUnlessEqual(local[3][1:], (frames.FRAME_METHOD, 3, 'queue.declare', [0, 'q3', False, False, False, False, False, {'n': 3}]), 'decoded frame FAILED...')
+        self.failUnlessEqual(local[2][1:], (3, 2, None, len('body 2')), 'other frame FAILED...')
+        parallel = list(framescan.decode_file(self.raw, self.specfile, processes=3, size=16 * 1024))
+        self.failUnlessEqual(parallel, local, 'parallel decode FAILED...')
+        captured = list(framescan.decode_file(self.capture, self.specfile, processes=3, size=16 * 1024))
+        self.failUnlessEqual([frame[1:] for frame in captured], [frame[1:] for frame in local], 'capture file decode FAILED...')
+        self.failUnlessEqual(captured, list(framescan.decode_file(self.capture, self.specfile, processes=1)), 'capture file parallel decode FAILED...')
+
+    # ---------------------------------
+    def test_bad_and_truncated(self):
+        """
+        a frame without its frame end raises ValueError, a partial frame at the end is left out
+        """
+        data = ''.join(self.frames)
+        bad = data[:len(self.frames[0]) - 1] + '\x00' + data[len(self.frames[0]):]
+        self.failUnlessRaises(ValueError, list, framescan.scan(bad, frames.FRAME_END))
+        self.write(self.raw, bad)
+        self.failUnlessRaises(ValueError, list, framescan.decode_file(self.raw, self.specfile, processes=1))
+        self.write(self.raw, data[:-3])
+        decoded = list(framescan.decode_file(self.raw, self.specfile, processes=3, size=16 * 1024))
+        self.failUnlessEqual(len(decoded), 5999, 'truncated tail FAILED...')
+        self.failUnlessEqual(decoded[-1][0], len(data) - len(self.frames[-1]) - len(self.frames[-2]), 'last whole frame FAILED...')
+
+    # ---------------------------------
+    def test_spec_frame_end(self):
+        """
+        frames are split on the frame end of the spec rather than the default one
+        """
+        self.write(self.specfile, SPEC_XML.replace('name="frame end" value="206"', 'name="frame end" value="165"'))
+        spec = qpid_spec.load(self.specfile)
+        ack = spec.parse_method('basic.ack')
+        data = ''.join([frames.encode_method(ack, ack.arguments(delivery_tag=i), 1, end=165) for i in range(100)])
+        self.write(self.raw, data)
+        for processes in (1, 3):
+            decoded = list(framescan.decode_file(self.raw, self.specfile, processes=processes, size=1024))
+            self.failUnlessEqual([frame[4][0] for frame in decoded], range(100), 'spec frame end FAILED...')
+        self.failUnlessRaises(ValueError, list, framescan.scan(data, frames.FRAME_END))
+
 # ------------------------ #
 # Pre - existing test code #
 # ------------------------ #
@@ -574,10 +1430,20 @@ if __name__ == '__main__':
     #adding all the test suites...
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(IntegerTestCase))
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(BitTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(BitsTestCase))
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(StringTestCase))
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TimestampTestCase))
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(FieldTableTestCase))
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ContentTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(InstrumentationTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(RingBufferTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TransportTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CaptureTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CompressionTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TypedTableTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TypedArgumentsTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(FramesTestCase))
+    codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(FrameScanTestCase))
     
     #loading pre-existing test case from qpid/codec.py
     codec_test_suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(oldTests))
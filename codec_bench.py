@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import sys
+from cStringIO import StringIO
+from qpid.codec import Codec
+from qpid.reference import ReferenceId
+from qpid.bits import BitCodec, encode_fields, decode_fields
+from qpid import benchmark
+
+__doc__ = """
+
+    Micro benchmarks for qpid/codec.py
+
+    Covers the same types as the unit tests in codec.py (integers, bits, short and long strings,
+    field tables, content) at realistic sizes, plus full method argument round trips when a spec
+    file is given.
+
+    To run:
+    -------
+
+        python codec_bench.py [-s amqp.xml] [-o results.json] [-b baseline.json] [-t 0.10]
+
+        Timings are printed on screen. With -o the results are written as JSON, with -b they are
+        compared against a previously saved run and any benchmark more than the threshold (-t, a
+        fraction, default 10%) slower is reported; the exit status is then 1.
+
+        A new baseline is simply the -o output of a run on the reference build.
+
+"""
+
+LONGSTR_SIZES = (10, 1024, 100 * 1024, 10 * 1024 * 1024)
+
+SMALL_TABLE = {'$key1':'value1', '$key2':2}
+LARGE_TABLE = dict([('key%03d' % i, (i % 2 and 'value%d' % i) or i) for i in range(100)])
+
+# methods used for the round trip benchmarks, when present in the spec
+METHODS = ('basic.publish', 'basic.consume', 'basic.deliver', 'basic.ack', 'queue.declare')
+
+# -----------------------------------------
+def encoded(type, value, codec_class=Codec):
+    """
+    returns the encoding of 'value' as 'type'
+    """
+    codec = codec_class(StringIO())
+    codec.encode(type, value)
+    codec.flush()
+    return codec.stream.getvalue()
+
+# ----------------------------------------
+def encoder(type, value, codec_class=Codec):
+    """
+    returns a function encoding 'value' as 'type' into a fresh stream
+    """
+    def run():
+        codec = codec_class(StringIO())
+        codec.encode(type, value)
+        codec.flush()
+    return run
+
+# ------------------------
+def decoder(type, data):
+    """
+    returns a function decoding a 'type' out of 'data'
+    """
+    def run():
+        Codec(StringIO(data)).decode(type)
+    return run
+
+# ---------------------------------
+def bit_encoder(bits, batch=False):
+    """
+    returns a function encoding a run of bits, either one at a time or in one go
+    """
+    def single():
+        codec = Codec(StringIO())
+        for bit in bits:
+            codec.encode_bit(bit)
+        codec.flush()
+    def batched():
+        codec = BitCodec(StringIO())
+        codec.encode_bits(bits)
+        codec.flush()
+    if batch:
+        return batched
+    return single
+
+# ----------------------------
+def bit_decoder(bits, batch=False):
+    """
+    returns a function decoding a run of bits, either one at a time or in one go
+    """
+    data = encoded('bit', 0) * ((len(bits) + 7) / 8)
+    n = len(bits)
+    def single():
+        codec = Codec(StringIO(data))
+        for i in xrange(n):
+            codec.decode_bit()
+    def batched():
+        BitCodec(StringIO(data)).decode_bits(n)
+    if batch:
+        return batched
+    return single
+
+# -----------------------------------
+def method_round_trip(method, args):
+    """
+    returns a function encoding and then decoding the arguments of 'method'
+    """
+    def run():
+        codec = BitCodec(StringIO())
+        encode_fields(codec, method.fields, args)
+        codec.flush()
+        codec.stream = StringIO(codec.stream.getvalue())
+        decode_fields(codec, method.fields)
+    return run
+
+# -------------------------
+def sample_arguments(method):
+    """
+    returns plausible, non default, arguments for 'method'
+    """
+    samples = {'bit': True, 'octet': 1, 'short': 1, 'long': 1000, 'longlong': 123456789,
+               'timestamp': 1180000000, 'shortstr': 'amq.direct', 'longstr': 'x' * 64,
+               'table': SMALL_TABLE}
+    return tuple([samples[f.type] for f in method.fields])
+
+# ------------------------------
+def benchmarks(spec=None):
+    """
+    returns the list of codec benchmarks, including method round trips if a loaded 'spec' is given
+    """
+    result = []
+    def add(name, func, nbytes=None):
+        result.append(benchmark.Benchmark(name, func, nbytes))
+
+    for type, value in (('octet', 2), ('short', 2), ('long', 2), ('longlong', 2), ('timestamp', 1180000000)):
+        data = encoded(type, value)
+        add('%s.encode' % type, encoder(type, value), len(data))
+        add('%s.decode' % type, decoder(type, data), len(data))
+
+    for n in (1, 5, 16):
+        bits = [i % 3 == 0 for i in range(n)]
+        add('bit.encode.%d' % n, bit_encoder(bits))
+        add('bit.encode_bits.%d' % n, bit_encoder(bits, True))
+        add('bit.decode.%d' % n, bit_decoder(bits))
+        add('bit.decode_bits.%d' % n, bit_decoder(bits, True))
+
+    for size in (10, 255):
+        value = 'x' * size
+        data = encoded('shortstr', value)
+        add('shortstr.encode.%d' % size, encoder('shortstr', value), len(data))
+        add('shortstr.decode.%d' % size, decoder('shortstr', data), len(data))
+
+    for size in LONGSTR_SIZES:
+        value = 'x' * size
+        data = encoded('longstr', value)
+        add('longstr.encode.%d' % size, encoder('longstr', value), len(data))
+        add('longstr.decode.%d' % size, decoder('longstr', data), len(data))
+
+    for name, value in (('small', SMALL_TABLE), ('large', LARGE_TABLE)):
+        data = encoded('table', value)
+        add('table.encode.%s' % name, encoder('table', value), len(data))
+        add('table.decode.%s' % name, decoder('table', data), len(data))
+
+    for name, value in (('inline', 'x' * 1024), ('reference', ReferenceId('ref-1'))):
+        data = encoded('content', value)
+        add('content.encode.%s' % name, encoder('content', value), len(data))
+        add('content.decode.%s' % name, decoder('content', data), len(data))
+
+    if spec is not None:
+        for name in METHODS:
+            try:
+                method = spec.parse_method(name)
+            except KeyError:
+                continue
+            add('method.%s' % name, method_round_trip(method, sample_arguments(method)))
+
+    return result
+
+# -------------------
+def main(argv=None):
+    """
+    runs the benchmarks, saving and comparing results as requested on the command line
+    """
+    parser = benchmark.option_parser()
+    parser.add_option('-s', '--spec', help='spec file for method round trips')
+    opts, args = parser.parse_args(argv)
+
+    spec = None
+    if opts.spec:
+        from qpid import spec as qpid_spec
+        spec = qpid_spec.load(opts.spec)
+
+    results = benchmark.run(benchmarks(spec), opts.filter, opts.min_time, out=sys.stdout)
+    return benchmark.finish(results, opts)
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Optional per type instrumentation of a Codec.
+
+            instrument(codec) wraps the encode_<type>/decode_<type> methods of a
+            single codec instance and records, for each type, the number of
+            calls, the number of bytes written/read and the cumulative time
+            spent. uninstrument(codec) removes the wrappers again. Codecs that
+            were never instrumented run the plain class methods, so there is no
+            cost at all when instrumentation is disabled.
+
+            Only the outermost call is recorded: the octet written for the
+            length of a shortstr is accounted to 'shortstr', not to 'octet'.
+            Bits are counted when they are queued; the octets carrying them are
+            written, and so counted, by whatever value flushes them.
+
+            Usage:
+
+              stats = instrument(codec)
+              ...
+              stats.snapshot()  -> {'table': {'encode': {'calls': 2, 'bytes': 40, 'time': 0.0001}, ...}, ...}
+          """
+
+import time
+
+TYPES = ("octet", "short", "long", "longlong", "bit", "shortstr", "longstr",
+         "table", "timestamp", "content")
+
+OPERATIONS = ("encode", "decode")
+
+# ---------------
+# ---------------
+class CodecStats:
+  """
+  call counts, bytes and cumulative time per (operation, type)
+  """
+
+  # ------------------
+  def __init__(self):
+    """
+    initializations...
+    """
+    self.reset()
+
+  # ---------------
+  def reset(self):
+    """
+    discards everything recorded so far
+    """
+    self.records = {}
+
+  # -----------------------------------------------
+  def record(self, operation, type, nbytes, elapsed):
+    """
+    adds one call of 'operation' ('encode' or 'decode') on 'type'
+    """
+    try:
+      rec = self.records[(operation, type)]
+    except KeyError:
+      rec = self.records[(operation, type)] = [0, 0, 0.0]
+    rec[0] += 1
+    rec[1] += nbytes
+    rec[2] += elapsed
+
+  # ------------------
+  def snapshot(self):
+    """
+    returns a copy of the statistics as a dict of the form
+    {type: {operation: {'calls': n, 'bytes': n, 'time': seconds}}}
+    """
+    result = {}
+    for (operation, type), (calls, nbytes, elapsed) in self.records.items():
+      ops = result.setdefault(type, {})
+      ops[operation] = {"calls": calls, "bytes": nbytes, "time": elapsed}
+    return result
+
+# ---------------------------------------------------
+def _wrap(codec, stats, operation, type, depth, timer):
+  """
+  returns a wrapper around the bound method codec.<operation>_<type> that
+  records into 'stats'. 'depth' is a one element list shared by all the
+  wrappers of a codec so that nested calls are not counted twice
+  """
+  meth = getattr(codec, "%s_%s" % (operation, type))
+  if operation == "encode":
+    counter = "nwrote"
+  else:
+    counter = "nread"
+
+  def wrapper(*args):
+    if depth[0]:
+      return meth(*args)
+    depth[0] += 1
+    before = getattr(codec, counter)
+    start = timer()
+    try:
+      return meth(*args)
+    finally:
+      elapsed = timer() - start
+      depth[0] -= 1
+      stats.record(operation, type, getattr(codec, counter) - before, elapsed)
+  wrapper.__name__ = meth.__name__
+  wrapper.__doc__ = meth.__doc__
+  return wrapper
+
+# ---------------------------------------------------------------------
+def instrument(codec, stats = None, types = TYPES, timer = time.time):
+  """
+  starts recording the encode/decode calls made on 'codec' into 'stats' (a
+  new CodecStats object if none is given), and returns the stats object
+  """
+  if stats is None:
+    stats = CodecStats()
+  uninstrument(codec)
+  depth = [0]
+  names = []
+  for type in types:
+    for operation in OPERATIONS:
+      name = "%s_%s" % (operation, type)
+      if hasattr(codec, name):
+        setattr(codec, name, _wrap(codec, stats, operation, type, depth, timer))
+        names.append(name)
+  codec._instrumented = (stats, names)
+  return stats
+
+# -------------------------
+def uninstrument(codec):
+  """
+  removes the wrappers installed by instrument(), returning the stats object
+  that was in use (or None if the codec was not instrumented)
+  """
+  try:
+    stats, names = codec.__dict__.pop("_instrumented")
+  except KeyError:
+    return None
+  for name in names:
+    del codec.__dict__[name]
+  return stats
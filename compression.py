@@ -0,0 +1,221 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Opt-in compression of longstr and content bodies.
+
+            CompressionMixin makes a Codec compress the longstr values (and so
+            the inline content) it encodes when they are at least 'threshold'
+            bytes long and compress to something smaller. A compressed value is
+            still an ordinary longstr on the wire, holding:
+
+              MARKER, a field table, the compressed bytes
+
+            where the table carries the reserved entries
+
+              x-qpid-compression  -- the name of the compression, e.g. "zlib"
+              x-qpid-length       -- the length of the original value
+
+            Decoding recognizes the marker and decompresses transparently,
+            reading large values from the stream in chunks. Plain values that
+            happen to start with the marker are sent with the "identity"
+            compression so that they read back unchanged.
+
+            Decompression stops, with a ValueError, as soon as the output
+            exceeds the declared x-qpid-length (or the 'limit' of the codec), so
+            a small value from a peer cannot inflate to gigabytes. zlib is
+            bounded exactly; decompressors without a maximum output length,
+            like bz2's, are fed small pieces and checked after each.
+
+            Note that a longstr is a string on both ends: the value is
+            compressed in one call and its decompressed parts are joined, so
+            the whole value is held in memory either way.
+
+            zlib and bz2 are registered; register() adds others:
+
+              codec = CompressingCodec(stream)
+              codec.compression = "bz2"
+              codec.threshold = 4096
+
+            Both peers need the mixin, a plain Codec reads compressed values as
+            the longstr they are. See compression_bench.py for the CPU versus
+            bytes trade-off.
+          """
+
+import bz2, zlib
+from struct import pack
+from cStringIO import StringIO
+from qpid.codec import Codec
+
+MARKER = "\xffQPZ"
+
+COMPRESSION = "x-qpid-compression"
+LENGTH = "x-qpid-length"
+
+# compressed bytes read from the stream at a time
+CHUNK = 64 * 1024
+
+# compressed bytes handed at a time to decompressors that cannot bound their
+# output
+PIECE = 1024
+
+# --------------------------------
+# --------------------------------
+class Identity:
+  """
+  compressor and decompressor leaving the data as it is
+  """
+
+  # --------------------------
+  def compress(self, data):
+    """
+    returns 'data'
+    """
+    return data
+
+  decompress = compress
+
+  # ----------------
+  def flush(self):
+    """
+    nothing is held back
+    """
+    return ""
+
+# name -> (function(level) returning a compressor, function returning a
+# decompressor), the objects having the interface of zlib's
+COMPRESSIONS = {"identity": (lambda level: Identity(), Identity),
+                "zlib": (zlib.compressobj, zlib.decompressobj),
+                "bz2": (lambda level: bz2.BZ2Compressor(max(1, level)),
+                        bz2.BZ2Decompressor)}
+
+# ---------------------------------------------------
+def register(name, compressor, decompressor):
+  """
+  registers the compression 'name', see COMPRESSIONS
+  """
+  COMPRESSIONS[name] = (compressor, decompressor)
+
+# ----------------------
+# ----------------------
+class CompressionMixin:
+  """
+  mixin for Codec subclasses compressing large longstr values
+  """
+
+  # the compression used, None to only decompress
+  compression = "zlib"
+  level = 6
+  # values shorter than this are never compressed
+  threshold = 1024
+  # the longest decompressed value accepted, None for any declared length
+  limit = None
+
+  # --------------------------------
+  def encode_longstr(self, s):
+    """
+    encodes 's', compressed if it is worth it
+    """
+    if isinstance(s, dict):
+      Codec.encode_longstr(self, s)
+      return
+    name = None
+    if self.compression is not None and len(s) >= self.threshold:
+      compressor = COMPRESSIONS[self.compression][0](self.level)
+      data = compressor.compress(s) + compressor.flush()
+      if len(data) < len(s):
+        name = self.compression
+    if name is None:
+      if not s.startswith(MARKER):
+        Codec.encode_longstr(self, s)
+        return
+      name, data = "identity", s
+    out = StringIO()
+    Codec(out).encode_table({COMPRESSION: name, LENGTH: len(s)})
+    header = MARKER + out.getvalue()
+    self.encode_long(len(header) + len(data))
+    self.write(header)
+    self.write(data)
+
+  # --------------------------
+  def decode_longstr(self):
+    """
+    decodes a longstr, decompressing it if it was compressed
+    """
+    size = self.decode_long()
+    if size < len(MARKER):
+      return self.read(size)
+    start = self.read(len(MARKER))
+    if start != MARKER:
+      return start + self.read(size - len(MARKER))
+    tsize = self.decode_long()
+    headers = Codec(StringIO(pack("!L", tsize) + self.read(tsize))).decode_table()
+    try:
+      decompressor = COMPRESSIONS[headers[COMPRESSION]][1]()
+    except KeyError:
+      raise ValueError("unknown compression: %r" % headers.get(COMPRESSION))
+    try:
+      length = headers[LENGTH]
+    except KeyError:
+      raise ValueError("compressed value without %s" % LENGTH)
+    if self.limit is not None and length > self.limit:
+      raise ValueError("compressed value of %d bytes, the limit is %d" %
+                       (length, self.limit))
+    bounded = hasattr(decompressor, "unconsumed_tail")
+    remaining = size - len(MARKER) - 4 - tsize
+    left = length
+    parts = []
+    while remaining > 0:
+      chunk = self.read(min(CHUNK, remaining))
+      if not chunk:
+        raise EOFError("compressed value truncated")
+      remaining -= len(chunk)
+      if bounded:
+        pieces = [chunk]
+      else:
+        pieces = [chunk[i:i + PIECE] for i in xrange(0, len(chunk), PIECE)]
+      for data in pieces:
+        while data:
+          if bounded:
+            # one byte more than declared is enough to know it is too much
+            part = decompressor.decompress(data, left + 1)
+            data = decompressor.unconsumed_tail
+          else:
+            part = decompressor.decompress(data)
+            data = ""
+          left -= len(part)
+          if left < 0:
+            raise ValueError("compressed value larger than the %d bytes "
+                             "declared" % length)
+          parts.append(part)
+    if hasattr(decompressor, "flush"):
+      parts.append(decompressor.flush())
+      left -= len(parts[-1])
+    if left != 0:
+      raise ValueError("decompressed %d bytes, expected %d" %
+                       (length - left, length))
+    return "".join(parts)
+
+# -------------------------------------------------
+# -------------------------------------------------
+class CompressingCodec(CompressionMixin, Codec):
+  """
+  Codec compressing large longstr and content values
+  """
+  pass
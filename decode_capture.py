@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import sys, time
+from optparse import OptionParser
+from qpid import framescan
+
+__doc__ = """
+
+    Decodes a capture of AMQP frames (raw frames, or a file written by qpid/capture.py, see
+    qpid/framescan.py) using a pool of processes
+
+    Prints one line per frame: its offset in the file, channel, and for method frames the method
+    and its arguments, for other frames their type and payload size.
+
+    To run:
+    -------
+
+        python decode_capture.py -s amqp.xml [-e errata.xml ...] [-p 8] [-z 8] capture.bin
+
+        -p sets the number of processes (default: one per CPU, 1 decodes in this process only),
+        -z the shard size in megabytes. With -q only the frames per method and the throughput are
+        printed.
+
+"""
+
+# -------------------
+def main(argv=None):
+    """
+    decodes the capture file given on the command line
+    """
+    parser = OptionParser(usage='usage: %prog -s spec [options] capture')
+    parser.add_option('-s', '--spec', help='spec file')
+    parser.add_option('-e', '--errata', action='append', default=[], help='errata file, may be repeated')
+    parser.add_option('-p', '--processes', type='int', help='number of decoding processes')
+    parser.add_option('-z', '--shard-size', type='float', default=framescan.SHARD_SIZE / (1024.0 * 1024),
+                      help='shard size in megabytes [default: %default]')
+    parser.add_option('-q', '--quiet', action='store_true', help='only print a summary')
+    opts, args = parser.parse_args(argv)
+    if not opts.spec or len(args) != 1:
+        parser.error('a spec file and a capture file are required')
+
+    counts = {}
+    start = time.time()
+    nframes = 0
+    for offset, type, channel, method, args in \
+            framescan.decode_file(args[0], opts.spec, opts.errata, opts.processes,
+                                  int(opts.shard_size * 1024 * 1024)):
+        nframes += 1
+        key = method or 'type %d' % type
+        counts[key] = counts.get(key, 0) + 1
+        if not opts.quiet:
+            if method:
+                print '%d\t%d\t%s\t%r' % (offset, channel, method, args)
+            else:
+                print '%d\t%d\ttype %d\t%d bytes' % (offset, channel, type, args)
+    elapsed = time.time() - start
+
+    out = opts.quiet and sys.stdout or sys.stderr
+    for key in sorted(counts.keys()):
+        out.write('%-40s %10d\n' % (key, counts[key]))
+    out.write('%d frames in %.2f s (%.0f frames/s)\n' % (nframes, elapsed, nframes / max(elapsed, 1e-9)))
+    return 0
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import sys
+from qpid.constants import *
+from qpid.exception import ResourceLockedException, REGISTRY, from_reply
+from qpid.errorstats import ErrorStats
+from qpid import benchmark
+
+__doc__ = """
+
+    Micro benchmarks for the error path: building exceptions from reply codes and recording them
+    in qpid/errorstats.py
+
+    The errorstats.record benchmarks are the overhead added to every channel or connection close
+    handled; compare them with exception.raise to see what instrumenting the error path costs.
+
+    To run:
+    -------
+
+        python error_bench.py [-o results.json] [-b baseline.json] [-t 0.10]
+
+        The options are those of codec_bench.py.
+
+"""
+
+DETAIL = 'queue "work" in exclusive use by another connection'
+
+# -------------------------------
+def raiser(make):
+    """
+    returns a function raising and catching the exception returned by 'make'
+    """
+    def run():
+        try:
+            raise make()
+        except Exception:
+            pass
+    return run
+
+# -----------------------------------
+def raise_and_record(stats):
+    """
+    returns a function raising, catching and recording a ResourceLockedException
+    """
+    def run():
+        try:
+            raise ResourceLockedException(DETAIL)
+        except ResourceLockedException, e:
+            stats.record(e)
+    return run
+
+# -------------------
+def benchmarks():
+    """
+    returns the list of error path benchmarks
+    """
+    result = []
+    def add(name, func):
+        result.append(benchmark.Benchmark(name, func))
+
+    add('exception.construct', lambda: ResourceLockedException(DETAIL))
+    add('exception.from_reply', lambda: from_reply(ERROR_CODE_RESOURCE_LOCKED, DETAIL))
+    add('exception.raise', raiser(lambda: ResourceLockedException(DETAIL)))
+    add('exception.str', lambda e=ResourceLockedException(DETAIL): str(e))
+
+    stats = ErrorStats()
+    error = ResourceLockedException(DETAIL)
+    add('errorstats.record.exception', lambda: stats.record(error))
+    add('errorstats.record.code', lambda: stats.record(ERROR_CODE_RESOURCE_LOCKED))
+    add('errorstats.raise_and_record', raise_and_record(stats))
+
+    full = ErrorStats()
+    for code in REGISTRY.keys():
+        full.record(code)
+    add('errorstats.snapshot', full.snapshot)
+
+    return result
+
+# -------------------
+def main(argv=None):
+    """
+    runs the benchmarks, saving and comparing results as requested on the command line
+    """
+    parser = benchmark.option_parser()
+    opts, args = parser.parse_args(argv)
+
+    results = benchmark.run(benchmarks(), opts.filter, opts.min_time, out=sys.stdout)
+    return benchmark.finish(results, opts)
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    sys.exit(main())
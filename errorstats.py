@@ -0,0 +1,217 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Counts and rates of the errors reported by the broker, per reply code.
+
+            ErrorStats keeps, for every reply code seen, the total number of
+            errors and the number seen over the last 'window' seconds, split
+            into channel errors (ChannelException, the channel is closed) and
+            connection errors (ConnectionException, the whole connection is
+            closed). It is safe to share between threads:
+
+              stats = ErrorStats(window = 60)
+              ...
+              except QpidException, e:
+                stats.record(e)
+              ...
+              stats.snapshot()  -> {'channel': 12, 'connection': 0, 'codes': {405: {
+                                     'name': 'ResourceLockedException', 'scope': 'channel',
+                                     'scopes': {'channel': 12, 'connection': 0},
+                                     'count': 12, 'recent': 9, 'rate': 0.15}}, ...}
+
+            Errors without a reply code (e.g. a plain QpidException) are counted
+            under NO_CODE. Each error counts towards its own scope; 'scope' is
+            that of the latest error of the code.
+
+            The recent counts are kept in a ring of 'buckets' time slices, so
+            recording an error costs a lock and a few list operations whatever
+            the window. See error_bench.py for its cost.
+          """
+
+import threading, time
+from exception import REGISTRY, ChannelException, ConnectionException
+
+CHANNEL, CONNECTION = "channel", "connection"
+
+# the code of the errors recorded without a reply code
+NO_CODE = 0
+
+# ----------------------
+def scope_of(code):
+  """
+  returns CHANNEL or CONNECTION for the reply code 'code', going by its
+  registered exception class, or for unknown codes by whether it is a hard
+  error (500 and up)
+  """
+  cls = REGISTRY.get(code)
+  if cls is not None:
+    if issubclass(cls, ConnectionException):
+      return CONNECTION
+    return CHANNEL
+  if code >= 500:
+    return CONNECTION
+  return CHANNEL
+
+# -----------------
+# -----------------
+class ErrorStats:
+  """
+  thread safe per reply code error counters and windowed rates
+  """
+
+  # ------------------------------------------------------------------
+  def __init__(self, window = 60.0, buckets = 60, timer = time.time):
+    """
+    initializations. Rates are over the last 'window' seconds, kept as
+    'buckets' slices
+    """
+    self.window = float(window)
+    self.buckets = buckets
+    self.width = self.window / buckets
+    self.timer = timer
+    self.lock = threading.Lock()
+    # code -> [latest scope, total, counts per slice, slice number of each
+    # count, total per scope]
+    self.codes = {}
+    self.totals = {CHANNEL: 0, CONNECTION: 0}
+
+  # ---------------------------------------
+  def record(self, error, scope = None):
+    """
+    counts one 'error', either an exception or a reply code (None if there
+    is none). The scope is 'scope' (CHANNEL or CONNECTION) if given, else
+    that of the exception class, else that of the code
+    """
+    if scope not in (None, CHANNEL, CONNECTION):
+      raise ValueError("unknown scope: %r" % (scope,))
+    if error is None or isinstance(error, (int, long)):
+      code = error
+    else:
+      code = getattr(error, "_code", None)
+      if scope is None:
+        if isinstance(error, ConnectionException):
+          scope = CONNECTION
+        elif isinstance(error, ChannelException):
+          scope = CHANNEL
+    if code is None or code == "":
+      code = NO_CODE
+    else:
+      code = int(code)
+    if scope is None:
+      scope = scope_of(code)
+    now = int(self.timer() / self.width)
+    slot = now % self.buckets
+    self.lock.acquire()
+    try:
+      try:
+        entry = self.codes[code]
+      except KeyError:
+        entry = self.codes[code] = [scope, 0, [0] * self.buckets,
+                                    [now] * self.buckets,
+                                    {CHANNEL: 0, CONNECTION: 0}]
+      entry[0] = scope
+      entry[1] += 1
+      if entry[3][slot] != now:
+        entry[3][slot] = now
+        entry[2][slot] = 0
+      entry[2][slot] += 1
+      entry[4][scope] += 1
+      self.totals[scope] += 1
+    finally:
+      self.lock.release()
+
+  # ----------------------
+  def recent(self, entry, now):
+    """
+    returns the count of the slices of 'entry' within the window ending with
+    slice 'now'
+    """
+    oldest = now - self.buckets
+    n = 0
+    for count, stamp in zip(entry[2], entry[3]):
+      if stamp > oldest:
+        n += count
+    return n
+
+  # ---------------------
+  def count(self, code):
+    """
+    returns the number of errors recorded for 'code'
+    """
+    self.lock.acquire()
+    try:
+      entry = self.codes.get(code)
+      if entry is None:
+        return 0
+      return entry[1]
+    finally:
+      self.lock.release()
+
+  # --------------------
+  def rate(self, code):
+    """
+    returns the number of errors per second recorded for 'code' over the
+    last window
+    """
+    now = int(self.timer() / self.width)
+    self.lock.acquire()
+    try:
+      entry = self.codes.get(code)
+      if entry is None:
+        return 0.0
+      return self.recent(entry, now) / self.window
+    finally:
+      self.lock.release()
+
+  # ------------------
+  def snapshot(self):
+    """
+    returns the counters as a dict, see the module documentation
+    """
+    now = int(self.timer() / self.width)
+    self.lock.acquire()
+    try:
+      codes = {}
+      for code, entry in self.codes.items():
+        cls = REGISTRY.get(code)
+        if cls is None:
+          name = None
+        else:
+          name = cls.__name__
+        recent = self.recent(entry, now)
+        codes[code] = {"name": name, "scope": entry[0],
+                       "scopes": dict(entry[4]), "count": entry[1],
+                       "recent": recent, "rate": recent / self.window}
+      return {"window": self.window, "channel": self.totals[CHANNEL],
+              "connection": self.totals[CONNECTION], "codes": codes}
+    finally:
+      self.lock.release()
+
+  # ---------------
+  def reset(self):
+    """
+    forgets everything recorded so far
+    """
+    self.lock.acquire()
+    try:
+      self.codes = {}
+      self.totals = {CHANNEL: 0, CONNECTION: 0}
+    finally:
+      self.lock.release()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest
+from qpid.errorstats import ErrorStats, CHANNEL, CONNECTION, NO_CODE
+from qpid.exception import QpidException, ResourceLockedException, ConnectionForcedException
+from qpid.testlib import run
+
+__doc__ = """
+
+    Unit tests for qpid/errorstats.py: the per reply code error counters
+
+    To run standalone:
+    -------------------
+
+        python errorstats_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        errorstats_unit_test_output.txt.
+
+"""
+
+# ---------------------------------------
+# ---------------------------------------
+class ErrorStatsTestCase(unittest.TestCase):
+
+    """
+    Handles the per reply code error counters (qpid/errorstats.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        stats over a 10 second window, on a clock of our own
+        """
+        self.now = [1000.0]
+        self.stats = ErrorStats(window=10, buckets=10, timer=lambda: self.now[0])
+
+    # -------------------------------
+    def test_counts_and_rates(self):
+        """
+        errors are counted per code and scope, and drop out of the rate once outside the window
+        """
+        for i in range(4):
+            self.stats.record(ResourceLockedException('locked'))
+        self.stats.record(ConnectionForcedException('forced'))
+        self.stats.record(405)
+        self.failUnlessEqual(self.stats.count(405), 5, 'count FAILED...')
+        self.failUnlessEqual(self.stats.rate(405), 0.5, 'rate FAILED...')
+        snapshot = self.stats.snapshot()
+        self.failUnlessEqual((snapshot['channel'], snapshot['connection']), (5, 1), 'scope totals FAILED...')
+        self.failUnlessEqual(snapshot['codes'][405]['name'], 'ResourceLockedException', 'code name FAILED...')
+        self.now[0] += 5
+        self.stats.record(405)
+        self.failUnlessEqual(self.stats.snapshot()['codes'][405]['recent'], 6, 'recent within window FAILED...')
+        self.now[0] += 6
+        self.failUnlessEqual(self.stats.snapshot()['codes'][405]['recent'], 1, 'recent after window FAILED...')
+        self.failUnlessEqual(self.stats.count(405), 6, 'total after window FAILED...')
+        self.stats.reset()
+        self.failUnlessEqual(self.stats.count(405), 0, 'reset FAILED...')
+
+    # -------------------------------
+    def test_no_code_and_scope(self):
+        """
+        errors without a code are counted under NO_CODE, each error counts towards its own scope, unknown scopes are refused
+        """
+        self.stats.record(None)
+        self.stats.record(QpidException())
+        self.failUnlessEqual(self.stats.count(NO_CODE), 2, 'no code count FAILED...')
+        self.stats.record(541, CHANNEL)
+        self.stats.record(541)
+        entry = self.stats.snapshot()['codes'][541]
+        self.failUnlessEqual((entry['scope'], entry['scopes']), (CONNECTION, {CHANNEL: 1, CONNECTION: 1}), 'mixed scopes FAILED...')
+        self.failUnlessRaises(ValueError, self.stats.record, 404, 'session')
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([ErrorStatsTestCase], 'errorstats_unit_test_output.txt')
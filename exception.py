@@ -38,20 +38,25 @@ class QpidException(Exception):
 
     """
     base class of all qpid exceptions
+
+    The code, description and details are kept as given and only formatted
+    when asked for, so that raising (and catching) an exception stays cheap.
+    The subclasses for the reply codes of the spec carry their code and
+    description as the class attributes _code and _desc
     """
-    
+
+    _code = ''
+    _desc = ''
+    _detail = ''
+
     # --------------------------------------------------------------------------
     def __init__(self, error_code = '', error_desc = '', additional_detail=''):
         """
         initialises the object and sets the error code
         """
-        Exception.__init__(self)
-        
-        self._name = str(self.__class__).split('.')[1]
-        self._error_code = str(error_code)
-        self._error_desc = str(error_desc)
-        if additional_detail:
-            self._error_desc += '\nDETAILS:' + str(additional_detail)
+        self._code = error_code
+        self._desc = error_desc
+        self._detail = additional_detail
 
     # ------------------
     def __str__(self):
@@ -66,14 +71,14 @@ class QpidException(Exception):
         """
         returns a textual representation of the error object
         """
-        return 'error name: %s  \nerror code: %s \nerror description: %s' % (self._name, self._error_code, self._error_desc)
+        return self.__str__()
     
     # ----------------------
     def getObjName(self):
         """
         returns the error object class name
         """
-        return self._name
+        return self.__class__.__name__
     
     
     # ----------------------
@@ -81,14 +86,20 @@ class QpidException(Exception):
         """
         returns the error code
         """
-        return self._error_code
+        return str(self._code)
     
     # ----------------------
     def getErrorDesc(self):
         """
         returns the error description
         """
-        return self._error_desc
+        if self._detail:
+            return str(self._desc) + '\nDETAILS:' + str(self._detail)
+        return str(self._desc)
+
+    _name = property(getObjName)
+    _error_code = property(getErrorCode)
+    _error_desc = property(getErrorDesc)
         
     
 # -------------------------------------
@@ -136,12 +147,15 @@ class NotDeliveredException(ChannelException):
     some other reason  
     """
 
+    _code = ERROR_CODE_NOT_DELIVERED
+    _desc = ERROR_DESC_NOT_DELIVERED
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the NotDeliveredException object
         """
-        ChannelException.__init__(self, ERROR_CODE_NOT_DELIVERED, ERROR_DESC_NOT_DELIVERED, additional_detail)
+        self._detail = additional_detail
         
 
 # -----------------------------------------------
@@ -153,12 +167,15 @@ class ContentTooLargeException(ChannelException):
     at the present time. The client may retry at a later time.    
     """
 
+    _code = ERROR_CODE_CONTENT_TOO_LARGE
+    _desc = ERROR_DESC_CONTENT_TOO_LARGE
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the ContentTooLargeException object
         """
-        ChannelException.__init__(self, ERROR_CODE_CONTENT_TOO_LARGE, ERROR_DESC_CONTENT_TOO_LARGE, additional_detail)
+        self._detail = additional_detail
         
 # -----------------------------------------
 # -----------------------------------------
@@ -169,12 +186,15 @@ class NoRouteException(ChannelException):
     an invalid routing key. Only when the mandatory flag is set.
     """
 
+    _code = ERROR_CODE_NO_ROUTE
+    _desc = ERROR_DESC_NO_ROUTE
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the NoRouteException object
         """
-        ChannelException.__init__(self, ERROR_CODE_NO_ROUTE, ERROR_DESC_NO_ROUTE, additional_detail)
+        self._detail = additional_detail
         
 
 # --------------------------------------------
@@ -187,12 +207,15 @@ class NoConsumersException(ChannelException):
     consumers of the queue.
     """
 
+    _code = ERROR_CODE_NO_CONSUMERS
+    _desc = ERROR_DESC_NO_CONSUMERS
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the NoConsumersException object
         """
-        ChannelException.__init__(self, ERROR_CODE_NO_CONSUMERS, ERROR_DESC_NO_CONSUMERS, additional_detail)
+        self._detail = additional_detail
 
 
 # ----------------------------------------------
@@ -204,12 +227,15 @@ class AccessRefusedException(ChannelException):
     due to security settings.
     """
 
+    _code = ERROR_CODE_ACCESS_REFUSED
+    _desc = ERROR_DESC_ACCESS_REFUSED
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the AccessRefusedException object
         """
-        ChannelException.__init__(self, ERROR_CODE_ACCESS_REFUSED, ERROR_DESC_ACCESS_REFUSED, additional_detail)
+        self._detail = additional_detail
 
 
 # -----------------------------------------
@@ -220,12 +246,15 @@ class NotFoundException(ChannelException):
     The client attempted to work with a server entity that does not exist.
     """
 
+    _code = ERROR_CODE_NOT_FOUND
+    _desc = ERROR_DESC_NOT_FOUND
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the NotFoundException object
         """
-        ChannelException.__init__(self, ERROR_CODE_NOT_FOUND, ERROR_DESC_NOT_FOUND, additional_detail)
+        self._detail = additional_detail
 
 
 # -----------------------------------------------
@@ -237,12 +266,15 @@ class ResourceLockedException(ChannelException):
     because another client is working with it.
     """
 
+    _code = ERROR_CODE_RESOURCE_LOCKED
+    _desc = ERROR_DESC_RESOURCE_LOCKED
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the ResourceLockedException object
         """
-        ChannelException.__init__(self, ERROR_CODE_RESOURCE_LOCKED, ERROR_DESC_RESOURCE_LOCKED, additional_detail)
+        self._detail = additional_detail
 
 
 # ---------------------------------------------------
@@ -254,12 +286,15 @@ class PreconditionFailedException(ChannelException):
     precondition failed.
     """
 
+    _code = ERROR_CODE_PRECONDITION_FAILED
+    _desc = ERROR_DESC_PRECONDITION_FAILED
+
     # -----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the PreconditionFailedException object
         """
-        ChannelException.__init__(self, ERROR_CODE_PRECONDITION_FAILED, ERROR_DESC_PRECONDITION_FAILED, additional_detail)
+        self._detail = additional_detail
 
 
 # ------------------------------- #
@@ -275,12 +310,15 @@ class ConnectionForcedException(ConnectionException):
     may retry at some later date.
     """
     
+    _code = ERROR_CODE_CONNECTION_FORCED
+    _desc = ERROR_DESC_CONNECTION_FORCED
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the ConnectionForcedException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_CONNECTION_FORCED, ERROR_DESC_CONNECTION_FORCED, additional_detail)
+        self._detail = additional_detail
  
 # -----------------------------------------------
 # -----------------------------------------------
@@ -290,12 +328,15 @@ class InvalidPathException(ConnectionException):
     The client tried to work with an unknown virtual host.
     """
     
+    _code = ERROR_CODE_INVALID_PATH
+    _desc = ERROR_DESC_INVALID_PATH
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the InvalidPathException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_INVALID_PATH, ERROR_DESC_INVALID_PATH, additional_detail)
+        self._detail = additional_detail
 
 # -----------------------------------------------
 # -----------------------------------------------
@@ -306,12 +347,15 @@ class FrameErrorException(ConnectionException):
     strongly implies a programming error in the client.    
     """
     
+    _code = ERROR_CODE_FRAME_ERROR
+    _desc = ERROR_DESC_FRAME_ERROR
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the FrameErrorException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_FRAME_ERROR, ERROR_DESC_FRAME_ERROR, additional_detail)
+        self._detail = additional_detail
 
 # -----------------------------------------------
 # -----------------------------------------------
@@ -322,12 +366,15 @@ class SyntaxErrorException(ConnectionException):
     This strongly implies a programming error in the client.    
     """
     
+    _code = ERROR_CODE_SYNTAX_ERROR
+    _desc = ERROR_DESC_SYNTAX_ERROR
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the SyntaxErrorException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_SYNTAX_ERROR, ERROR_DESC_SYNTAX_ERROR, additional_detail)
+        self._detail = additional_detail
     
 # --------------------------------------------------
 # --------------------------------------------------
@@ -339,12 +386,15 @@ class CommandInvalidException(ConnectionException):
     programming error in the client.
     """
     
+    _code = ERROR_CODE_COMMAND_INVALID
+    _desc = ERROR_DESC_COMMAND_INVALID
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the CommandInvalidException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_COMMAND_INVALID, ERROR_DESC_COMMAND_INVALID, additional_detail)
+        self._detail = additional_detail
     
 
 # --------------------------------------------------
@@ -356,12 +406,15 @@ class ChannelErrorException(ConnectionException):
     opened. This most likely indicates a fault in the client layer.
     """
     
+    _code = ERROR_CODE_CHANNEL_ERROR
+    _desc = ERROR_DESC_CHANNEL_ERROR
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the ChannelErrorException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_CHANNEL_ERROR, ERROR_DESC_CHANNEL_ERROR, additional_detail)
+        self._detail = additional_detail
     
 
 # --------------------------------------------------
@@ -374,12 +427,15 @@ class ResourceErrorException(ConnectionException):
     entity.
     """
     
+    _code = ERROR_CODE_RESOURCE_ERROR
+    _desc = ERROR_DESC_RESOURCE_ERROR
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the ResourceErrorException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_RESOURCE_ERROR, ERROR_DESC_RESOURCE_ERROR, additional_detail)
+        self._detail = additional_detail
     
 
 # --------------------------------------------------
@@ -391,12 +447,15 @@ class NotAllowedException(ConnectionException):
     the server, due to security settings or by some other criteria.
     """
     
+    _code = ERROR_CODE_NOT_ALLOWED
+    _desc = ERROR_DESC_NOT_ALLOWED
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the NotAllowedException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_NOT_ALLOWED, ERROR_DESC_NOT_ALLOWED, additional_detail)
+        self._detail = additional_detail
 
 # --------------------------------------------------
 # --------------------------------------------------
@@ -406,12 +465,15 @@ class NotImplementedException(ConnectionException):
     The client tried to use functionality that is not implemented in the server.
     """
     
+    _code = ERROR_CODE_NOT_IMPLEMENTED
+    _desc = ERROR_DESC_NOT_IMPLEMENTED
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the NotImplementedException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_NOT_IMPLEMENTED, ERROR_DESC_NOT_IMPLEMENTED, additional_detail)
+        self._detail = additional_detail
 
 # --------------------------------------------------
 # --------------------------------------------------
@@ -423,12 +485,58 @@ class InternalErrorException(ConnectionException):
     operations.
     """
     
+    _code = ERROR_CODE_INTERNAL_ERROR
+    _desc = ERROR_DESC_INTERNAL_ERROR
+
     # ----------------------------------------
     def __init__(self, additional_detail=''):
         """
         initialise the InternalErrorException object
         """
-        ConnectionException.__init__(self, ERROR_CODE_INTERNAL_ERROR, ERROR_DESC_INTERNAL_ERROR, additional_detail)
+        self._detail = additional_detail
+
+# reply code -> exception class
+REGISTRY = {}
+
+# ---------------------------------
+def register(cls, code = None):
+    """
+    registers the exception class 'cls' for the reply code 'code', by default
+    its own, replacing any class registered for it before
+    """
+    if code is None:
+        code = cls._code
+    REGISTRY[int(code)] = cls
+    return cls
+
+for _cls in (NotDeliveredException, ContentTooLargeException, NoRouteException,
+             NoConsumersException, AccessRefusedException, NotFoundException,
+             ResourceLockedException, PreconditionFailedException,
+             ConnectionForcedException, InvalidPathException,
+             FrameErrorException, SyntaxErrorException, CommandInvalidException,
+             ChannelErrorException, ResourceErrorException, NotAllowedException,
+             NotImplementedException, InternalErrorException):
+    register(_cls)
+del _cls
+
+# -----------------------------------
+def from_reply(code, text = ''):
+    """
+    returns the exception for the reply code and text of a channel.close or
+    connection.close, with the text as its details. Codes without a registered
+    class give a plain ChannelException, or a ConnectionException for codes
+    from 500 up (the hard errors)
+    """
+    try:
+        return REGISTRY[code](text)
+    except KeyError:
+        pass
+    code = int(code)
+    if REGISTRY.has_key(code):
+        return REGISTRY[code](text)
+    if code >= 500:
+        return ConnectionException(code, '', text)
+    return ChannelException(code, '', text)
 
 
 # --------------------------
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest
+from qpid import exception
+from qpid.exception import ResourceLockedException, ConnectionForcedException
+from qpid.testlib import run
+
+__doc__ = """
+
+    Unit tests for qpid/exception.py: the exceptions of the reply codes
+
+    To run standalone:
+    -------------------
+
+        python exception_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        exception_unit_test_output.txt.
+
+"""
+
+# ---------------------------------------
+# ---------------------------------------
+class ExceptionTestCase(unittest.TestCase):
+
+    """
+    Handles the exceptions for the reply codes (qpid/exception.py)
+    """
+
+    # ---------------------------------
+    def test_from_reply(self):
+        """
+        reply codes give their registered exception, or a plain one by scope, with the reply text as details
+        """
+        e = exception.from_reply(405, 'queue locked')
+        self.failUnless(isinstance(e, ResourceLockedException), 'registered class FAILED...')
+        self.failUnlessEqual((e.getErrorCode(), e._detail), ('405', 'queue locked'), 'code and details FAILED...')
+        self.failUnless(isinstance(exception.from_reply('320'), ConnectionForcedException), 'string code FAILED...')
+        for code, cls in ((499, exception.ChannelException), (599, exception.ConnectionException)):
+            e = exception.from_reply(code, 'text')
+            self.failUnlessEqual((e.__class__, e.getErrorCode(), e._detail), (cls, str(code), 'text'), 'unregistered code FAILED...')
+
+    # ---------------------------------
+    def test_register(self):
+        """
+        registering a class replaces the one registered for its code
+        """
+        class Locked(ResourceLockedException):
+            pass
+        try:
+            self.failUnless(exception.register(Locked) is Locked, 'register result FAILED...')
+            self.failUnless(isinstance(exception.from_reply(405), Locked), 'registered subclass FAILED...')
+            exception.register(Locked, '499')
+            self.failUnless(isinstance(exception.from_reply(499), Locked), 'registered code FAILED...')
+        finally:
+            exception.register(ResourceLockedException)
+            del exception.REGISTRY[499]
+        self.failUnless(exception.from_reply(405).__class__ is ResourceLockedException, 'restored FAILED...')
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([ExceptionTestCase], 'exception_unit_test_output.txt')
@@ -0,0 +1,298 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Typed field table values.
+
+            The plain Codec only knows two kinds of table value, 'S' (longstr)
+            and 'I' (unsigned long). TypedTableMixin makes encode_table and
+            decode_table use the registry below instead, which maps type codes
+            to an encoder and a decoder:
+
+              t  boolean               d  double
+              b  signed octet          f  float
+              B  unsigned octet        D  decimal (scale octet, signed long)
+              s  signed short          T  timestamp (datetime, UTC seconds)
+              u  unsigned short        S  longstr
+              i  signed long           F  nested field table
+              I  unsigned long         A  array of typed values
+              L  signed longlong       V  void (None)
+              l  unsigned longlong
+
+            'I' keeps the meaning it has in the plain codec (unsigned), so
+            tables of strings and small non negative integers encode exactly as
+            before and either codec reads them.
+
+            The codes follow the 0-8/0-9 table used by Qpid. The 0-9-1 spec
+            table differs: 's' is a short string there, and 'L' and 'l' swap
+            signed and unsigned, so brokers reading that table misread the
+            signed shorts and longlongs of this one.
+
+            A decimal is sent as its scale (0 to 255 digits after the point)
+            and its unscaled value, which must fit in a signed long; values
+            outside that range raise ValueError.
+
+            Values are encoded by looking up their Python type (along its MRO)
+            in PYTHON, which gives a type code or, for integers, a function of
+            the value picking the narrowest of 'I', 'i', 'L' and 'l'. Both
+            lookups are dictionary hits once the type has been seen. register()
+            adds custom types:
+
+              register("x", encode_point, decode_point, Point)
+              codec = TypedTableCodec(stream)
+              codec.encode_table({"origin": Point(0, 0), "ttl": 1.5})
+          """
+
+import calendar, re
+from datetime import datetime
+from decimal import Decimal
+from inspect import getmro
+from types import InstanceType
+from cStringIO import StringIO
+from qpid.codec import Codec
+
+# table field names, as enforced by the codec
+FIELD_NAME = re.compile(r"^[a-zA-Z$#]")
+
+# type code -> struct format, for the values that are a single packed number
+FORMATS = {"b": "!b", "B": "!B", "s": "!h", "u": "!H", "i": "!l", "I": "!L",
+           "L": "!q", "l": "!Q", "d": "!d", "f": "!f"}
+
+# integer type codes in order of preference, with the range they cover
+INTEGERS = (("I", 0, 2**32), ("i", -2**31, 2**31), ("L", -2**63, 2**63),
+            ("l", 0, 2**64))
+
+# ------------------------
+def packer(format):
+  """
+  returns the encoder and decoder of values packed with 'format'
+  """
+  def encode(codec, value):
+    codec.pack(format, value)
+  def decode(codec):
+    return codec.unpack(format)
+  return encode, decode
+
+# -----------------------------
+def integer_code(value):
+  """
+  returns the type code of the narrowest integer type holding 'value'
+  """
+  for code, low, high in INTEGERS:
+    if low <= value < high:
+      return code
+  raise ValueError("integer out of range for a field table: %r" % (value,))
+
+# ----------------------------------
+def encode_bool(codec, value):
+  codec.encode_octet(value and 1 or 0)
+def decode_bool(codec):
+  return codec.decode_octet() != 0
+
+# --------------------------
+def decimal_parts(value):
+  """
+  returns the scale and unscaled value of the Decimal 'value', raising
+  ValueError unless they fit in an octet and a signed long
+  """
+  if not value.is_finite():
+    raise ValueError("decimal not finite: %r" % (value,))
+  scale = max(0, -value.as_tuple()[2])
+  if scale > 255:
+    raise ValueError("decimal scale out of range: %r" % (value,))
+  unscaled = int(value.scaleb(scale))
+  if not -2**31 <= unscaled < 2**31:
+    raise ValueError("decimal out of range for a field table: %r" % (value,))
+  return scale, unscaled
+
+# ----------------------------------
+def encode_decimal(codec, value):
+  scale, unscaled = decimal_parts(value)
+  codec.encode_octet(scale)
+  codec.pack("!l", unscaled)
+def decode_decimal(codec):
+  scale = codec.decode_octet()
+  return Decimal(codec.unpack("!l")).scaleb(-scale)
+
+# ----------------------------------
+def encode_timestamp(codec, value):
+  codec.encode_longlong(calendar.timegm(value.utctimetuple()))
+def decode_timestamp(codec):
+  return datetime.utcfromtimestamp(codec.decode_longlong())
+
+# ----------------------------------
+def encode_longstr(codec, value):
+  if isinstance(value, unicode):
+    value = value.encode("utf8")
+  Codec.encode_longstr(codec, value)
+def decode_longstr(codec):
+  return Codec.decode_longstr(codec)
+
+# ----------------------------------
+def encode_array(codec, value):
+  enc = codec.__class__(StringIO())
+  for item in value:
+    enc.encode_field(item)
+  s = enc.stream.getvalue()
+  codec.encode_long(len(s))
+  codec.write(s)
+def decode_array(codec):
+  size = codec.decode_long()
+  start = codec.nread
+  result = []
+  while codec.nread - start < size:
+    result.append(codec.decode_field())
+  return result
+
+# ----------------------------------
+def encode_void(codec, value):
+  pass
+def decode_void(codec):
+  return None
+
+# type code -> (function(codec, value) encoding a value, function(codec)
+# decoding one)
+TYPES = {"t": (encode_bool, decode_bool),
+         "D": (encode_decimal, decode_decimal),
+         "T": (encode_timestamp, decode_timestamp),
+         "S": (encode_longstr, decode_longstr),
+         "F": (lambda codec, value: codec.encode_table(value),
+               lambda codec: codec.decode_table()),
+         "A": (encode_array, decode_array),
+         "V": (encode_void, decode_void)}
+for code, format in FORMATS.items():
+  TYPES[code] = packer(format)
+del code, format
+
+# Python type -> type code, or function(value) returning the type code
+PYTHON = {bool: "t", int: integer_code, long: integer_code, float: "d",
+          Decimal: "D", datetime: "T", str: "S", unicode: "S", dict: "F",
+          list: "A", tuple: "A", type(None): "V"}
+
+# Python type -> entry of PYTHON found along its MRO, see lookup
+CACHE = {}
+
+# ---------------------------------------------------
+def register(code, encode, decode, *types):
+  """
+  registers the type code 'code', encoded by encode(codec, value) and decoded
+  by decode(codec), as the code of the Python types 'types'. Registering an
+  existing code or type replaces it
+  """
+  if len(code) != 1:
+    raise ValueError("type codes are a single character: %r" % (code,))
+  TYPES[code] = (encode, decode)
+  for t in types:
+    PYTHON[t] = code
+  CACHE.clear()
+
+# -------------
+def find(cls):
+  """
+  returns the entry of PYTHON for the class 'cls' or its nearest base, None
+  if there is none
+  """
+  for base in getmro(cls):
+    if PYTHON.has_key(base):
+      return PYTHON[base]
+  return None
+
+# ---------------------
+def lookup(value):
+  """
+  returns the type code used to encode 'value'
+  """
+  t = type(value)
+  if t is InstanceType:
+    # old style classes all share the one type
+    code = find(value.__class__)
+  else:
+    try:
+      code = CACHE[t]
+    except KeyError:
+      code = CACHE[t] = find(t)
+  if code is None:
+    raise ValueError("no field table type for %r" % (value,))
+  if callable(code):
+    return code(value)
+  return code
+
+# ------------------------
+# ------------------------
+class TypedTableMixin:
+  """
+  mixin for Codec subclasses encoding typed field table values
+  """
+
+  # ---------------------------------
+  def encode_field(self, value):
+    """
+    encodes the type code and value of the table or array entry 'value'
+    """
+    code = lookup(value)
+    self.write(code)
+    TYPES[code][0](self, value)
+
+  # ----------------------
+  def decode_field(self):
+    """
+    decodes the type code and value of a table or array entry
+    """
+    code = self.read(1)
+    try:
+      decode = TYPES[code][1]
+    except KeyError:
+      raise ValueError(repr(code))
+    return decode(self)
+
+  # ---------------------------
+  def encode_table(self, tbl):
+    """
+    encodes the dict 'tbl' as a field table of typed values
+    """
+    enc = self.__class__(StringIO())
+    for key, value in tbl.items():
+      if len(key) > 128 or not FIELD_NAME.match(key):
+        raise ValueError(key)
+      enc.encode_shortstr(key)
+      enc.encode_field(value)
+    s = enc.stream.getvalue()
+    self.encode_long(len(s))
+    self.write(s)
+
+  # ------------------------
+  def decode_table(self):
+    """
+    decodes a field table of typed values into a dict
+    """
+    size = self.decode_long()
+    start = self.nread
+    result = {}
+    while self.nread - start < size:
+      key = self.decode_shortstr()
+      result[key] = self.decode_field()
+    return result
+
+# -------------------------------------
+# -------------------------------------
+class TypedTableCodec(TypedTableMixin, Codec):
+  """
+  Codec encoding typed field table values
+  """
+  pass
@@ -0,0 +1,436 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Encoding and decoding of whole frames, and frame templates.
+
+            A frame is a type octet, a channel short and a payload size long,
+            followed by the payload and the frame end octet. The payload of a
+            method frame is the class id and method id shorts followed by the
+            arguments, encoded by the codec according to the method fields:
+
+              data = encode_method(method, args, channel)
+              type, channel, payload, offset = decode_frame(data)
+              method, args = decode_method(spec, payload)
+
+            FrameTemplate pre-encodes a method frame once, with some of its
+            fields fixed, and emits new frames by copying the encoded bytes
+            and patching the other fields, which must be fixed width (bits,
+            octets, shorts, longs, longlongs and timestamps), in place:
+
+              ack = spec.parse_method("basic.ack").template(multiple = False)
+              ack(delivery_tag)  -> frame bytes
+
+            decode_lazy returns a MethodFrame instead, which keeps the frame
+            bytes and only decodes the fields that are read, so that e.g. a
+            router can look at the routing key of a frame and forward the
+            original bytes without decoding anything else:
+
+              frame, offset = decode_lazy(spec, data)
+              frame.routing_key, frame["exchange"], frame[0]
+              frame.values()  -> all the arguments
+              frame.raw  -> the frame bytes, as received
+
+            The attributes of MethodFrame itself (method, channel, raw, value
+            and values) hide the fields of the same name, which frame["name"]
+            always reaches.
+
+            Field tables are encoded and decoded with the typed values of
+            fieldtable.py, which method argument validation also accepts.
+          """
+
+from struct import pack, unpack, pack_into, unpack_from, error as StructError
+from cStringIO import StringIO
+from qpid.codec import Codec
+from bits import BitsMixin, layout, pack_bits, decode_fields
+from fieldtable import TypedTableMixin
+
+# -------------------------------------------------------
+# -------------------------------------------------------
+class FrameCodec(TypedTableMixin, BitsMixin, Codec):
+  """
+  the Codec of the arguments of the frames: batch bits and typed field
+  tables, whose encoding is that of the plain Codec for string and unsigned
+  long values
+  """
+  pass
+
+# frame type and frame end of the 0-8/0-9 specs, see frame_constants
+FRAME_METHOD = 1
+FRAME_END = 206
+
+HEADER = "!BHL"
+HEADER_SIZE = 7
+
+# struct formats of the fixed width field types
+WIDTHS = {"octet": "!B", "short": "!H", "long": "!L", "longlong": "!Q",
+          "timestamp": "!Q"}
+
+# --------------------------
+def frame_constants(spec):
+  """
+  returns the (method frame type, frame end) of 'spec', falling back to
+  FRAME_METHOD and FRAME_END for the constants it does not define
+  """
+  constants = spec.constants.byname
+  method = constants.get("frame_method")
+  end = constants.get("frame_end")
+  if method is None:
+    method = FRAME_METHOD
+  else:
+    method = method.id
+  if end is None:
+    end = FRAME_END
+  else:
+    end = end.id
+  return method, end
+
+# ---------------------------------
+def encode_value(type, value):
+  """
+  returns the encoding of a single 'value' of the field type 'type'
+  """
+  out = StringIO()
+  codec = FrameCodec(out)
+  codec.encode(type, value)
+  codec.flush()
+  return out.getvalue()
+
+# ------------------------------
+def encode_fields(method, args):
+  """
+  returns the encoded 'args' of 'method' as a list of strings, one per run
+  of fields as returned by bits.layout (i.e. one for each run of bits)
+  """
+  parts = []
+  i = 0
+  for type, count in layout(method.fields):
+    if type == "bit":
+      parts.append(pack_bits(args[i:i + count]))
+    else:
+      parts.append(encode_value(type, args[i]))
+    i += count
+  return parts
+
+# ------------------------------------------------------
+def encode_frame(type, channel, payload, end = FRAME_END):
+  """
+  returns the frame of type 'type' carrying 'payload' on 'channel'
+  """
+  return "%s%s%s" % (pack(HEADER, type, channel, len(payload)), payload,
+                     chr(end))
+
+# ---------------------------------------------------------------
+def encode_method(method, args, channel = 0, type = FRAME_METHOD,
+                  end = FRAME_END):
+  """
+  returns the method frame invoking 'method' with the tuple 'args' (see
+  Method.arguments) on 'channel'
+  """
+  payload = pack("!HH", method.klass.id, method.id) + \
+            "".join(encode_fields(method, args))
+  return encode_frame(type, channel, payload, end)
+
+# -----------------------------------------------------
+def decode_frame(data, offset = 0, end = FRAME_END):
+  """
+  decodes the frame starting at 'offset' in the string 'data' and returns
+  (type, channel, payload, offset of the next frame), or None if 'data'
+  does not hold the whole frame yet. Raises ValueError if the frame does not
+  end with the frame end octet
+  """
+  if len(data) - offset < HEADER_SIZE:
+    return None
+  type, channel, size = unpack(HEADER, data[offset:offset + HEADER_SIZE])
+  start = offset + HEADER_SIZE
+  stop = start + size
+  if len(data) <= stop:
+    return None
+  if ord(data[stop]) != end:
+    raise ValueError("frame end expected at offset %d, got %d" %
+                     (stop, ord(data[stop])))
+  return type, channel, data[start:stop], stop + 1
+
+# ---------------------------------
+def decode_method(spec, payload):
+  """
+  returns (method, list of arguments) for the method frame 'payload'
+  """
+  class_id, method_id = unpack("!HH", payload[:4])
+  method = spec.classes.byid[class_id].methods.byid[method_id]
+  return method, decode_fields(FrameCodec(StringIO(payload[4:])), method.fields)
+
+# ---------------------
+# ---------------------
+class FrameTemplate:
+  """
+  a pre-encoded method frame whose variable fixed width fields are patched
+  into a copy for every frame emitted
+  """
+
+  # ------------------------------------------------------------------
+  def __init__(self, method, channel = 0, type = FRAME_METHOD,
+               end = FRAME_END, **fixed):
+    """
+    encodes the frame of 'method' with the field values 'fixed'. The other
+    fields are the variables of the template, in the order of the method
+    fields; they must be of a fixed width type
+    """
+    self.method = method
+    self.channel = channel
+    names = [f.name for f in method.fields]
+    for name in fixed.keys():
+      if name not in names:
+        raise TypeError("%s.%s has no field '%s'" % (method.klass.name,
+                                                     method.name, name))
+    args = []
+    self.variables = []
+    variables = {}
+    for f in method.fields:
+      if fixed.has_key(f.name):
+        args.append(fixed[f.name])
+      elif f.type == "bit" or WIDTHS.has_key(f.type):
+        args.append(method.DEFAULTS[f.type])
+        self.variables.append(f.name)
+        variables[f.name] = True
+      else:
+        raise ValueError("%s.%s: field '%s' of type %s must be fixed" %
+                         (method.klass.name, method.name, f.name, f.type))
+    method.validate(tuple(args))
+
+    # offsets of the variables, from the frame start
+    offsets = {}
+    position = HEADER_SIZE + 4
+    i = 0
+    parts = encode_fields(method, args)
+    for (ftype, count), part in zip(layout(method.fields), parts):
+      for j in range(count):
+        f = method.fields.items[i + j]
+        if variables.has_key(f.name):
+          if ftype == "bit":
+            offsets[f.name] = (None, position + j // 8, 1 << (j % 8))
+          else:
+            offsets[f.name] = (WIDTHS[ftype], position, None)
+      position += len(part)
+      i += count
+    # (name, struct format or None for bits, offset, bit mask)
+    self.slots = [(name,) + offsets[name] for name in self.variables]
+    payload = pack("!HH", method.klass.id, method.id) + "".join(parts)
+    self.frame = encode_frame(type, channel, payload, end)
+
+  # ---------------------------------------
+  def __call__(self, *values, **kwargs):
+    """
+    returns a new frame, the variables taking the given 'values' in order
+    or by name. The keyword argument 'channel' overrides the channel of the
+    template
+    """
+    channel = kwargs.pop("channel", self.channel)
+    if kwargs:
+      values = list(values)
+      for name, fmt, offset, mask in self.slots[len(values):]:
+        if not kwargs.has_key(name):
+          raise TypeError("missing value for '%s'" % name)
+        values.append(kwargs.pop(name))
+      if kwargs:
+        raise TypeError("unexpected values: %s" % ", ".join(kwargs.keys()))
+    if len(values) != len(self.slots):
+      raise TypeError("template takes %d values (%d given)" %
+                      (len(self.slots), len(values)))
+    buf = bytearray(self.frame)
+    if channel != self.channel:
+      pack_into("!H", buf, 1, channel)
+    try:
+      for (name, fmt, offset, mask), value in zip(self.slots, values):
+        if fmt is None:
+          if value:
+            buf[offset] |= mask
+          else:
+            buf[offset] &= ~mask
+        else:
+          pack_into(fmt, buf, offset, value)
+    except StructError, e:
+      raise ValueError("%s.%s: invalid value for %s: %r (%s)" %
+                       (self.method.klass.name, self.method.name, name, value,
+                        e))
+    return str(buf)
+
+# sizes of the values of the fixed width types
+SIZES = {"octet": 1, "short": 2, "long": 4, "longlong": 8, "timestamp": 8}
+
+# -------------------------------------------------------
+def decode_lazy(spec, data, offset = 0, end = FRAME_END):
+  """
+  as decode_frame for a method frame, but returns (MethodFrame, offset of
+  the next frame) without decoding any argument, or None if 'data' does not
+  hold the whole frame yet
+  """
+  if len(data) - offset < HEADER_SIZE:
+    return None
+  type, channel, size = unpack_from(HEADER, data, offset)
+  stop = offset + HEADER_SIZE + size
+  if len(data) <= stop:
+    return None
+  if ord(data[stop]) != end:
+    raise ValueError("frame end expected at offset %d, got %d" %
+                     (stop, ord(data[stop])))
+  if size < 4:
+    raise ValueError("method frame payload too short: %d" % size)
+  class_id, method_id = unpack_from("!HH", data, offset + HEADER_SIZE)
+  method = spec.classes.byid[class_id].methods.byid[method_id]
+  return MethodFrame(method, channel, data[offset:stop + 1]), stop + 1
+
+# ------------------------------
+def field_offsets(method, raw):
+  """
+  returns, for each field of 'method', (offset, type, bit number) within
+  the method frame 'raw', found from the field layout and the length
+  prefixes of the variable width values without decoding any of them
+  """
+  result = []
+  position = HEADER_SIZE + 4
+  limit = len(raw) - 1
+  for type, count in layout(method.fields):
+    if type == "bit":
+      for j in range(count):
+        result.append((position + j // 8, type, j % 8))
+      size = (count + 7) // 8
+    else:
+      result.append((position, type, None))
+      if SIZES.has_key(type):
+        size = SIZES[type]
+      elif type == "shortstr":
+        size = 1 + ord(raw[position])
+      elif type in ("longstr", "table"):
+        size = 4 + unpack_from("!L", raw, position)[0]
+      elif type == "content":
+        size = 5 + unpack_from("!L", raw, position + 1)[0]
+      else:
+        raise ValueError("unknown field type: %s" % type)
+    position += size
+    if position > limit:
+      raise ValueError("%s.%s: frame too short for its fields" %
+                       (method.klass.name, method.name))
+  return result
+
+# -------------------
+# -------------------
+class MethodFrame(object):
+  """
+  a received method frame, its arguments being decoded on first access
+  """
+
+  __slots__ = ["method", "channel", "raw", "_values", "_offsets"]
+
+  # ----------------------------------------
+  def __init__(self, method, channel, raw):
+    """
+    initializations. 'raw' holds the whole frame
+    """
+    self.method = method
+    self.channel = channel
+    self.raw = raw
+    self._values = None
+    self._offsets = None
+
+  # -------------------------
+  def value(self, index):
+    """
+    returns the argument of the field at 'index', decoding it if it has not
+    been yet
+    """
+    values = self._values
+    if values is None:
+      values = self._values = [NOT_DECODED] * len(self.method.fields)
+    v = values[index]
+    if v is NOT_DECODED:
+      if self._offsets is None:
+        self._offsets = field_offsets(self.method, self.raw)
+      offset, type, bit = self._offsets[index]
+      raw = self.raw
+      if bit is not None:
+        v = (ord(raw[offset]) >> bit) & 1 != 0
+      elif SIZES.has_key(type):
+        v = unpack_from(WIDTHS[type], raw, offset)[0]
+      elif type == "shortstr":
+        v = raw[offset + 1:offset + 1 + ord(raw[offset])]
+      elif type == "longstr":
+        v = raw[offset + 4:offset + 4 + unpack_from("!L", raw, offset)[0]]
+      else:
+        v = FrameCodec(StringIO(raw[offset:-1])).decode(type)
+      values[index] = v
+    return v
+
+  # --------------------------
+  def __getitem__(self, key):
+    """
+    returns the argument named or indexed by 'key'
+    """
+    if isinstance(key, basestring):
+      try:
+        key = self.method.fields.indexes[self.method.fields.byname[key]]
+      except KeyError:
+        raise KeyError(key)
+    return self.value(key)
+
+  # ---------------------------
+  def __getattr__(self, name):
+    """
+    returns the argument named 'name'
+    """
+    if name[:1] == "_":
+      raise AttributeError(name)
+    fields = self.method.fields
+    try:
+      field = fields.byname[name]
+    except KeyError:
+      raise AttributeError(name)
+    return self.value(fields.indexes[field])
+
+  # -----------------
+  def values(self):
+    """
+    returns the tuple of all the arguments, as Method.arguments would
+    """
+    return tuple([self.value(i) for i in range(len(self.method.fields))])
+
+  # -----------------
+  def __len__(self):
+    """
+    returns the number of arguments
+    """
+    return len(self.method.fields)
+
+  # ------------------
+  def __repr__(self):
+    """
+    shows the method and the arguments decoded so far
+    """
+    if self._values is None:
+      values = ()
+    else:
+      values = ["%s=%r" % (f.name, v)
+                for f, v in zip(self.method.fields, self._values)
+                if v is not NOT_DECODED]
+    return "<%s.%s frame, channel %s: %s>" % \
+           (self.method.klass.name, self.method.name, self.channel,
+            ", ".join(values))
+
+# marks the arguments of a MethodFrame not decoded yet
+NOT_DECODED = object()
@@ -0,0 +1,200 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Parallel decoding of captured frame streams.
+
+            A capture here is either a file of frames as sent on the wire, one
+            after the other, or a file written by capture.CaptureWriter (told
+            apart by its QPIDCAP1 magic), where each frame follows a record
+            header. Finding the frames only takes reading their size fields,
+            so the file is first scanned for frame boundaries and cut into
+            shards of whole frames (or records). The shards are then decoded by a pool
+            of processes, each of which loads the spec once, reads its shards
+            straight from the file and sends back the decoded frames:
+
+              for offset, type, channel, method, args in \\
+                  decode_file("capture.bin", "amqp.0-9.xml", processes = 8):
+                ...
+
+            The frames come back in file order, offset being that of the frame
+            itself (past its record header in CaptureWriter files). method is
+            "class.method" and args the list of arguments for method frames,
+            both None for the other frames (args is then the payload size).
+            The timestamps and directions of CaptureWriter records are not
+            returned, see capture.Replayer for those.
+
+            See decode_capture.py for the command line tool.
+          """
+
+import mmap, os
+from struct import unpack_from
+import frames, spec as qpid_spec
+from capture import MAGIC, RECORD_SIZE
+
+try:
+  import multiprocessing
+except ImportError:
+  multiprocessing = None
+
+SHARD_SIZE = 8 * 1024 * 1024
+
+# ---------------------------------------------------------
+def scan(data, end, offset = 0, stop = None, skip = 0):
+  """
+  yields the (start, end) offsets of the frames in the string or mmap
+  'data', from 'offset' up to 'stop', each frame following 'skip' bytes of
+  record header. 'end' is the frame end octet of the spec (see
+  frames.frame_constants). A partial frame at the end is left out; a frame
+  without its frame end raises ValueError
+  """
+  if stop is None:
+    stop = len(data)
+  header = frames.HEADER_SIZE
+  endchr = chr(end)
+  while stop - offset >= skip + header:
+    first = offset + skip
+    size = unpack_from("!L", data, first + 3)[0]
+    last = first + header + size
+    if last >= stop:
+      break
+    if data[last] != endchr:
+      raise ValueError("frame end expected at offset %d" % last)
+    yield first, last + 1
+    offset = last + 1
+
+# ----------------------
+def layout(data):
+  """
+  returns (offset of the first frame or record, record header size) of the
+  capture 'data'
+  """
+  if data[:len(MAGIC)] == MAGIC:
+    return len(MAGIC), RECORD_SIZE
+  return 0, 0
+
+# ---------------------------------------------------------------------
+def shards(data, end, size = SHARD_SIZE, offset = 0, skip = 0):
+  """
+  returns a list of (start, end) ranges of 'data' from 'offset' holding
+  whole frames (with their 'skip' bytes of record header), each of them
+  (but for frames larger than that) at most 'size' bytes. See scan for
+  'end'
+  """
+  result = []
+  start = last = offset
+  for first, stop in scan(data, end, offset, None, skip):
+    if stop - start > size and last > start:
+      result.append((start, last))
+      start = first - skip
+    last = stop
+  if last > start:
+    result.append((start, last))
+  return result
+
+# -----------------------------------------------------
+def decode_range(spec, data, start, stop, skip = 0):
+  """
+  returns the decoded frames between 'start' and 'stop' in 'data', as the
+  (offset, type, channel, method, args) tuples described above
+  """
+  method_type, end = frames.frame_constants(spec)
+  result = []
+  for first, last in scan(data, end, start, stop, skip):
+    type, channel, size = unpack_from(frames.HEADER, data, first)
+    if type == method_type:
+      payload = data[first + frames.HEADER_SIZE:last - 1]
+      method, args = frames.decode_method(spec, payload)
+      result.append((first, type, channel,
+                     "%s.%s" % (method.klass.name, method.name), args))
+    else:
+      result.append((first, type, channel, None, size))
+  return result
+
+# the spec of a worker process, see init_worker
+WORKER = {}
+
+# ----------------------------------
+def init_worker(specfile, errata):
+  """
+  loads the spec once in each worker process of the pool
+  """
+  WORKER["spec"] = qpid_spec.load(specfile, *errata)
+
+# ---------------------------
+def decode_shard(args):
+  """
+  decodes the shard (path, start, stop, record header size) in a worker
+  process
+  """
+  path, start, stop, skip = args
+  f = open(path, "rb")
+  try:
+    f.seek(start)
+    data = f.read(stop - start)
+  finally:
+    f.close()
+  result = []
+  for frame in decode_range(WORKER["spec"], data, 0, len(data), skip):
+    result.append((frame[0] + start,) + frame[1:])
+  return result
+
+# ----------------------------------------------------------------------
+def decode_file(path, specfile, errata = (), processes = None,
+                size = SHARD_SIZE):
+  """
+  yields the decoded frames of the capture file 'path', in order, decoding
+  them with a pool of 'processes' processes (by default one per CPU). With
+  a single process, or without multiprocessing, the file is decoded in this
+  process. The frames are split on the frame end of the spec
+  """
+  if multiprocessing is None:
+    processes = 1
+  elif processes is None:
+    processes = multiprocessing.cpu_count()
+  if not os.path.getsize(path):
+    return
+  f = open(path, "rb")
+  try:
+    data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+  finally:
+    f.close()
+  try:
+    offset, skip = layout(data)
+    if processes < 2:
+      spec = qpid_spec.load(specfile, *errata)
+      end = frames.frame_constants(spec)[1]
+      for start, stop in shards(data, end, size, offset, skip):
+        for frame in decode_range(spec, data, start, stop, skip):
+          yield frame
+      return
+    # the workers load the whole spec, here only its constants are needed
+    spec = qpid_spec.load(specfile, *errata, classes = [])
+    ranges = shards(data, frames.frame_constants(spec)[1], size, offset, skip)
+  finally:
+    data.close()
+  pool = multiprocessing.Pool(processes, init_worker, (specfile, tuple(errata)))
+  try:
+    for decoded in pool.imap(decode_shard, [(path, start, stop, skip)
+                                            for start, stop in ranges]):
+      for frame in decoded:
+        yield frame
+  finally:
+    pool.terminate()
+    pool.join()
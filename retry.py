@@ -0,0 +1,319 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Retry policies for the errors the client may retry later.
+
+            ResourceLockedException, ResourceErrorException and
+            ContentTooLargeException tell the client to try again at a later
+            time. RetryPolicies maps exception classes (a class covers its
+            subclasses) to what to do about them:
+
+              Backoff  -- wait for a jittered, exponentially growing delay and
+                          try again, up to a number of attempts
+              Chunking -- send the content again in smaller body frames, and
+                          once these get too small as referenced content
+
+            Sizes learned from ContentTooLargeException are kept per
+            destination (e.g. an (exchange, routing key) pair) and used for
+            the following sends to it, so only the first message of a batch
+            pays for finding them out:
+
+              policies = RetryPolicies()
+
+              def publish(body, frame_size, reference):
+                ...  # on a usable channel, body frames of at most frame_size
+                     # (None: as usual), or as a reference if reference is True
+
+              policies.send(("amq.direct", "work"), publish, body)
+              policies.call("declare work", channel.queue_declare, queue = "work")
+
+            Content given as a ReferenceId is already referenced content: it is
+            always sent with reference True, and ContentTooLargeException for it
+            is raised since there is nothing smaller to send. Otherwise, once
+            Chunking gives up on body frames, the destination is switched to
+            references and the same content is sent again with reference True,
+            for the send function to transfer as referenced content.
+
+            Since channel errors close the channel, the functions given are
+            expected to send on a usable channel every time they are called.
+          """
+
+import random, threading, time
+from reference import ReferenceId
+from exception import ContentTooLargeException, ResourceErrorException, \
+     ResourceLockedException
+
+# ----------------
+# ----------------
+class Backoff:
+  """
+  retry after a jittered exponential delay
+  """
+
+  # ------------------------------------------------------------------------
+  def __init__(self, initial = 0.05, maximum = 10.0, factor = 2.0,
+               jitter = 1.0, attempts = 8):
+    """
+    initializations. The delay before retry n (from 0) is drawn between
+    (1 - jitter) and 1 times min(maximum, initial * factor**n). At most
+    'attempts' retries are made
+    """
+    self.initial = initial
+    self.maximum = maximum
+    self.factor = factor
+    self.jitter = jitter
+    self.attempts = attempts
+
+  # ---------------------------------
+  def delay(self, attempt, random):
+    """
+    returns the delay in seconds before retry number 'attempt', using the
+    function 'random' returning floats in [0, 1)
+    """
+    base = min(self.maximum, self.initial * self.factor ** attempt)
+    return base * (1 - self.jitter * random())
+
+# -----------------
+# -----------------
+class Chunking:
+  """
+  send content refused as too large in smaller body frames, then as a
+  reference
+  """
+
+  # -------------------------------------------------------------------------
+  def __init__(self, factor = 0.5, minimum = 4096, reference = True):
+    """
+    initializations. Each refusal multiplies the frame size by 'factor';
+    once it would go below 'minimum' the content is sent as a reference if
+    'reference' is True, or the error is raised
+    """
+    self.factor = factor
+    self.minimum = minimum
+    self.reference = reference
+
+  # ---------------------------------------
+  def shrink(self, state, size):
+    """
+    updates the Destination 'state' after content of 'size' bytes was
+    refused, 'size' being None for content that already is a reference.
+    Returns False if there is nothing left to try
+    """
+    if state.reference or size is None:
+      return False
+    limit = state.limit
+    if limit is None or limit > size:
+      limit = size
+    limit = int(limit * self.factor)
+    if limit >= self.minimum:
+      state.limit = limit
+      return True
+    if self.reference:
+      state.reference = True
+      return True
+    return False
+
+# -------------------
+# -------------------
+class Destination:
+  """
+  what has been learned about a destination
+  """
+
+  # ------------------
+  def __init__(self):
+    """
+    initializations...
+    """
+    # largest body frame accepted, None if no limit was found
+    self.limit = None
+    # True once content has to be sent as a reference
+    self.reference = False
+    self.retries = 0
+    self.failures = 0
+
+# default policy of each retryable exception
+DEFAULTS = {ResourceLockedException: Backoff(),
+            ResourceErrorException: Backoff(initial = 0.5, maximum = 30.0),
+            ContentTooLargeException: Chunking()}
+
+# ----------------------
+# ----------------------
+class RetryPolicies:
+  """
+  applies the policy of their class to the exceptions raised by a send
+  """
+
+  # ---------------------------------------------------------------------
+  def __init__(self, policies = None, sleep = time.sleep,
+               random = random.random):
+    """
+    initializations. 'policies' maps exception classes to policies, by
+    default DEFAULTS
+    """
+    if policies is None:
+      policies = DEFAULTS
+    self.policies = dict(policies)
+    self.sleep = sleep
+    self.random = random
+    self.lock = threading.Lock()
+    self.destinations = {}
+    # exception class -> policy, following the classes up their bases
+    self.resolved = {}
+
+  # ----------------------------------
+  def register(self, cls, policy):
+    """
+    sets the policy for exceptions of class 'cls' (None: never retry)
+    """
+    self.lock.acquire()
+    try:
+      self.policies[cls] = policy
+      self.resolved = {}
+    finally:
+      self.lock.release()
+
+  # --------------------------
+  def policy(self, error):
+    """
+    returns the policy for the exception 'error', or None
+    """
+    cls = error.__class__
+    try:
+      return self.resolved[cls]
+    except KeyError:
+      pass
+    policy = None
+    for base in cls.__mro__:
+      if self.policies.has_key(base):
+        policy = self.policies[base]
+        break
+    self.resolved[cls] = policy
+    return policy
+
+  # ------------------------------------
+  def destination(self, name):
+    """
+    returns the Destination state kept for 'name'
+    """
+    self.lock.acquire()
+    try:
+      try:
+        return self.destinations[name]
+      except KeyError:
+        state = self.destinations[name] = Destination()
+        return state
+    finally:
+      self.lock.release()
+
+  # ------------------------------
+  def forget(self, name):
+    """
+    drops what was learned about the destination 'name'
+    """
+    self.lock.acquire()
+    try:
+      self.destinations.pop(name, None)
+    finally:
+      self.lock.release()
+
+  # ------------------------------------------------
+  def send(self, destination, send, content):
+    """
+    calls send(content, frame_size, reference) with what is known of
+    'destination' until it no longer raises an error with a policy, and
+    returns its result. Errors without a policy, or whose policy gives up,
+    are raised
+    """
+    state = self.destination(destination)
+    if isinstance(content, ReferenceId):
+      size = None
+    else:
+      size = len(content)
+    attempt = 0
+    while True:
+      try:
+        return send(content, state.limit, size is None or state.reference)
+      except Exception, e:
+        policy = self.policy(e)
+        if isinstance(policy, Chunking):
+          self.lock.acquire()
+          try:
+            retry = policy.shrink(state, size)
+          finally:
+            self.lock.release()
+        elif isinstance(policy, Backoff) and attempt < policy.attempts:
+          self.sleep(policy.delay(attempt, self.random))
+          attempt += 1
+          retry = True
+        else:
+          retry = False
+        if not retry:
+          state.failures += 1
+          raise
+        state.retries += 1
+
+  # ------------------------------------------------------
+  def call(self, destination, func, *args, **kwargs):
+    """
+    calls func(*args, **kwargs), retrying it according to the Backoff
+    policies, and returns its result
+    """
+    state = self.destination(destination)
+    attempt = 0
+    while True:
+      try:
+        return func(*args, **kwargs)
+      except Exception, e:
+        policy = self.policy(e)
+        if not isinstance(policy, Backoff) or attempt >= policy.attempts:
+          state.failures += 1
+          raise
+        self.sleep(policy.delay(attempt, self.random))
+        attempt += 1
+        state.retries += 1
+
+  # ---------------
+  def stats(self):
+    """
+    returns {destination: {'limit': n, 'reference': b, 'retries': n,
+    'failures': n}}
+    """
+    self.lock.acquire()
+    try:
+      result = {}
+      for name, state in self.destinations.items():
+        result[name] = {"limit": state.limit, "reference": state.reference,
+                        "retries": state.retries, "failures": state.failures}
+      return result
+    finally:
+      self.lock.release()
+
+# -----------------------------
+def frames(content, size):
+  """
+  yields 'content' in slices of at most 'size' bytes (all of it at once if
+  'size' is None), for send functions splitting content into body frames
+  """
+  if size is None or size >= len(content):
+    yield content
+    return
+  for i in xrange(0, len(content), size):
+    yield content[i:i + size]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest
+from qpid.reference import ReferenceId
+from qpid.retry import RetryPolicies, Backoff, Chunking
+from qpid.exception import ResourceLockedException, ContentTooLargeException
+from qpid.testlib import run
+
+__doc__ = """
+
+    Unit tests for qpid/retry.py: the retry policies of the retryable errors
+
+    To run standalone:
+    -------------------
+
+        python retry_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        retry_unit_test_output.txt.
+
+"""
+
+# ------------------------------------
+# ------------------------------------
+class RetryTestCase(unittest.TestCase):
+
+    """
+    Handles the retry policies of the retryable errors (qpid/retry.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        policies sleeping and drawing jitter through us
+        """
+        self.sleeps = []
+        self.draw = 0.5
+        self.policies = RetryPolicies({ResourceLockedException: Backoff(initial=0.1, maximum=0.3, jitter=0.5, attempts=3),
+                                       ContentTooLargeException: Chunking(minimum=4096)},
+                                      sleep=self.sleeps.append, random=lambda: self.draw)
+
+    # ---------------------------------
+    def test_backoff(self):
+        """
+        delays grow exponentially up to the maximum, less the jitter, and the attempts are bounded
+        """
+        backoff = Backoff(initial=0.1, maximum=0.3, jitter=0.5)
+        self.failUnlessEqual([backoff.delay(n, lambda: 0.0) for n in range(3)], [0.1, 0.2, 0.3], 'exponential delay FAILED...')
+        self.failUnlessAlmostEqual(backoff.delay(1, lambda: 0.5), 0.15, 7, 'jitter FAILED...')
+        failures = [ResourceLockedException('locked'), ResourceLockedException('locked')]
+        def call():
+            if failures:
+                raise failures.pop()
+            return 'done'
+        self.failUnlessEqual(self.policies.call('q', call), 'done', 'call retried FAILED...')
+        self.failUnlessEqual([round(t, 7) for t in self.sleeps], [0.075, 0.15], 'sleeps FAILED...')
+        def locked():
+            raise ResourceLockedException('locked')
+        self.failUnlessRaises(ResourceLockedException, self.policies.call, 'q', locked)
+        self.failUnlessEqual(self.policies.stats()['q'], {'limit': None, 'reference': False, 'retries': 5, 'failures': 1}, 'stats FAILED...')
+        self.failUnlessRaises(KeyError, self.policies.call, 'q', {}.__getitem__, 'x')
+
+    # ---------------------------------
+    def test_shrink(self):
+        """
+        content refused as too large is sent again in smaller frames, the size learned is reused, then references
+        """
+        calls = []
+        def send(content, size, reference):
+            calls.append((size, reference))
+            if not reference and (size is None or size > limit[0]):
+                raise ContentTooLargeException('too large')
+            return 'sent'
+        limit = [10000]
+        self.failUnlessEqual(self.policies.send('d', send, 'x' * 50000), 'sent', 'send FAILED...')
+        self.failUnlessEqual(calls, [(None, False), (25000, False), (12500, False), (6250, False)], 'shrinking FAILED...')
+        del calls[:]
+        self.policies.send('d', send, 'x' * 50000)
+        self.failUnlessEqual(calls, [(6250, False)], 'learned size FAILED...')
+        del calls[:]
+        limit[0] = 1000
+        self.policies.send('d', send, 'x' * 50000)
+        self.failUnlessEqual(calls, [(6250, False), (6250, True)], 'reference FAILED...')
+        self.failUnlessEqual(self.policies.stats()['d']['reference'], True, 'reference state FAILED...')
+
+    # ---------------------------------
+    def test_reference_content(self):
+        """
+        content already a reference is sent as such, and is not shrunk when refused
+        """
+        calls = []
+        def send(content, size, reference):
+            calls.append(reference)
+            raise ContentTooLargeException('too large')
+        self.failUnlessRaises(ContentTooLargeException, self.policies.send, 'r', send, ReferenceId('ref'))
+        self.failUnlessEqual(calls, [True], 'reference send FAILED...')
+        self.failUnlessEqual(self.policies.stats()['r'], {'limit': None, 'reference': False, 'retries': 0, 'failures': 1}, 'reference state FAILED...')
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([RetryTestCase], 'retry_unit_test_output.txt')
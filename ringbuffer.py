@@ -0,0 +1,336 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Shared memory transport between two processes on the same host.
+
+            A RingBuffer is a file mapped into both processes holding a single
+            producer, single consumer ring of bytes. The producer only ever
+            advances the write position and the consumer the read position, so
+            no lock is needed. It has the read/write/flush interface of a file,
+            so a Codec can encode values straight into it or decode them out of
+            it.
+
+            Transport carries method frames (see frames.py) over a pair of
+            rings and has the invoke() of the classes generated by spec.py:
+
+              # process A
+              transport = Transport(spec,
+                                    RingBuffer("/dev/shm/a-b", 1 << 20, True),
+                                    RingBuffer("/dev/shm/b-a", 1 << 20, True))
+              transport.invoke(spec.parse_method("basic.ack"), (tag, False))
+
+              # process B
+              transport = Transport(spec, RingBuffer("/dev/shm/b-a"),
+                                    RingBuffer("/dev/shm/a-b"))
+              frame = transport.receive()     # a frames.MethodFrame
+
+            Only method frames are carried: methods with content (e.g.
+            basic.publish) need content header and body frames, which the
+            transport does not send, so invoking them with content raises
+            ValueError rather than losing the body. They can still be invoked
+            without content.
+
+            Each side that finds the ring empty (or full) flags itself as
+            waiting and sleeps on a FIFO next to the file; the other side only
+            writes a byte to that FIFO when the flag is set, so while both keep
+            up no system call is made at all. Setting the flag and reading the
+            other side's position are not ordered against each other (not even
+            on x86), so both sides may miss each other; a waiting side therefore
+            checks the ring again every POLL seconds, which bounds the cost of
+            a missed wake up.
+
+            Once the reader has closed the ring, writing to it raises IOError
+            (EPIPE). Once the writer has, the reader drains what is left and
+            then reads EOF.
+
+            The FIFOs are opened for reading and writing without blocking,
+            which is Linux behaviour.
+          """
+
+import mmap, os, select, errno, time
+from struct import pack_into, unpack_from
+import frames
+
+MAGIC = "QPIDRING"
+
+# offsets of the shared header fields, each on its own cache line
+CAPACITY = 8
+HEAD = 64
+TAIL = 128
+READER_WAITING = 192
+WRITER_WAITING = 256
+CLOSED = 320
+
+# offset of the data, after the header
+DATA = 4096
+
+# longest sleep, in seconds, before a waiting side looks at the ring again
+POLL = 0.05
+
+# ----------------
+# ----------------
+class RingBuffer:
+  """
+  a single producer single consumer byte ring in a shared file
+  """
+
+  # -------------------------------------------------------------------------
+  def __init__(self, path, capacity = None, create = False, timeout = None):
+    """
+    maps the ring at 'path', creating it with room for 'capacity' bytes if
+    'create' is True. 'timeout' bounds, in seconds, how long read and write
+    wait for the other side, IOError being raised when it runs out
+    """
+    self.path = path
+    self.timeout = timeout
+    if create:
+      if not capacity or capacity < 1:
+        raise ValueError("invalid capacity: %r" % (capacity,))
+      for fifo in (path + ".data", path + ".space"):
+        if os.path.exists(fifo):
+          os.unlink(fifo)
+        os.mkfifo(fifo)
+      fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0600)
+      os.ftruncate(fd, DATA + capacity)
+    else:
+      fd = os.open(path, os.O_RDWR)
+    try:
+      size = os.fstat(fd).st_size
+      self.map = mmap.mmap(fd, size)
+    finally:
+      os.close(fd)
+    if create:
+      self.map[0:8] = MAGIC
+      pack_into("!Q", self.map, CAPACITY, capacity)
+    elif self.map[0:8] != MAGIC:
+      self.map.close()
+      raise ValueError("not a ring buffer: %s" % path)
+    self.capacity = unpack_from("!Q", self.map, CAPACITY)[0]
+    # woken up by the writer when there is data, and by the reader when
+    # there is space
+    self.data_fifo = os.open(path + ".data", os.O_RDWR | os.O_NONBLOCK)
+    self.space_fifo = os.open(path + ".space", os.O_RDWR | os.O_NONBLOCK)
+
+  # -------------------------
+  def get(self, offset):
+    """
+    returns the shared counter at 'offset'
+    """
+    return unpack_from("!Q", self.map, offset)[0]
+
+  # ------------------------------
+  def set(self, offset, value):
+    """
+    sets the shared counter at 'offset'
+    """
+    pack_into("!Q", self.map, offset, value)
+
+  # ------------------
+  def available(self):
+    """
+    returns the number of bytes waiting to be read
+    """
+    return self.get(HEAD) - self.get(TAIL)
+
+  # -----------------------------
+  def ring(self, fifo, flag):
+    """
+    wakes up the other side if it is waiting on 'fifo'
+    """
+    if self.get(flag):
+      try:
+        os.write(fifo, "\0")
+      except OSError, e:
+        # a full pipe has a wake up pending anyway
+        if e.errno != errno.EAGAIN:
+          raise
+
+  # ---------------------------------------------
+  def wait(self, fifo, flag, ready):
+    """
+    sleeps on 'fifo' until ready() returns True, flagging this side as
+    waiting meanwhile
+    """
+    if self.timeout is None:
+      deadline = None
+    else:
+      deadline = time.time() + self.timeout
+    self.set(flag, 1)
+    try:
+      # the other side may have moved on before seeing the flag
+      while not ready():
+        interval = POLL
+        if deadline is not None:
+          left = deadline - time.time()
+          if left <= 0:
+            raise IOError(errno.ETIMEDOUT, "timed out waiting on %s" %
+                          self.path)
+          interval = min(interval, left)
+        r, w, x = select.select([fifo], [], [], interval)
+        if not r:
+          continue
+        try:
+          os.read(fifo, 4096)
+        except OSError, e:
+          if e.errno != errno.EAGAIN:
+            raise
+    finally:
+      self.set(flag, 0)
+
+  # --------------------
+  def write(self, s):
+    """
+    copies 's' into the ring, waiting for the reader to make room as needed.
+    Raises IOError (EPIPE) if the reader has closed the ring
+    """
+    capacity = self.capacity
+    head = self.get(HEAD)
+    pos = 0
+    while pos < len(s):
+      if self.get(CLOSED):
+        raise IOError(errno.EPIPE, "ring closed: %s" % self.path)
+      free = capacity - (head - self.get(TAIL))
+      if not free:
+        self.wait(self.space_fifo, WRITER_WAITING,
+                  lambda: self.get(HEAD) - self.get(TAIL) < capacity or
+                          self.get(CLOSED))
+        continue
+      n = min(free, len(s) - pos)
+      start = head % capacity
+      first = min(n, capacity - start)
+      self.map[DATA + start:DATA + start + first] = s[pos:pos + first]
+      if first < n:
+        self.map[DATA:DATA + n - first] = s[pos + first:pos + n]
+      pos += n
+      head += n
+      # the data is in place before the reader can see the new head
+      self.set(HEAD, head)
+      self.ring(self.data_fifo, READER_WAITING)
+
+  # ----------------
+  def flush(self):
+    """
+    nothing to do, written data is visible to the reader straight away
+    """
+    pass
+
+  # -------------------
+  def read(self, n):
+    """
+    returns the next 'n' bytes, waiting for the writer as needed. Fewer are
+    returned only once the writer has closed the ring
+    """
+    capacity = self.capacity
+    tail = self.get(TAIL)
+    parts = []
+    while n > 0:
+      avail = self.get(HEAD) - tail
+      if not avail:
+        if self.get(CLOSED):
+          break
+        self.wait(self.data_fifo, READER_WAITING,
+                  lambda: self.get(HEAD) > tail or self.get(CLOSED))
+        continue
+      k = min(avail, n)
+      start = tail % capacity
+      first = min(k, capacity - start)
+      parts.append(self.map[DATA + start:DATA + start + first])
+      if first < k:
+        parts.append(self.map[DATA:DATA + k - first])
+      n -= k
+      tail += k
+      self.set(TAIL, tail)
+      self.ring(self.space_fifo, WRITER_WAITING)
+    return "".join(parts)
+
+  # ----------------
+  def close(self):
+    """
+    closes this side of the ring. Closing the writing side lets the reader
+    drain what is left and then read EOF, closing the reading side makes
+    the writer fail
+    """
+    if self.map is None:
+      return
+    self.set(CLOSED, 1)
+    self.ring(self.data_fifo, READER_WAITING)
+    self.ring(self.space_fifo, WRITER_WAITING)
+    self.map.close()
+    self.map = None
+    os.close(self.data_fifo)
+    os.close(self.space_fifo)
+
+  # -----------------
+  def unlink(self):
+    """
+    removes the files of the ring
+    """
+    for path in (self.path, self.path + ".data", self.path + ".space"):
+      try:
+        os.unlink(path)
+      except OSError, e:
+        if e.errno != errno.ENOENT:
+          raise
+
+# ----------------
+# ----------------
+class Transport:
+  """
+  method frames over a pair of rings, one per direction
+  """
+
+  # -------------------------------------------------------
+  def __init__(self, spec, outgoing, incoming, channel = 0):
+    """
+    initializations. 'outgoing' and 'incoming' are RingBuffers
+    """
+    self.spec = spec
+    self.outgoing = outgoing
+    self.incoming = incoming
+    self.channel = channel
+    self.type, self.end = frames.frame_constants(spec)
+
+  # -----------------------------------------------------
+  def invoke(self, method, args, content = None):
+    """
+    sends the frame of 'method' with the tuple of arguments 'args', as the
+    methods generated by spec.py do. Content is not supported, see above
+    """
+    if content is not None:
+      raise ValueError("%s.%s: content is not carried by this transport" %
+                       (method.klass.name, method.name))
+    self.outgoing.write(frames.encode_method(method, args, self.channel,
+                                             self.type, self.end))
+
+  # ------------------
+  def receive(self):
+    """
+    returns the next incoming frame as a frames.MethodFrame, or None once the
+    other side has closed its ring
+    """
+    header = self.incoming.read(frames.HEADER_SIZE)
+    if len(header) < frames.HEADER_SIZE:
+      return None
+    size = unpack_from(frames.HEADER, header)[2]
+    data = header + self.incoming.read(size + 1)
+    result = frames.decode_lazy(self.spec, data, 0, self.end)
+    if result is None:
+      raise IOError(errno.EPIPE, "truncated frame in %s" % self.incoming.path)
+    return result[0]
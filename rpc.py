@@ -0,0 +1,212 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Matching of synchronous method responses to their waiting requests.
+
+            PendingRPCs files each outstanding request under (channel,
+            response) for every method in its Method.responses, so an incoming
+            response finds its waiter with two dict lookups however many
+            channels and requests are outstanding. (spec.load also indexes the
+            reverse, Method.requests, for code starting from a response; the
+            table here does not need it.)
+
+              pending = PendingRPCs(LatencyHistograms())
+              pending.expect(channel, queue_declare, waiter)
+              ...
+              request, waiter = pending.complete(channel, queue_declare_ok)
+
+            Requests on one channel that accept the same response are completed
+            in the order they were sent.
+          """
+
+import threading, time
+from collections import deque
+
+# ------------------
+# ------------------
+class PendingRPCs:
+  """
+  per channel table of outstanding synchronous requests
+  """
+
+  # ------------------------------------------------------
+  def __init__(self, histograms = None, timer = time.time):
+    """
+    initializations. Latencies are recorded into 'histograms' if given
+    """
+    self.lock = threading.Lock()
+    # channel -> response method -> deque of entries
+    self.channels = {}
+    self.histograms = histograms
+    self.timer = timer
+
+  # --------------------------------------------------
+  def expect(self, channel, request, waiter = None):
+    """
+    records that the synchronous 'request' method was sent on 'channel' and
+    that 'waiter' (anything the caller wants back) is waiting for its response
+    """
+    if not request.responses:
+      raise ValueError("%s.%s has no responses" % (request.klass.name,
+                                                    request.name))
+    # [request, waiter, start time, pending]
+    entry = [request, waiter, self.timer(), True]
+    self.lock.acquire()
+    try:
+      table = self.channels.setdefault(channel, {})
+      for r in request.responses:
+        try:
+          table[r].append(entry)
+        except KeyError:
+          table[r] = deque([entry])
+    finally:
+      self.lock.release()
+
+  # -----------------------------------------
+  def complete(self, channel, response):
+    """
+    returns (request, waiter) for the oldest request on 'channel' completed by
+    the 'response' method, or None if no request was waiting for it
+    """
+    now = self.timer()
+    self.lock.acquire()
+    try:
+      try:
+        queue = self.channels[channel][response]
+      except KeyError:
+        return None
+      while queue:
+        entry = queue.popleft()
+        if entry[3]:
+          break
+      else:
+        return None
+      entry[3] = False
+      # drop the entry from the queues of the request's other responses too
+      table = self.channels[channel]
+      for r in entry[0].responses:
+        if r is not response:
+          other = table.get(r)
+          if other and other[0] is entry:
+            other.popleft()
+    finally:
+      self.lock.release()
+    if self.histograms is not None:
+      self.histograms.record(entry[0], response, now - entry[2])
+    return entry[0], entry[1]
+
+  # --------------------------
+  def cancel(self, channel):
+    """
+    forgets every request outstanding on 'channel' (e.g. when it is closed)
+    and returns their (request, waiter) pairs
+    """
+    self.lock.acquire()
+    try:
+      table = self.channels.pop(channel, {})
+    finally:
+      self.lock.release()
+    result = []
+    for queue in table.values():
+      for entry in queue:
+        if entry[3]:
+          entry[3] = False
+          result.append((entry[0], entry[1]))
+    return result
+
+  # ---------------------------
+  def pending(self, channel):
+    """
+    returns the number of requests outstanding on 'channel'
+    """
+    self.lock.acquire()
+    try:
+      entries = {}
+      for queue in self.channels.get(channel, {}).values():
+        for entry in queue:
+          if entry[3]:
+            entries[id(entry)] = True
+      return len(entries)
+    finally:
+      self.lock.release()
+
+# upper bounds of the latency buckets, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ------------------------
+# ------------------------
+class LatencyHistograms:
+  """
+  latency histograms per (request, response) pair
+  """
+
+  # -----------------------------------------
+  def __init__(self, buckets = BUCKETS):
+    """
+    initializations...
+    """
+    self.buckets = buckets
+    self.lock = threading.Lock()
+    self.histograms = {}
+
+  # ----------------------------------------------
+  def record(self, request, response, seconds):
+    """
+    adds one request/response round trip taking 'seconds'
+    """
+    key = ("%s.%s" % (request.klass.name, request.name),
+           "%s.%s" % (response.klass.name, response.name))
+    index = 0
+    for bound in self.buckets:
+      if seconds <= bound:
+        break
+      index += 1
+    self.lock.acquire()
+    try:
+      try:
+        hist = self.histograms[key]
+      except KeyError:
+        # counts per bucket (plus overflow), count, total
+        hist = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+      hist[0][index] += 1
+      hist[1] += 1
+      hist[2] += seconds
+    finally:
+      self.lock.release()
+
+  # ------------------
+  def snapshot(self):
+    """
+    returns {'request -> response': {'count': n, 'mean': s, 'buckets':
+    [(upper bound, n), ...]}}, the last bound being None for the overflow
+    """
+    self.lock.acquire()
+    try:
+      result = {}
+      bounds = list(self.buckets) + [None]
+      for (request, response), (counts, count, total) in \
+          self.histograms.items():
+        result["%s -> %s" % (request, response)] = \
+          {"count": count, "mean": total / count,
+           "buckets": zip(bounds, counts)}
+      return result
+    finally:
+      self.lock.release()
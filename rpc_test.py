@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest
+from qpid import spec as qpid_spec
+from qpid.rpc import PendingRPCs, LatencyHistograms
+from qpid.testlib import SpecTestBase, run
+
+__doc__ = """
+
+    Unit tests for qpid/rpc.py: matching responses to their pending requests
+
+    To run standalone:
+    -------------------
+
+        python rpc_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        rpc_unit_test_output.txt.
+
+"""
+
+# ----------------------------------
+# ----------------------------------
+class RPCTestCase(SpecTestBase):
+
+    """
+    Handles matching responses to their pending requests (qpid/rpc.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        loads the spec and a pending table on a clock of our own
+        """
+        SpecTestBase.setUp(self)
+        self.spec = qpid_spec.load(self.specfile)
+        self.now = [0.0]
+        self.histograms = LatencyHistograms()
+        self.pending = PendingRPCs(self.histograms, timer=lambda: self.now[0])
+        self.declare = self.spec.parse_method('queue.declare')
+        self.declare_ok = self.spec.parse_method('queue.declare_ok')
+
+    # ---------------------------------
+    def test_complete_in_order(self):
+        """
+        responses complete the oldest request of their own channel and record its latency
+        """
+        self.pending.expect(1, self.declare, 'first')
+        self.pending.expect(1, self.declare, 'second')
+        self.pending.expect(2, self.declare, 'other channel')
+        self.failUnlessEqual(self.pending.pending(1), 2, 'pending count FAILED...')
+        self.now[0] = 0.003
+        self.failUnlessEqual(self.pending.complete(1, self.declare_ok), (self.declare, 'first'), 'oldest first FAILED...')
+        self.failUnlessEqual(self.pending.complete(1, self.declare_ok), (self.declare, 'second'), 'second FAILED...')
+        self.failUnlessEqual(self.pending.complete(1, self.declare_ok), None, 'nothing waiting FAILED...')
+        self.failUnlessEqual(self.pending.complete(3, self.declare_ok), None, 'unknown channel FAILED...')
+        self.failUnlessEqual(self.pending.cancel(2), [(self.declare, 'other channel')], 'cancel FAILED...')
+        self.failUnlessEqual(self.pending.pending(2), 0, 'cancelled FAILED...')
+        stats = self.histograms.snapshot()['queue.declare -> queue.declare_ok']
+        self.failUnlessEqual(stats['count'], 2, 'histogram count FAILED...')
+        self.failUnlessEqual(dict(stats['buckets'])[0.005], 2, 'histogram bucket FAILED...')
+
+    # ---------------------------------
+    def test_several_responses(self):
+        """
+        a request accepting several responses is completed once, by whichever comes first
+        """
+        close_ok, open_ok = self.spec.parse_method('channel.close_ok'), self.spec.parse_method('channel.open_ok')
+        class Request:
+            klass = self.declare.klass
+            name = 'either'
+            responses = [close_ok, open_ok]
+        request = Request()
+        self.pending.expect(1, request, 'waiter')
+        self.failUnlessEqual(self.pending.complete(1, open_ok), (request, 'waiter'), 'first response FAILED...')
+        self.failUnlessEqual(self.pending.complete(1, close_ok), None, 'completed twice FAILED...')
+        self.failUnlessEqual(self.pending.pending(1), 0, 'pending count FAILED...')
+        self.failUnlessRaises(ValueError, self.pending.expect, 1, self.spec.parse_method('basic.ack'))
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([RPCTestCase], 'rpc_unit_test_output.txt')
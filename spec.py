@@ -37,16 +37,23 @@ __doc__ = """
                                       Modified function Method.define_method so that __doc__ will return the contents of docstring()
           """
 
-import re, textwrap, new, xmlutil
+import re, textwrap, new, xmlutil, validation
+
+try:
+  import multiprocessing
+except ImportError:
+  multiprocessing = None
 
 # -------------------
 # -------------------
-class SpecContainer:
+class SpecContainer(object):
   """
   Class encapsulating each of the accessable entities in the spec file e.g
   fields, constants, classes etc
   """
 
+  __slots__ = ["items", "byname", "byid", "indexes"]
+
   # ------------------
   def __init__(self):
     """
@@ -100,11 +107,17 @@ class SpecContainer:
 
 # --------------
 # --------------
-class Metadata:
+class Metadata(object):
   """
   Base class containing several common functions
+
+  The subclasses describing spec entities declare __slots__ so that a loaded
+  spec carries no per instance __dict__. Spec itself keeps one since the
+  generated module and class are attached to it after loading.
   """
 
+  __slots__ = []
+
   PRINT = []
 
   # -------------------
@@ -148,6 +161,14 @@ class Spec(Metadata):
     self.major = major
     self.minor = minor
     self.file = file
+    self.errata = ()
+    # False if the doc strings of the spec were dropped while loading
+    self.keep_docs = True
+    # names of the classes loaded, None if all of them were
+    self.selected = None
+    # how the spec files were parsed, for extend() and apply_errata()
+    self.processes = None
+    self.compact = False
     self.constants = SpecContainer()
     self.classes = SpecContainer()
     # methods indexed by classname_methname
@@ -218,6 +239,8 @@ class Constant(Metadata):
   class encpsulating all 'constant' tag data
   """
 
+  __slots__ = ["spec", "name", "id", "klass", "docs"]
+
   PRINT=["name", "id"]
 
   # ------------------------------------------------
@@ -239,6 +262,8 @@ class Class(Metadata):
   class encpsulating all 'class' tag data
   """
 
+  __slots__ = ["spec", "name", "id", "handler", "fields", "methods", "docs"]
+
   PRINT=["name", "id"]
 
   # -------------------------------------------------
@@ -265,6 +290,25 @@ class Class(Metadata):
       methods[m.name] = m.define_method(m.name)
     return type(name, (), methods)
 
+# -------------------------
+# -------------------------
+class InstanceDoc(object):
+  """
+  descriptor computing the doc string of an instance with a function, while
+  the class itself keeps its own doc string (so help() on the class works)
+  """
+
+  # ---------------------------------
+  def __init__(self, function, doc):
+    self.function = function
+    self.doc = doc
+
+  # --------------------------------
+  def __get__(self, instance, owner):
+    if instance is None:
+      return self.doc
+    return self.function(instance)
+
 # ----------------------
 # ----------------------
 class Method(Metadata):
@@ -272,6 +316,10 @@ class Method(Metadata):
   class encpsulating all 'method' tag data
   """
 
+  __slots__ = ["klass", "name", "id", "content", "responses", "synchronous",
+               "fields", "description", "docs", "response", "requests",
+               "_functions", "_validator"]
+
   PRINT=["name", "id"]
 
   # -------------------------------------------------------------------
@@ -291,6 +339,11 @@ class Method(Metadata):
     self.description = description
     self.docs = docs
     self.response = False
+    # the methods this method is a response to, the reverse of 'responses'
+    self.requests = []
+    # functions generated by define_method, by name
+    self._functions = None
+    self._validator = None
 
   # ------------------------------------
   def arguments(self, *args, **kwargs):
@@ -319,6 +372,38 @@ class Method(Metadata):
         self._type_error("got an unexpected keyword argument '%s'", key)
     return tuple(result)
 
+  # --------------------
+  def validator(self):
+    """
+    returns the validation.Validator checking the arguments of this method,
+    compiling it on first use. Its 'mode' can be set to override the module
+    wide validation mode for this method
+    """
+    if self._validator is None:
+      self._validator = validation.Validator(self)
+    return self._validator
+
+  # --------------------------
+  def validate(self, args):
+    """
+    checks a tuple of arguments (as returned by arguments()) against the
+    field types, raising ValueError before anything gets encoded. Called by
+    the generated methods
+    """
+    if self._validator is None:
+      self._validator = validation.Validator(self)
+    self._validator(args)
+
+  # ----------------------------------------
+  def template(self, channel = 0, **fixed):
+    """
+    returns a frames.FrameTemplate of this method with the field values
+    'fixed', emitting frames for the values of the other fields
+    """
+    import frames
+    type, end = frames.frame_constants(self.klass.spec)
+    return frames.FrameTemplate(self, channel, type, end, **fixed)
+
   # ---------------------------------
   def _type_error(self, msg, *args):
     """
@@ -332,7 +417,7 @@ class Method(Metadata):
     places the contents in the 'doc' tag of the method definition from the xml specification document into the methods
     docstring
     """
-    s = "\n\n".join([fill(d, 2) for d in [self.description] + self.docs])
+    s = "\n\n".join([fill(d, 2) for d in [self.description] + list(self.docs)])
     for f in self.fields:
       if f.docs:
         s += "\n\n" + "\n\n".join([fill(f.docs[0], 4, f.name)] +
@@ -343,6 +428,10 @@ class Method(Metadata):
         s += r.name + " "
     return s
 
+  # there is no instance __dict__ to store the doc string of a method in, so
+  # __doc__ is computed on access instead
+  __doc__ = InstanceDoc(docstring, __doc__)
+
   METHOD = "__method__"
   DEFAULTS = {"bit": False,
               "shortstr": "",
@@ -359,9 +448,14 @@ class Method(Metadata):
   def define_method(self, name):
     """
     returns a code object for a method named 'name'
-    """
 
-    self.__dict__['__doc__'] = self.docstring()
+    the result is cached, so methods shared between several specs (see
+    specregistry.py) are only compiled once
+    """
+    if self._functions is None:
+      self._functions = {}
+    elif self._functions.has_key(name):
+      return self._functions[name]
 
     g = {Method.METHOD: self}
     l = {}
@@ -373,15 +467,17 @@ class Method(Metadata):
            (name, ", ".join(["%s = %r" % a for a in args]))
     code += "  %r\n" % self.docstring()
     argnames = ", ".join([a[0] for a in methargs])
-    code += "  return self.invoke(%s" % Method.METHOD
     if argnames:
-      code += ", (%s,)" % argnames
+      code += "  __args__ = (%s,)\n" % argnames
+      code += "  %s.validate(__args__)\n" % Method.METHOD
+      code += "  return self.invoke(%s, __args__" % Method.METHOD
     else:
-      code += ", ()" 
+      code += "  return self.invoke(%s, ()" % Method.METHOD
     if self.content:
       code += ", content"
     code += ")"
     exec code in g, l
+    self._functions[name] = l[name]
     return l[name]
 
 # ---------------------
@@ -391,6 +487,8 @@ class Field(Metadata):
   class encpsulating all 'field' tag data
   """
 
+  __slots__ = ["name", "id", "type", "docs"]
+
   PRINT=["name", "id", "type"]
 
   # ----------------------------------------
@@ -404,15 +502,31 @@ class Field(Metadata):
     self.type = type
     self.docs = docs
 
-# ----------------
-def get_docs(nd):
+# shared by every entity loaded without docs
+NO_DOCS = ()
+
+# ------------------------------
+def get_docs(nd, keep = True):
   """
-  returns the contents of the 'doc' child tag of the node 'nd'
+  returns the contents of the 'doc' child tag of the node 'nd', or NO_DOCS if
+  'keep' is False
   """
-  return [n.text for n in nd["doc"]]
+  if keep:
+    return [n.text for n in nd["doc"]]
+  else:
+    return NO_DOCS
 
-# -------------------------------
-def load_fields(nd, l, domains):
+# --------------------------------
+def resolve_type(type, domains):
+  """
+  follows the chain of domain typedefs starting at 'type' down to a basic type
+  """
+  while domains.has_key(type) and domains[type] != type:
+    type = domains[type]
+  return type
+
+# ---------------------------------------------
+def load_fields(nd, l, domains, docs = True):
   """
   Loads the class fields into the class.fields SpecContainer
   """
@@ -421,67 +535,305 @@ def load_fields(nd, l, domains):
       type = f_nd["@domain"]
     except KeyError:
       type = f_nd["@type"]
-    while domains.has_key(type) and domains[type] != type:
-      type = domains[type]
-    l.add(Field(pythonize(f_nd["@name"]), f_nd.index(), type, get_docs(f_nd)))
+    type = intern(str(resolve_type(type, domains)))
+    l.add(Field(pythonize(f_nd["@name"]), f_nd.index(), type,
+                get_docs(f_nd, docs)))
 
-# ---------------------------
-def load(specfile, *errata):
+# ----------------------
+def load_domains(root):
   """
-  interface to the outside world
-  
-  traverses the specfile, and creates object representations of the tags such as constants, fields
-  class and so on. These are placed into the Spec object.
+  returns the domain typedefs of the 'amqp' node 'root' as a dict
   """
-  doc = xmlutil.parse(specfile)
-  spec_root = doc["amqp"][0]
+  domains = {}
+  for nd in root["domain"]:
+    domains[nd["@name"]] = nd["@type"]
+  return domains
+
+# ----------------------------------
+def load_constants(spec, root):
+  """
+  adds the constants of the 'amqp' node 'root' to the spec
+  """
+  for nd in root["constant"]:
+    const = Constant(spec, pythonize(nd["@name"]), int(nd["@value"]),
+                     nd.get("@class"), get_docs(nd, spec.keep_docs))
+    spec.constants.add(const)
+
+# ----------------------------------------------
+def load_classes(spec, root, domains, base, classes = None):
+  """
+  adds the classes, methods and fields of the 'amqp' node 'root' to the spec.
+  If 'base' is True the classes and methods are created, otherwise (errata)
+  they must already exist and only their fields are extended. If 'classes'
+  is given only the classes named in it are loaded
+
+  returns the list of methods created or extended
+  """
+  docs = spec.keep_docs
+  loaded = []
+  for c_nd in root["class"]:
+    cname = pythonize(c_nd["@name"])
+    if classes is not None and cname not in classes:
+      continue
+    if base:
+      klass = Class(spec, cname, int(c_nd["@index"]), c_nd["@handler"],
+                    get_docs(c_nd, docs))
+      spec.classes.add(klass)
+    else:
+      klass = spec.classes.byname[cname]
+
+    added_methods = []
+    load_fields(c_nd, klass.fields, domains, docs)
+    for m_nd in c_nd["method"]:
+      mname = pythonize(m_nd["@name"])
+      if base:
+        meth = Method(klass, mname,
+                      int(m_nd["@index"]),
+                      m_nd.get_bool("@content", False),
+                      [pythonize(nd["@name"]) for nd in m_nd["response"]],
+                      m_nd.get_bool("@synchronous", False),
+                      (docs and m_nd.text) or "",
+                      get_docs(m_nd, docs))
+        klass.methods.add(meth)
+        added_methods.append(meth)
+      else:
+        meth = klass.methods.byname[mname]
+      load_fields(m_nd, meth.fields, domains, docs)
+      loaded.append(meth)
+    # resolve the responses
+    for m in added_methods:
+      m.responses = [klass.methods.byname[r] for r in m.responses]
+      for resp in m.responses:
+        resp.response = True
+        resp.requests.append(m)
+  return loaded
+
+# ------------------------------------------------
+def load_root(spec, root, base, classes = None):
+  """
+  loads the constants, domains and classes of the 'amqp' node 'root' into the
+  spec, see load_classes for 'base' and 'classes'
+  """
+  load_constants(spec, root)
+  # domains are typedefs
+  domains = load_domains(root)
+  load_classes(spec, root, domains, base, classes)
+
+# --------------------------------------------
+def parse_root(specfile, classes = None, compact = False):
+  """
+  parses 'specfile' and returns its 'amqp' node. If 'classes' is given, the
+  class nodes not named in it are left out of the tree. If 'compact' is True
+  the document is kept in an xmlutil.CompactTree
+  """
+  if classes is None:
+    prune = None
+  else:
+    def prune(parent, name, attrs):
+      return name == "class" and parent.name == "amqp" and \
+             pythonize(attrs["name"]) not in classes
+  return xmlutil.parse(specfile, prune, compact)["amqp"][0]
+
+# -----------------------
+def _parse_root(args):
+  """
+  parse_root taking its arguments as one tuple, as needed by Pool.map
+  """
+  return parse_root(*args)
+
+# -----------------------------------------------------
+def parse_roots(files, classes = None, processes = None, compact = False):
+  """
+  returns the 'amqp' nodes of 'files', in order. If 'processes' is more than
+  one the files are parsed concurrently by a pool of that many processes
+  """
+  if processes is None or processes < 2 or len(files) < 2 or \
+     multiprocessing is None:
+    return [parse_root(f, classes, compact) for f in files]
+  pool = multiprocessing.Pool(min(processes, len(files)))
+  try:
+    return pool.map(_parse_root, [(f, classes, compact) for f in files])
+  finally:
+    pool.close()
+    pool.join()
+
+# --------------------------------------------------------------------
+def build(specfile, errata = (), docs = True, classes = None,
+          processes = None, compact = False):
+  """
+  parses 'specfile' and the 'errata' files and loads them into a new Spec,
+  without generating the module and class (see Spec.post_load). If
+  'classes' is given, only the classes named in it are loaded. See
+  parse_roots for 'processes' and parse_root for 'compact'
+  """
+  if classes is not None:
+    classes = set(map(pythonize, classes))
+  roots = parse_roots([specfile] + list(errata), classes, processes, compact)
+  spec_root = roots[0]
+  errata_roots = roots[1:]
   spec = Spec(int(spec_root["@major"]), int(spec_root["@minor"]), specfile)
+  spec.keep_docs = docs
+  spec.errata = tuple(errata)
+  spec.selected = classes
+  spec.processes = processes
+  spec.compact = compact
+
+  load_root(spec, spec_root, True, classes)
+  for root in errata_roots:
+    load_root(spec, root, False, classes)
+  if classes is not None:
+    missing = [c for c in classes if not spec.classes.byname.has_key(c)]
+    if missing:
+      raise ValueError("no such classes: %s" % ", ".join(missing))
+  return spec
 
-  for root in [spec_root] + map(lambda x: xmlutil.parse(x)["amqp"][0], errata):
-    # constants
-    for nd in root["constant"]:
-      const = Constant(spec, pythonize(nd["@name"]), int(nd["@value"]),
-                       nd.get("@class"), get_docs(nd))
-      spec.constants.add(const)
+# ---------------------------
+def extend(spec, classes):
+  """
+  loads further 'classes' into a spec that was loaded with a classes filter,
+  and regenerates its module and class. The files are parsed with the
+  processes and compact options the spec was loaded with. The functions of
+  the methods that were already loaded are reused rather than compiled again
+  """
+  if spec.selected is None:
+    return spec
+  wanted = set(map(pythonize, classes)) - spec.selected
+  if not wanted:
+    return spec
+  roots = parse_roots([spec.file] + list(spec.errata), wanted,
+                      spec.processes, spec.compact)
+  for i, root in enumerate(roots):
+    load_classes(spec, root, load_domains(root), i == 0, wanted)
+  missing = [c for c in wanted if not spec.classes.byname.has_key(c)]
+  if missing:
+    raise ValueError("no such classes: %s" % ", ".join(missing))
+  spec.selected = spec.selected | wanted
+  spec.post_load()
+  return spec
 
-    # domains are typedefs
-    domains = {}
-    for nd in root["domain"]:
-      domains[nd["@name"]] = nd["@type"]
+# ------------------------------
+def copy_fields(fields):
+  """
+  returns a new SpecContainer holding the same Fields as 'fields'
+  """
+  result = SpecContainer()
+  for f in fields:
+    result.add(f)
+  return result
 
-    # classes
+# ------------------------
+def unshare_class(klass):
+  """
+  replaces the fields and methods of 'klass' by copies, so that errata can
+  extend them without changing the specs they may be shared with (see
+  specregistry.py). Responses and requests only ever refer to methods of
+  the same class, so they are remapped to the copies
+  """
+  klass.fields = copy_fields(klass.fields)
+  copies = {}
+  for m in klass.methods:
+    c = Method(klass, m.name, m.id, m.content, m.responses, m.synchronous,
+               m.description, m.docs)
+    c.fields = copy_fields(m.fields)
+    c.response = m.response
+    c.requests = m.requests
+    copies[m] = c
+  methods = SpecContainer()
+  for m in klass.methods:
+    c = copies[m]
+    c.responses = [copies.get(r, r) for r in c.responses]
+    c.requests = [copies.get(r, r) for r in c.requests]
+    methods.add(c)
+  klass.methods = methods
+
+# ------------------------------------------------
+def apply_errata(spec, *errata, **options):
+  """
+  layers the 'errata' files onto an already loaded (e.g. cached) spec. The
+  classes the errata touch get their own copies of their fields and methods
+  first, so specs sharing them in a SpecRegistry are not affected. Only the
+  methods of those classes are compiled again; their new functions replace
+  the old ones in the generated module and class, which are otherwise left
+  as they are.
+
+  options:
+    processes, compact -- as for load(), by default those the spec was
+                          loaded with. The docs and classes of the spec
+                          are those it was loaded with
+  """
+  for name in ("docs", "classes"):
+    if options.has_key(name):
+      raise TypeError("apply_errata() does not take '%s', the spec keeps "
+                      "the one it was loaded with" % name)
+  options.setdefault("processes", spec.processes)
+  options.setdefault("compact", spec.compact)
+  options = load_options("apply_errata", options)
+  roots = parse_roots(list(errata), spec.selected, options["processes"],
+                      options["compact"])
+  touched = []
+  for root in roots:
     for c_nd in root["class"]:
-      cname = pythonize(c_nd["@name"])
-      if root == spec_root:
-        klass = Class(spec, cname, int(c_nd["@index"]), c_nd["@handler"],
-                      get_docs(c_nd))
-        spec.classes.add(klass)
-      else:
-        klass = spec.classes.byname[cname]
-
-      added_methods = []
-      load_fields(c_nd, klass.fields, domains)
-      for m_nd in c_nd["method"]:
-        mname = pythonize(m_nd["@name"])
-        if root == spec_root:
-          meth = Method(klass, mname,
-                        int(m_nd["@index"]),
-                        m_nd.get_bool("@content", False),
-                        [pythonize(nd["@name"]) for nd in m_nd["response"]],
-                        m_nd.get_bool("@synchronous", False),
-                        m_nd.text,
-                        get_docs(m_nd))
-          klass.methods.add(meth)
-          added_methods.append(meth)
-        else:
-          meth = klass.methods.byname[mname]
-        load_fields(m_nd, meth.fields, domains)
-      # resolve the responses
-      for m in added_methods:
-        m.responses = [klass.methods.byname[r] for r in m.responses]
-        for resp in m.responses:
-          resp.response = True
+      klass = spec.classes.byname[pythonize(c_nd["@name"])]
+      if klass not in touched:
+        replaced = dict([(m, True) for m in klass.methods])
+        unshare_class(klass)
+        touched.append(klass)
+        # forget the lookups of Spec.method() answered with the old methods
+        for name, m in spec.methods.items():
+          if replaced.has_key(m):
+            del spec.methods[name]
+  for root in roots:
+    load_constants(spec, root)
+    load_classes(spec, root, load_domains(root), False, spec.selected)
+  spec.errata = spec.errata + errata
+
+  if hasattr(spec, "module"):
+    for klass in touched:
+      cls = getattr(spec.module, klass.name)
+      for m in klass.methods:
+        setattr(cls, m.name, m.define_method(m.name))
+        meth = klass.name + "_" + m.name
+        setattr(spec.klass, meth, m.define_method(meth))
+  return spec
+
+# ---------------------------------
+def load_options(name, options):
+  """
+  returns the keyword arguments accepted by build() out of the keyword
+  arguments 'options' given to the function 'name'
+  """
+  result = {"docs": options.pop("docs", True),
+            "classes": options.pop("classes", None),
+            "processes": options.pop("processes", None),
+            "compact": options.pop("compact", False)}
+  if options:
+    raise TypeError("%s() got an unexpected keyword argument '%s'" %
+                    (name, options.keys()[0]))
+  return result
 
+# --------------------------------------
+def load(specfile, *errata, **options):
+  """
+  interface to the outside world
+  
+  traverses the specfile, and creates object representations of the tags such as constants, fields
+  class and so on. These are placed into the Spec object.
+
+  options:
+    docs -- if False the doc strings of the spec are not kept, which saves a
+            good deal of memory when they are not going to be browsed
+    classes -- names of the classes to load, e.g. ["connection", "channel",
+               "basic"]. The others are skipped while parsing and are not
+               generated. More can be added later with extend()
+    processes -- number of processes used to parse the spec and errata
+                 files concurrently. They are still merged in the order
+                 given, so the result is the same as a sequential load
+    compact -- if True the xml is parsed into flat arrays (see
+               xmlutil.CompactTree) rather than a tree of Node objects,
+               which is much lighter on memory and the garbage collector
+               for large, documented specs
+  """
+  spec = build(specfile, errata, **load_options("load", options))
   spec.post_load()
   return spec
 
@@ -494,6 +846,7 @@ def pythonize(name):
   """
   Converts spaces(' ') and hypens('-') to underscores('_')
   Also performs keyword replacements e.g global is changed to global_ etc
+  The result is interned, names are repeated a lot across a spec
   """
   name = str(name)
   for key, val in REPLACE.items():
@@ -502,7 +855,7 @@ def pythonize(name):
     name = KEYWORDS[name]
   except KeyError:
     pass
-  return name
+  return intern(name)
 
 # --------------------------------------
 def fill(text, indent, heading = None):
@@ -526,6 +879,8 @@ class Rule(Metadata):
   class encapsulating the 'rule' tag of the xml specification doc
   """
 
+  __slots__ = ["text", "implement", "tests", "path"]
+
   PRINT = ["text", "implement", "tests"]
 
   # ------------------------------------------------
@@ -543,17 +898,16 @@ def find_rules(node, rules):
   """
   ? - dosen't seem to be used
   """
-  if node.name == "rule":
-    rules.append(Rule(node.text, node.get("@implement"),
-                      [ch.text for ch in node if ch.name == "test"],
-                      node.path()))
-  if node.name == "doc" and node.get("@name") == "rule":
-    tests = []
-    if node.has("@test"):
-      tests.append(node["@test"])
-    rules.append(Rule(node.text, None, tests, node.path()))
-  for child in node:
-    find_rules(child, rules)
+  for node in node.walk():
+    if node.name == "rule":
+      rules.append(Rule(node.text, node.get("@implement"),
+                        [ch.text for ch in node if ch.name == "test"],
+                        node.path()))
+    if node.name == "doc" and node.get("@name") == "rule":
+      tests = []
+      if node.has("@test"):
+        tests.append(node["@test"])
+      rules.append(Rule(node.text, None, tests, node.path()))
 
 # ------------------------
 def load_rules(specfile):
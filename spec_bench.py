@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import gc, os, sys, time, shutil, tempfile
+from optparse import OptionParser
+from qpid import spec, benchmark
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+__doc__ = """
+
+    Benchmark harness for qpid/spec.py loading
+
+    Times each stage of spec.load separately:
+
+        parse      xmlutil.parse of the spec and errata files
+        walk       visiting every class, method and field node
+        domains    building the domain table and resolving every field type
+        construct  building the Constant/Class/Method/Field objects
+        errata     merging the errata into the Spec
+        generate   Spec.post_load, i.e. define_module/define_class/define_method
+
+    and records the memory each stage leaves allocated: the number of objects tracked by the
+    garbage collector, and the bytes taken by them and by the strings and numbers they refer
+    to, before and after the stage. Where tracemalloc is available (not on Python 2) the peak
+    of the memory allocated during the stage is recorded as well.
+
+    By default it runs against synthetic specs of increasing size so the growth of load time
+    with spec size can be seen:
+
+        python spec_bench.py [-c 5,10,20,40] [-m 10] [-f 5] [-e 1] [-o results.json]
+
+    or against real files:
+
+        python spec_bench.py -s amqp.0-9.xml [-s errata.xml ...]
+
+"""
+
+STAGES = ('parse', 'walk', 'domains', 'construct', 'errata', 'generate')
+
+TYPES = ('bit', 'octet', 'short', 'long', 'longlong', 'shortstr', 'longstr', 'table', 'timestamp')
+
+# ------------------------------------------------------------------
+def generate_spec(out, nclasses, nmethods, nfields, ndocs=1):
+    """
+    writes a synthetic spec document to the file object 'out'. Every field goes through a
+    chain of two domains, and every other method has the next one as its response
+    """
+    w = out.write
+    w('<?xml version="1.0"?>\n')
+    w('<amqp major="0" minor="9" port="5672" comment="synthetic spec">\n')
+    for i, name in enumerate(('frame method', 'frame header', 'frame body', 'frame end')):
+        w('  <constant name="%s" value="%d"/>\n' % (name, i + 1))
+    for i in range(nclasses):
+        w('  <constant name="constant %d" value="%d" class="soft error"><doc>constant %d</doc></constant>\n' % (i, 1000 + i, i))
+    for type in TYPES:
+        w('  <domain name="domain %s" type="%s"/>\n' % (type, type))
+        w('  <domain name="alias %s" type="domain %s"/>\n' % (type, type))
+    for c in range(nclasses):
+        w('  <class name="class %d" handler="channel" index="%d">\n' % (c, (c + 1) * 10))
+        for d in range(ndocs):
+            w('    <doc>documentation for class %d, paragraph %d</doc>\n' % (c, d))
+        for m in range(nmethods):
+            w('    <method name="method %d" synchronous="1" index="%d">\n' % (m, m + 1))
+            w('      method %d of class %d\n' % (m, c))
+            for d in range(ndocs):
+                w('      <doc>documentation for method %d, paragraph %d</doc>\n' % (m, d))
+            if m % 2 == 0 and m + 1 < nmethods:
+                w('      <response name="method %d"/>\n' % (m + 1))
+            for f in range(nfields):
+                type = TYPES[(c + m + f) % len(TYPES)]
+                w('      <field name="field %d" domain="alias %s">\n' % (f, type))
+                for d in range(ndocs):
+                    w('        <doc>documentation for field %d, paragraph %d</doc>\n' % (f, d))
+                w('      </field>\n')
+            w('    </method>\n')
+        w('  </class>\n')
+    w('</amqp>\n')
+
+# ----------------------------------------------------------------------
+def generate_errata(out, nclasses, nmethods, nfields, ndocs=1, serial=0):
+    """
+    writes a synthetic errata document for a spec written by generate_spec, adding a
+    constant and one field to every method of every other class
+    """
+    w = out.write
+    w('<?xml version="1.0"?>\n')
+    w('<amqp major="0" minor="9">\n')
+    w('  <constant name="errata %d" value="%d"/>\n' % (serial, 9000 + serial))
+    w('  <domain name="errata short" type="short"/>\n')
+    # field ids are the position of the field node, so pad past the fields already there
+    padding = '<doc/>' * (ndocs + nfields + 1 + serial)
+    for c in range(0, nclasses, 2):
+        w('  <class name="class %d">\n' % c)
+        for m in range(nmethods):
+            w('    <method name="method %d">%s\n' % (m, padding))
+            w('      <field name="errata field %d" domain="errata short"/>\n' % serial)
+            w('    </method>\n')
+        w('  </class>\n')
+    w('</amqp>\n')
+
+# ---------------------------------
+def stages(specfile, errata):
+    """
+    returns a list of (name, function) pairs which, called in order, load the spec one
+    stage at a time
+    """
+    state = {}
+
+    def parse():
+        state['root'] = spec.parse_root(specfile)
+        state['errata'] = map(spec.parse_root, errata)
+
+    def walk():
+        count = 0
+        for root in [state['root']] + state['errata']:
+            for c_nd in root['class']:
+                for m_nd in c_nd['method']:
+                    count += 1 + len(m_nd['field'])
+        state['nodes'] = count
+
+    def domains():
+        root = state['root']
+        table = spec.load_domains(root)
+        for c_nd in root['class']:
+            for m_nd in c_nd['method']:
+                for f_nd in m_nd['field']:
+                    spec.resolve_type(f_nd.get('@domain') or f_nd['@type'], table)
+        state['domains'] = table
+
+    def construct():
+        root = state['root']
+        s = spec.Spec(int(root['@major']), int(root['@minor']), specfile)
+        spec.load_constants(s, root)
+        spec.load_classes(s, root, state['domains'], True)
+        state['spec'] = s
+
+    def merge():
+        for root in state['errata']:
+            spec.load_root(state['spec'], root, False)
+
+    def generate():
+        state['spec'].post_load()
+
+    return zip(STAGES, (parse, walk, domains, construct, merge, generate))
+
+# -------------------
+def heap_size():
+    """
+    returns the number of objects tracked by the garbage collector and the bytes taken by them
+    and by the untracked objects (strings, numbers, tuples of those) they refer to
+    """
+    objects = gc.get_objects()
+    seen = set([id(o) for o in objects])
+    size = sum([sys.getsizeof(o) for o in objects])
+    pending = gc.get_referents(*objects)
+    while pending:
+        o = pending.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if not gc.is_tracked(o):
+            pending.extend(gc.get_referents(o))
+    return len(objects), size
+
+# ------------------------------------
+def measure_memory(specfile, errata):
+    """
+    loads the spec once, returning {stage: {'bytes': n, 'objects': n [, 'peak_bytes': n]}}
+    with the bytes and objects left alive by each stage
+    """
+    result = {}
+    for name, func in stages(specfile, errata):
+        gc.collect()
+        objects, size = heap_size()
+        if tracemalloc is not None:
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            func()
+            peak = None
+        gc.collect()
+        after_objects, after_size = heap_size()
+        result[name] = {'bytes': after_size - size, 'objects': after_objects - objects}
+        if peak is not None:
+            result[name]['peak_bytes'] = peak
+    return result
+
+# ----------------------------------------------
+def measure_time(specfile, errata, repeat=3):
+    """
+    loads the spec 'repeat' times, returning the best time of each stage in seconds
+    """
+    best = {}
+    for r in range(repeat):
+        for name, func in stages(specfile, errata):
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return best
+
+# ----------------------------------------
+def profile(specfile, errata, repeat=3):
+    """
+    returns {stage: {'seconds': s, 'bytes': n, 'objects': n [, 'peak_bytes': n]}} for loading
+    'specfile'
+    """
+    result = measure_memory(specfile, errata)
+    for name, seconds in measure_time(specfile, errata, repeat).items():
+        result[name]['seconds'] = seconds
+    return result
+
+# --------------------------------------------
+def report(label, result, out=sys.stdout):
+    """
+    prints one profile
+    """
+    out.write('%s\n' % label)
+    total = 0.0
+    for name in STAGES:
+        r = result[name]
+        total += r['seconds']
+        line = '  %-10s %10.3f ms %12d bytes %8d objects' % (name, r['seconds'] * 1e3, r['bytes'], r['objects'])
+        if 'peak_bytes' in r:
+            line += ' %12d peak bytes' % r['peak_bytes']
+        out.write(line + '\n')
+    out.write('  %-10s %10.3f ms\n' % ('total', total * 1e3))
+
+# -------------------
+def main(argv=None):
+    """
+    profiles either the given spec files or a series of synthetic specs
+    """
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-s', '--spec', action='append', default=[],
+                      help='spec file to profile, repeat for errata files')
+    parser.add_option('-c', '--classes', default='5,10,20,40',
+                      help='comma separated numbers of classes for synthetic specs [default: %default]')
+    parser.add_option('-m', '--methods', type='int', default=10, help='methods per class [default: %default]')
+    parser.add_option('-f', '--fields', type='int', default=5, help='fields per method [default: %default]')
+    parser.add_option('-e', '--errata', type='int', default=1, help='number of errata files [default: %default]')
+    parser.add_option('-r', '--repeat', type='int', default=3, help='timing repeats [default: %default]')
+    parser.add_option('-o', '--output', help='write results as JSON to this file')
+    opts, args = parser.parse_args(argv)
+
+    results = {}
+    if opts.spec:
+        result = profile(opts.spec[0], opts.spec[1:], opts.repeat)
+        report(opts.spec[0], result)
+        results[opts.spec[0]] = {'stages': result}
+    else:
+        tmp = tempfile.mkdtemp()
+        try:
+            for nclasses in [int(n) for n in opts.classes.split(',')]:
+                specfile = os.path.join(tmp, 'spec-%d.xml' % nclasses)
+                f = open(specfile, 'w')
+                generate_spec(f, nclasses, opts.methods, opts.fields)
+                f.close()
+                errata = []
+                for i in range(opts.errata):
+                    errata.append(os.path.join(tmp, 'errata-%d-%d.xml' % (nclasses, i)))
+                    f = open(errata[-1], 'w')
+                    generate_errata(f, nclasses, opts.methods, opts.fields, serial=i)
+                    f.close()
+                result = profile(specfile, errata, opts.repeat)
+                label = '%d classes x %d methods x %d fields, %d errata' % \
+                        (nclasses, opts.methods, opts.fields, opts.errata)
+                report(label, result)
+                results[label] = {'classes': nclasses, 'methods': opts.methods, 'fields': opts.fields,
+                                  'errata': opts.errata, 'stages': result}
+        finally:
+            shutil.rmtree(tmp)
+
+    if opts.output:
+        benchmark.save(results, opts.output)
+    return 0
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    sys.exit(main())
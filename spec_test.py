@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest
+from qpid import spec as qpid_spec
+from qpid.testlib import SpecTestBase, run
+
+__doc__ = """
+
+    Unit tests for qpid/spec.py: loading the spec, its options and errata
+
+    To run standalone:
+    -------------------
+
+        python spec_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        spec_unit_test_output.txt.
+
+"""
+
+# -------------------------------------
+# -------------------------------------
+class SpecTestCase(SpecTestBase):
+
+    """
+    Handles loading the spec (qpid/spec.py)
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        loads the spec
+        """
+        SpecTestBase.setUp(self)
+        self.spec = qpid_spec.load(self.specfile)
+
+    # ---------------------------------
+    def test_docstrings(self):
+        """
+        methods document themselves, while the Method class keeps its own doc string
+        """
+        declare = self.spec.parse_method('queue.declare')
+        self.failUnless(declare.__doc__.startswith('  declare queue'), 'method doc FAILED...')
+        self.failUnless('queue name' in declare.__doc__ and 'declare_ok' in declare.__doc__, 'field and response docs FAILED...')
+        self.failUnless('method' in qpid_spec.Method.__doc__, 'Method class doc FAILED...')
+        self.failUnlessEqual(self.spec.klass().queue_declare.__doc__, declare.docstring(), 'generated method doc FAILED...')
+
+    # ---------------------------------
+    def test_classes_and_extend(self):
+        """
+        a spec loaded with some classes only can be extended, parsing as it was loaded, to match a full load
+        """
+        names = lambda spec: sorted([(c.name, m.name, tuple([f.name for f in m.fields])) for c in spec.classes for m in c.methods])
+        full = qpid_spec.load(self.specfile, self.errata)
+        parsed = []
+        parse_roots = qpid_spec.parse_roots
+        def recording(files, classes=None, processes=None, compact=False):
+            parsed.append((sorted(classes), compact))
+            return parse_roots(files, classes, processes, compact)
+        qpid_spec.parse_roots = recording
+        try:
+            spec = qpid_spec.load(self.specfile, self.errata, classes=['channel'], compact=True)
+            self.failUnlessEqual([c.name for c in spec.classes], ['channel'], 'classes FAILED...')
+            self.failIf(hasattr(spec.klass, 'queue_declare'), 'unloaded class generated FAILED...')
+            self.failUnlessRaises(ValueError, qpid_spec.load, self.specfile, classes=['nonesuch'])
+            close = spec.klass.channel_close.im_func
+            qpid_spec.extend(spec, ['queue', 'basic', 'test'])
+        finally:
+            qpid_spec.parse_roots = parse_roots
+        self.failUnlessEqual(parsed[-1], (['basic', 'queue', 'test'], True), 'extend parse options FAILED...')
+        self.failUnlessEqual(names(spec), names(full), 'extended spec FAILED...')
+        self.failUnless(spec.klass.channel_close.im_func is close, 'method functions reused FAILED...')
+        self.failUnless(hasattr(spec.klass, 'queue_declare'), 'extended class generated FAILED...')
+
+    # ---------------------------------
+    def test_processes(self):
+        """
+        parsing the spec and errata in a pool of processes loads the same spec as parsing them in turn
+        """
+        describe = lambda spec: ([(c.name, c.id) for c in spec.constants],
+                                 sorted([(c.name, m.name, m.id, tuple([(f.name, f.type) for f in m.fields]),
+                                          tuple([r.name for r in m.responses])) for c in spec.classes for m in c.methods]))
+        sequential = qpid_spec.load(self.specfile, self.errata)
+        parallel = qpid_spec.load(self.specfile, self.errata, processes=2)
+        self.failUnlessEqual(describe(parallel), describe(sequential), 'parallel parsing FAILED...')
+        self.failUnlessEqual([f.name for f in parallel.parse_method('channel.close_ok').fields], ['extra'], 'errata FAILED...')
+
+    # ---------------------------------
+    def test_errata(self):
+        """
+        errata add constants and fields, whether given to load() or applied to a loaded spec
+        """
+        for spec in (qpid_spec.load(self.specfile, self.errata), qpid_spec.apply_errata(self.spec, self.errata)):
+            self.failUnlessEqual(spec.constants.byname['frame_heartbeat'].id, 8, 'errata constant FAILED...')
+            self.failUnlessEqual([f.name for f in spec.parse_method('channel.close_ok').fields], ['extra'], 'errata field FAILED...')
+            self.failUnlessEqual(spec.errata, (self.errata,), 'errata files FAILED...')
+            calls = []
+            class Client(spec.klass):
+                def invoke(self, method, args, content=None):
+                    calls.append(args)
+            Client().channel_close_ok(extra=3)
+            self.failUnlessEqual(calls, [(3,)], 'errata method FAILED...')
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([SpecTestCase], 'spec_unit_test_output.txt')
@@ -0,0 +1,201 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Registry of several loaded spec versions sharing their common parts.
+
+            Every spec loaded through a SpecRegistry is an ordinary, version
+            specific Spec object, but identical Field and Method definitions
+            (and the fields containers holding them) are only kept once across
+            all the versions. Since the functions generated for a Method are
+            cached on it (see Method.define_method), a method that did not change
+            between versions is also only compiled once.
+
+              registry = SpecRegistry()
+              registry.load("0-8", "amqp.0-8.xml")
+              registry.load("0-9", "amqp.0-9.xml", "amqp-errata.0-9.xml")
+              spec = registry["0-9"]
+
+            Methods are shared together with the methods they are linked to by
+            responses (e.g. queue.declare and queue.declare-ok), or not at all,
+            so that method.responses and method.requests always stay within the
+            version the method was loaded for. A response is not shared if one
+            of its requests changed between versions.
+
+            Shared methods keep the 'klass' they were first loaded with, i.e.
+            method.klass may be the (identical) class of an earlier version.
+            Navigate from a version's spec.classes downwards rather than from a
+            method back up to its spec.
+
+            The shared objects must not be changed in place. spec.apply_errata
+            gives the classes it extends their own copies first.
+          """
+
+from spec import SpecContainer, build, load_options
+
+# ---------------------
+# ---------------------
+class SpecRegistry:
+  """
+  loads specs by name and shares their identical fields and methods
+  """
+
+  # ------------------
+  def __init__(self):
+    """
+    initializations...
+    """
+    self.specs = {}
+    self.names = []
+    # canonical objects, keyed by their structure
+    self.fields = {}
+    self.containers = {}
+    # canonical groups of methods linked by responses, see share_group
+    self.groups = {}
+    self.shared_methods = 0
+
+  # ----------------------------------------------------
+  def load(self, name, specfile, *errata, **options):
+    """
+    loads 'specfile' and 'errata' (see spec.load) and registers the result as
+    'name'. Returns the Spec
+    """
+    if self.specs.has_key(name):
+      raise ValueError("duplicate spec name: %s" % name)
+    spec = build(specfile, errata, **load_options("load", options))
+    self.share(spec)
+    spec.post_load()
+    self.specs[name] = spec
+    self.names.append(name)
+    return spec
+
+  # --------------------------
+  def __getitem__(self, name):
+    """
+    returns the spec registered as 'name'
+    """
+    return self.specs[name]
+
+  # ---------------------------------
+  def get(self, name, default = None):
+    """
+    returns the spec registered as 'name', or 'default'
+    """
+    return self.specs.get(name, default)
+
+  # ------------------
+  def __iter__(self):
+    """
+    iterates over the registered names, in loading order
+    """
+    return iter(self.names)
+
+  # -----------------------
+  def share(self, spec):
+    """
+    replaces the fields and methods of 'spec' by the canonical ones already
+    registered, registering those that are new
+    """
+    for klass in spec.classes:
+      klass.fields = self.share_fields(klass.fields)
+      canonical = {}
+      for group in linked(klass):
+        canonical.update(self.share_group(group))
+      methods = SpecContainer()
+      for meth in klass.methods:
+        methods.add(canonical[meth])
+      klass.methods = methods
+
+  # -------------------------------
+  def share_fields(self, fields):
+    """
+    returns the canonical container for the SpecContainer of Fields 'fields'
+    """
+    canonical = []
+    for f in fields:
+      key = (f.name, f.id, f.type, tuple(f.docs))
+      canonical.append(self.fields.setdefault(key, f))
+    key = tuple(map(id, canonical))
+    try:
+      return self.containers[key]
+    except KeyError:
+      container = SpecContainer()
+      for f in canonical:
+        container.add(f)
+      self.containers[key] = container
+      return container
+
+  # -------------------------------
+  def share_group(self, group):
+    """
+    returns {method: canonical method} for the list of methods 'group', as
+    returned by linked(). The methods of a group are shared together or not
+    at all, so their responses and requests never point at the methods of
+    another version
+    """
+    fields = [self.share_fields(m.fields) for m in group]
+    key = tuple([(m.klass.name, m.klass.id, m.name, m.id, m.content,
+                  m.synchronous, m.response, m.description, tuple(m.docs),
+                  id(f), tuple([r.name for r in m.responses]),
+                  tuple([r.name for r in m.requests]))
+                 for m, f in zip(group, fields)])
+    try:
+      canonical = self.groups[key]
+      self.shared_methods += len(group)
+    except KeyError:
+      for m, f in zip(group, fields):
+        m.fields = f
+      canonical = self.groups[key] = group
+    return dict(zip(group, canonical))
+
+  # ---------------
+  def stats(self):
+    """
+    returns counts of the registered specs and of the distinct objects they
+    share
+    """
+    return {"specs": len(self.names),
+            "fields": len(self.fields),
+            "containers": len(self.containers),
+            "methods": sum(map(len, self.groups.values())),
+            "shared_methods": self.shared_methods}
+
+# -------------------
+def linked(klass):
+  """
+  returns the methods of 'klass' grouped by the responses linking them, each
+  group in the order of the class
+  """
+  group_of = {}
+  for meth in klass.methods:
+    group = group_of[meth] = [meth]
+    for other in meth.responses + meth.requests:
+      found = group_of.get(other)
+      if found is not None and found is not group:
+        group.extend(found)
+        for m in found:
+          group_of[m] = group
+  result = []
+  for meth in klass.methods:
+    group = group_of[meth]
+    if group:
+      result.append([m for m in klass.methods if group_of[m] is group])
+      # emptied so that the group is only returned once
+      del group[:]
+  return result
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest, os
+from qpid import spec as qpid_spec
+from qpid.specregistry import SpecRegistry
+from qpid.testlib import SPEC_XML, SpecTestBase, run
+
+__doc__ = """
+
+    Unit tests for qpid/specregistry.py: specs sharing their definitions, and errata applied to them
+
+    To run standalone:
+    -------------------
+
+        python specregistry_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        specregistry_unit_test_output.txt.
+
+"""
+
+# -------------------------------------------
+# -------------------------------------------
+class SpecRegistryTestCase(SpecTestBase):
+
+    """
+    Handles specs sharing their definitions (qpid/specregistry.py) and errata applied to them
+    """
+
+    # ----------------------------
+    def test_sharing(self):
+        """
+        identical fields and methods are kept once across the registered specs
+        """
+        registry = SpecRegistry()
+        a = registry.load('a', self.specfile)
+        b = registry.load('b', self.specfile)
+        self.failUnless(a.classes.byname['queue'].methods.byname['declare'] is b.classes.byname['queue'].methods.byname['declare'], 'method sharing FAILED...')
+        self.failIf(a.classes.byname['queue'] is b.classes.byname['queue'], 'classes are per spec FAILED...')
+        self.failUnlessEqual(registry.stats()['specs'], 2, 'registry stats FAILED...')
+        self.failUnlessRaises(ValueError, registry.load, 'a', self.specfile)
+
+    # ----------------------------
+    def test_errata_not_shared(self):
+        """
+        errata applied to one registered spec leave the specs it shares definitions with as they were
+        """
+        registry = SpecRegistry()
+        a = registry.load('a', self.specfile)
+        b = registry.load('b', self.specfile)
+        before = a.method('channel_close_ok')
+        self.failUnless(before is b.method('channel_close_ok'), 'method lookup before errata FAILED...')
+        qpid_spec.apply_errata(a, self.errata)
+        self.failIf(a.method('channel_close_ok') is before, 'method lookup after errata FAILED...')
+        self.failUnlessEqual([f.name for f in a.method('channel_close_ok').fields], ['extra'], 'method lookup fields FAILED...')
+        self.failUnless(b.method('channel_close_ok') is before, 'other spec method lookup FAILED...')
+        self.failUnless(a.method('queue_declare') is b.method('queue_declare'), 'untouched class lookup FAILED...')
+        names = lambda fields: [f.name for f in fields]
+        channel_a, channel_b = a.classes.byname['channel'], b.classes.byname['channel']
+        self.failUnlessEqual(names(channel_a.methods.byname['close_ok'].fields), ['extra'], 'errata FAILED...')
+        self.failUnlessEqual(names(channel_b.methods.byname['close_ok'].fields), [], 'errata leaked into the other spec...')
+        self.failUnlessEqual(names(channel_a.methods.byname['open_ok'].fields), [], 'errata leaked into an empty field list...')
+        for s in (a, b):
+            for c in ('channel', 'queue'):
+                self.failUnlessEqual(names(s.classes.byname[c].fields), [], 'errata leaked into the class fields...')
+        self.failUnlessRaises(TypeError, b.klass().channel_close_ok, 1)
+        calls = []
+        class Client(a.klass):
+            def invoke(self, method, args, content=None):
+                calls.append((method, args))
+        Client().channel_close_ok(7)
+        self.failUnless(calls[0][0] is channel_a.methods.byname['close_ok'], 'regenerated method FAILED...')
+        self.failUnless(channel_a.methods.byname['close'].responses[0] is calls[0][0], 'responses remapped FAILED...')
+        self.failUnless(channel_b.methods.byname['close'].responses[0] is channel_b.methods.byname['close_ok'], 'other spec responses FAILED...')
+        self.failUnlessRaises(TypeError, qpid_spec.apply_errata, a, self.errata, docs=False)
+
+    # ----------------------------
+    def test_requests_per_version(self):
+        """
+        responses and requests stay within their version, so a response is not shared when its request changed
+        """
+        path = os.path.join(self.dir, 'changed.xml')
+        f = open(path, 'w')
+        f.write(SPEC_XML.replace('<field name="arguments" type="table"/>', '<field name="arguments" type="table"/><field name="extra" type="short"/>'))
+        f.close()
+        registry = SpecRegistry()
+        a = registry.load('a', self.specfile)
+        b = registry.load('b', path)
+        queue_a, queue_b = a.classes.byname['queue'].methods.byname, b.classes.byname['queue'].methods.byname
+        self.failIf(queue_a['declare_ok'] is queue_b['declare_ok'], 'response of a changed request shared FAILED...')
+        self.failUnlessEqual(queue_a['declare_ok'].requests, [queue_a['declare']], 'requests of the first version FAILED...')
+        self.failUnlessEqual(queue_b['declare_ok'].requests, [queue_b['declare']], 'requests of the second version FAILED...')
+        self.failUnless(queue_b['declare'].responses[0] is queue_b['declare_ok'], 'responses of the second version FAILED...')
+        channel_a, channel_b = a.classes.byname['channel'].methods.byname, b.classes.byname['channel'].methods.byname
+        self.failUnless(channel_a['close_ok'] is channel_b['close_ok'], 'unchanged group sharing FAILED...')
+        self.failUnlessEqual(channel_b['close_ok'].requests, [channel_b['close']], 'shared requests FAILED...')
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([SpecRegistryTestCase], 'specregistry_unit_test_output.txt')
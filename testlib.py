@@ -0,0 +1,197 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os, shutil, tempfile, unittest
+from cStringIO import StringIO
+
+__doc__ = """
+
+    Fixtures shared by the unit test scripts of the modules next to this one (codec.py,
+    spec_test.py, xmlutil_test.py, ...): a small spec and errata, a base class writing them to
+    files, and the runner each script uses when run standalone.
+
+"""
+
+
+# a small spec, in the format of the 0-8 spec, for the tests needing one
+SPEC_XML = """<?xml version="1.0"?>
+<amqp major="8" minor="0" port="5672">
+  <constant name="frame method" value="1"/>
+  <constant name="frame end" value="206"/>
+  <constant name="not found" value="404" class="soft error"/>
+  <domain name="queue name" type="shortstr"/>
+  <domain name="reply code" type="short"/>
+  <class name="channel" handler="channel" index="20">
+    <doc>work with channels</doc>
+    <method name="open" synchronous="1" index="10">
+      open a channel
+      <doc>This method opens a channel.</doc>
+      <response name="open-ok"/>
+      <field name="out of band" type="shortstr"/>
+    </method>
+    <method name="open-ok" synchronous="1" index="11">signal channel open</method>
+    <method name="close" synchronous="1" index="40">
+      request a channel close
+      <response name="close-ok"/>
+      <field name="reply code" domain="reply code"/>
+      <field name="reply text" type="shortstr"/>
+      <field name="class id" type="short"/>
+      <field name="method id" type="short"/>
+    </method>
+    <method name="close-ok" synchronous="1" index="41">confirm a channel close</method>
+  </class>
+  <class name="queue" handler="channel" index="50">
+    <method name="declare" synchronous="1" index="10">
+      declare queue
+      <response name="declare-ok"/>
+      <field name="ticket" type="short"/>
+      <field name="queue" domain="queue name"><doc>queue name</doc></field>
+      <field name="passive" type="bit"/>
+      <field name="durable" type="bit"/>
+      <field name="exclusive" type="bit"/>
+      <field name="auto delete" type="bit"/>
+      <field name="nowait" type="bit"/>
+      <field name="arguments" type="table"/>
+    </method>
+    <method name="declare-ok" synchronous="1" index="11">
+      confirms a queue definition
+      <field name="queue" domain="queue name"/>
+      <field name="message count" type="long"/>
+      <field name="consumer count" type="long"/>
+    </method>
+  </class>
+  <class name="basic" handler="channel" index="60">
+    <field name="content type" type="shortstr"/>
+    <method name="publish" content="1" index="40">
+      publish a message
+      <field name="ticket" type="short"/>
+      <field name="exchange" type="shortstr"/>
+      <field name="routing key" type="shortstr"/>
+      <field name="mandatory" type="bit"/>
+      <field name="immediate" type="bit"/>
+    </method>
+    <method name="ack" index="80">
+      acknowledge messages
+      <field name="delivery tag" type="longlong"/>
+      <field name="multiple" type="bit"/>
+    </method>
+  </class>
+  <class name="test" handler="channel" index="120">
+    <method name="types" index="10">
+      one field of every type
+      <field name="octet" type="octet"/>
+      <field name="short" type="short"/>
+      <field name="long" type="long"/>
+      <field name="longlong" type="longlong"/>
+      <field name="timestamp" type="timestamp"/>
+      <field name="flag" type="bit"/>
+      <field name="shortstr" type="shortstr"/>
+      <field name="longstr" type="longstr"/>
+      <field name="b0" type="bit"/>
+      <field name="b1" type="bit"/>
+      <field name="b2" type="bit"/>
+      <field name="b3" type="bit"/>
+      <field name="b4" type="bit"/>
+      <field name="b5" type="bit"/>
+      <field name="b6" type="bit"/>
+      <field name="b7" type="bit"/>
+      <field name="b8" type="bit"/>
+      <field name="table" type="table"/>
+    </method>
+  </class>
+</amqp>
+"""
+
+# errata adding a field to channel.close-ok
+ERRATA_XML = """<?xml version="1.0"?>
+<amqp major="8" minor="0">
+  <constant name="frame heartbeat" value="8"/>
+  <class name="channel">
+    <method name="close-ok">
+      <field name="extra" type="short"/>
+    </method>
+  </class>
+</amqp>
+"""
+
+# -------------------------------------
+# -------------------------------------
+class SpecTestBase(unittest.TestCase):
+
+    """
+    Base class of the test cases needing the spec and errata above in files
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        writes the spec and errata files
+        """
+        self.dir = tempfile.mkdtemp()
+        self.specfile = os.path.join(self.dir, 'amqp.xml')
+        self.errata = os.path.join(self.dir, 'errata.xml')
+        for path, xml in ((self.specfile, SPEC_XML), (self.errata, ERRATA_XML)):
+            f = open(path, 'w')
+            f.write(xml)
+            f.close()
+
+    # ------------------
+    def tearDown(self):
+        """
+        removes the files
+        """
+        shutil.rmtree(self.dir)
+
+# ---------------------------
+def run(cases, output):
+    """
+    runs the TestCase classes 'cases', printing a summary and writing the verbose output to the
+    file 'output'
+    """
+    suite = unittest.TestSuite()
+    for case in cases:
+        suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(case))
+
+    run_output_stream = StringIO()
+    test_runner = unittest.TextTestRunner(run_output_stream, '', '')
+    test_result = test_runner.run(suite)
+
+    print '\n%d test run...' % (test_result.testsRun)
+
+    if test_result.wasSuccessful():
+        print '\nAll tests successful\n'
+
+    if test_result.failures:
+        print '\n----------'
+        print '%d FAILURES:' % (len(test_result.failures))
+        print '----------\n'
+        for failure in test_result.failures:
+            print str(failure[0]) + ' ... FAIL'
+
+    if test_result.errors:
+        print '\n---------'
+        print '%d ERRORS:' % (len(test_result.errors))
+        print '---------\n'
+        for error in test_result.errors:
+            print str(error[0]) + ' ... ERROR'
+
+    f = open(output, 'w')
+    f.write(str(run_output_stream.getvalue()))
+    f.close()
+    return test_result.wasSuccessful()
@@ -0,0 +1,179 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+__doc__ = """
+            Argument validators compiled from the field types of a method.
+
+            The codec only notices a bad value (e.g. encode_octet(256)) when it
+            gets to it, by which time part of the frame has been written. The
+            generated spec methods instead check all of their arguments up front
+            with a function compiled from the field types of the method, using
+            the same range rules as the codec, and raise ValueError before
+            anything is encoded.
+
+            Validation runs in one of three modes:
+
+              STRICT   -- every call is checked (the default)
+              SAMPLING -- one call in every 'rate' is checked
+              OFF      -- nothing is checked
+
+            set_mode() changes the mode of every method that has not been given
+            its own, method.validator().mode changes it for one method, e.g. to
+            skip validation on a trusted hot path.
+
+            Field tables are checked against the typed values of fieldtable.py,
+            so the codec encoding the methods needs its TypedTableMixin (as
+            frames.py has) unless the tables only hold strings and unsigned
+            longs, the values the plain Codec knows.
+          """
+
+from fieldtable import FIELD_NAME, lookup, decimal_parts
+
+STRICT, SAMPLING, OFF = "strict", "sampling", "off"
+
+# the defaults for validators without a mode of their own
+MODE = STRICT
+RATE = 100
+
+# the types accepted for integer fields; floats would be truncated by struct
+INTEGERS = (int, long)
+
+# ----------------------------------------
+def set_mode(mode, rate = None):
+  """
+  sets the default validation mode, and for SAMPLING the number of calls per
+  checked call
+  """
+  global MODE, RATE
+  if mode not in (STRICT, SAMPLING, OFF):
+    raise ValueError("unknown validation mode: %r" % (mode,))
+  MODE = mode
+  if rate is not None:
+    RATE = max(1, int(rate))
+
+# ---------------------
+def check_table(t):
+  """
+  returns True if the dict 't' can be encoded as a field table of typed
+  values, see fieldtable.py
+  """
+  for key, value in t.items():
+    if not isinstance(key, basestring) or len(key) > 128 or \
+       not FIELD_NAME.match(key):
+      return False
+    if not check_value(value):
+      return False
+  return True
+
+# ----------------------
+def check_value(v):
+  """
+  returns True if 'v' can be encoded as a field table or array value
+  """
+  try:
+    code = lookup(v)
+  except ValueError:
+    return False
+  if code == "F":
+    return check_table(v)
+  if code == "D":
+    try:
+      decimal_parts(v)
+    except ValueError:
+      return False
+  if code == "A":
+    for item in v:
+      if not check_value(item):
+        return False
+  return True
+
+# source of the check for each field type, applied to the local 'v'
+INTEGER = "isinstance(v, INTEGERS) and 0 <= v < %d"
+CHECKS = {"octet": INTEGER % 2**8,
+          "short": INTEGER % 2**16,
+          "long": INTEGER % 2**32,
+          "longlong": INTEGER % 2**64,
+          "timestamp": INTEGER % 2**64,
+          "shortstr": "isinstance(v, basestring) and len(v) <= 255",
+          "longstr": "isinstance(v, basestring) and len(v) < 4294967296 or "
+                     "isinstance(v, dict) and check_table(v)",
+          "table": "isinstance(v, dict) and check_table(v)",
+          # inline data, or a ReferenceId
+          "content": "v is None or isinstance(v, basestring) or hasattr(v, 'id')"}
+
+# -----------------------------------------------
+def fail(method, field, type, value):
+  """
+  raises the error for an invalid argument
+  """
+  value = repr(value)
+  if len(value) > 64:
+    value = value[:60] + " ..."
+  raise ValueError("%s.%s: invalid %s value for %s: %s" %
+                   (method.klass.name, method.name, type, field.name, value))
+
+# ------------------------------
+def compile_validator(method):
+  """
+  returns a function checking a tuple of arguments for 'method' (as returned
+  by method.arguments) and raising ValueError on the first invalid one
+  """
+  code = "def check(args):\n"
+  for i, f in enumerate(method.fields):
+    if CHECKS.has_key(f.type):
+      code += "  v = args[%d]\n" % i
+      code += "  if not (%s):\n" % CHECKS[f.type]
+      code += "    fail(__method__, __fields__[%d], %r, v)\n" % (i, f.type)
+  code += "  return True\n"
+  g = {"__method__": method, "__fields__": list(method.fields),
+       "INTEGERS": INTEGERS, "check_table": check_table, "fail": fail}
+  exec code in g
+  return g["check"]
+
+# -----------------
+# -----------------
+class Validator:
+  """
+  the compiled argument check of a method, applied according to the mode
+  """
+
+  # ---------------------------------------------------
+  def __init__(self, method, mode = None, rate = None):
+    """
+    initializations. 'mode' and 'rate' default to the module wide settings
+    """
+    self.check = compile_validator(method)
+    self.mode = mode
+    self.rate = rate
+    self.calls = 0
+
+  # ---------------------------
+  def __call__(self, args):
+    """
+    checks 'args' if the mode says so
+    """
+    mode = self.mode or MODE
+    if mode == OFF:
+      return
+    if mode == SAMPLING:
+      self.calls += 1
+      if self.calls < (self.rate or RATE):
+        return
+      self.calls = 0
+    self.check(args)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest
+from qpid import spec as qpid_spec, validation, frames
+from qpid.validation import STRICT, SAMPLING, OFF
+from qpid.testlib import SpecTestBase, run
+from decimal import Decimal
+
+__doc__ = """
+
+    Unit tests for qpid/validation.py: the argument checks of the generated spec methods and
+    their modes
+
+    To run standalone:
+    -------------------
+
+        python validation_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        validation_unit_test_output.txt.
+
+"""
+
+# ------------------------------------------
+# ------------------------------------------
+class ValidationTestCase(SpecTestBase):
+
+    """
+    Handles validating the arguments of the generated methods before they are encoded
+    """
+
+    # ---------------
+    def setUp(self):
+        """
+        loads the spec and a client recording the methods it is asked to send
+        """
+        SpecTestBase.setUp(self)
+        self.spec = qpid_spec.load(self.specfile)
+        self.sent = sent = []
+        class Client(self.spec.klass):
+            def invoke(self, method, args, content=None):
+                sent.append((method, args))
+        self.client = Client()
+
+    # ------------------
+    def tearDown(self):
+        """
+        puts back the default mode
+        """
+        validation.set_mode(STRICT, 100)
+        SpecTestBase.tearDown(self)
+
+    # ---------------------------------
+    def test_strict(self):
+        """
+        every call is checked, and an invalid argument raises ValueError before anything is encoded
+        """
+        for name, value in (('octet', 256), ('short', 2**16), ('long', -1), ('longlong', 2**64),
+                            ('timestamp', 'now'), ('shortstr', 'x' * 256), ('longstr', 1), ('table', []),
+                            ('octet', 1.5), ('long', 1.0), ('timestamp', 1181000000.5),
+                            ('table', {'d': Decimal('1E-256')}), ('table', {'d': Decimal('2147483648')})):
+            self.failUnlessRaises(ValueError, self.client.test_types, **{name: value})
+        self.failUnlessEqual(self.sent, [], 'encoded before validation FAILED...')
+        self.client.test_types(octet=255, short=2**16 - 1, long=2**32 - 1, longlong=2**64 - 1, shortstr='x' * 255,
+                               table={'ratio': 1.5, 'price': Decimal('2147483.647')})
+        self.failUnlessEqual(len(self.sent), 1, 'valid call FAILED...')
+        frames.encode_method(*self.sent[0])
+
+    # ---------------------------------
+    def test_sampling(self):
+        """
+        one call in every 'rate' is checked
+        """
+        validation.set_mode(SAMPLING, 3)
+        self.client.queue_declare(ticket=2**16)
+        self.client.queue_declare(ticket=2**16)
+        self.failUnlessRaises(ValueError, self.client.queue_declare, ticket=2**16)
+        self.client.queue_declare(ticket=2**16)
+        self.failUnlessEqual(len(self.sent), 3, 'sampled calls FAILED...')
+
+    # ---------------------------------
+    def test_off_and_override(self):
+        """
+        nothing is checked when off, unless a method is given its own mode
+        """
+        validation.set_mode(OFF)
+        self.client.test_types(octet=-1)
+        self.failUnlessEqual(len(self.sent), 1, 'unchecked call FAILED...')
+        self.spec.parse_method('queue.declare').validator().mode = STRICT
+        self.failUnlessRaises(ValueError, self.client.queue_declare, ticket=-1)
+        validation.set_mode(STRICT)
+        ack = self.spec.parse_method('basic.ack').validator()
+        ack.mode = SAMPLING
+        ack.rate = 2
+        self.client.basic_ack(delivery_tag=-1)
+        self.failUnlessRaises(ValueError, self.client.basic_ack, delivery_tag=-1)
+        self.failUnlessEqual(len(self.sent), 2, 'method modes FAILED...')
+
+    # ---------------------------------
+    def test_set_mode(self):
+        """
+        unknown modes are refused and the rate is at least 1
+        """
+        self.failUnlessRaises(ValueError, validation.set_mode, 'sometimes')
+        validation.set_mode(SAMPLING, 0)
+        self.failUnlessEqual((validation.MODE, validation.RATE), (SAMPLING, 1), 'rate clamp FAILED...')
+        self.failUnlessRaises(ValueError, self.client.queue_declare, ticket=-1)
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([ValidationTestCase], 'validation_unit_test_output.txt')
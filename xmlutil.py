@@ -35,18 +35,33 @@ __doc__ = """
             
           """
           
-import xml.sax
+import re, xml.sax
+from array import array
 from xml.sax.handler import ContentHandler
+from xml.sax.saxutils import escape
+from xml.sax.xmlreader import AttributesImpl
+from StringIO import StringIO
 
-# ---------------
-def parse(file):
+# ------------------------------
+def parse(file, prune = None, compact = False):
   """
   interface to the outside world
   
   parses an xml spec file  and returns an object representation of it
+
+  if 'prune' is given, it is called as prune(parent, name, attrs) for every
+  element and the element is left out of the tree, along with everything it
+  contains, whenever it returns True
+
+  if 'compact' is True the document is kept in a CompactTree and its root
+  CompactNode is returned instead of a tree of Node objects
   """
+  if compact:
+    tree = CompactTree()
+    xml.sax.parse(file, CompactBuilder(tree, prune))
+    return tree.node(0)
   doc = Node("root")
-  xml.sax.parse(file, Builder(doc))
+  xml.sax.parse(file, Builder(doc, prune))
   return doc
 
 # ----------
@@ -67,8 +82,12 @@ class Node:
     self.parent = parent
     self.children = []
     self._visited = False
+    self._path = None
+    # children by name and by attribute value, see named() and keyed()
+    self._index = None
     if parent != None:
       parent.children.append(self)
+      parent._index = None
 
   # ----------------------------------------
   def get_bool(self, key, default = False):
@@ -140,7 +159,60 @@ class Node:
     if name[:1] == "@":
       return self.attrs[name[1:]]
     else:
-      return self[lambda nd: nd.name == name]
+      return list(self.named(name))
+
+  # -----------------------
+  def named(self, name):
+    """
+    returns the children named 'name' from an index of the children by name,
+    built on first use and dropped whenever a child is added. The returned
+    list is shared by all callers and must not be modified
+    """
+    index = self._index
+    if index is None:
+      index = self._index = {}
+      for child in self.children:
+        try:
+          index[child.name].append(child)
+        except KeyError:
+          index[child.name] = [child]
+    return index.get(name, NONE)
+
+  # ----------------------------
+  def keyed(self, name, attr):
+    """
+    returns a dict from the values of the attribute 'attr' to the lists of
+    children named 'name' (any name if None) having that value, built on
+    first use like named()
+    """
+    if self._index is None:
+      self.named(name)
+    key = (name, attr)
+    try:
+      return self._index[key]
+    except KeyError:
+      pass
+    if name is None:
+      children = self.children
+    else:
+      children = self.named(name)
+    result = {}
+    for child in children:
+      if child.attrs and child.attrs.has_key(attr):
+        try:
+          result[child.attrs[attr]].append(child)
+        except KeyError:
+          result[child.attrs[attr]] = [child]
+    self._index[key] = result
+    return result
+
+  # ----------------------
+  def query(self, path):
+    """
+    returns the list of nodes matched by the query 'path' (see compile_query)
+    evaluated from this node
+    """
+    return compile_query(path).evaluate(self)
 
   # ---------------------------
   def __getint__(self, index):
@@ -157,89 +229,312 @@ class Node:
     """
     return iter(self.children)
 
+  # ------------------------------------------------------
+  def walk(self, order = "pre", tag = None, prune = None):
+    """
+    generator yielding this node and all the nodes below it, without
+    recursion so that neither the depth nor the width of the tree matters
+
+    order -- "pre" yields a node before its children, "post" after them
+    tag   -- if given, only the nodes named 'tag' are yielded (the others
+             are still walked through)
+    prune -- if given, called for every node; the children of the nodes it
+             returns True for are not walked
+    """
+    if order == "pre":
+      stack = [self]
+      while stack:
+        node = stack.pop()
+        if tag is None or node.name == tag:
+          yield node
+        if node.children and not (prune and prune(node)):
+          stack.extend(reversed(node.children))
+    elif order == "post":
+      stack = [(self, False)]
+      while stack:
+        node, expanded = stack.pop()
+        if expanded or not node.children or (prune and prune(node)):
+          if tag is None or node.name == tag:
+            yield node
+        else:
+          stack.append((node, True))
+          stack.extend([(child, False) for child in reversed(node.children)])
+    else:
+      raise ValueError("unknown order: %r" % (order,))
+
   # --------------
   def path(self):
     """
     retruns the path to the node, starting from the root e.g. /root/a/b/c
-    """
-    if self.parent == None:
-      return "/%s" % self.name
-    else:
-      return "%s/%s" % (self.parent.path(), self.name)
+    the result is cached, nodes do not move once the tree is built
+    """
+    if self._path is None:
+      names = []
+      node = self
+      while node != None:
+        if node._path is not None:
+          names.append(node._path[1:])
+          break
+        names.append(node.name)
+        node = node.parent
+      names.reverse()
+      self._path = "/" + "/".join(names)
+    return self._path
 
   # ------------------------------------------      
   def prepareForPrettyPrint(self, index = 0):
     """
     marks all the nodes as NOT visited
     """
-    self._visited = False
-    if self.children:
-       if index < len(self.children):
-          self.children[index].prepareForPrettyPrint()
-          index += 1
-          self.prepareForPrettyPrint(index)
+    for node in self.walk():
+      node._visited = False
 
   # ----------------------------------------------------------
   def createTag(self, tagName, attrs, content, indent_level):
     """
-    helpre function for prettyPrint
+    returns the indented opening tag 'tagName' with the attributes 'attrs'
+    and the text 'content' (either may be None), as written by serialize
     """
-    xml = ''
-    
-    xml += '\n' + indent_level*'\t' + '<%s ' % (tagName)
-    
-    #attrs can be None
-    try:
-        if self.attrs.getLength():
-            for attr in attrs.keys():
-                xml += attr + '=\"' + attrs[attr] + '\" '
-    except AttributeError:
-        pass
-        
-    xml += '>'
-    
-    #sometimes content can be None
-    try:
-        xml += content.strip()
-    except AttributeError:
-        pass
-    
-    return xml
-    
+    return openTag(Node(tagName, attrs, content), indent_level)
+
   # --------------------------------------------------------
   def prettyPrint(self, indent_level=0, parsed_output=''):
     """
     prints out a tree representation of the contents of the Node
     """
+    out = StringIO()
     if indent_level == 0 and parsed_output == '':
-        self.prepareForPrettyPrint()
-        
-        parsed_output = '<?xml version = "1.0"?>\n'
-        parsed_output += self.createTag(self.name, self.attrs, self.text, indent_level)
-        parsed_output += '\n'
-      
-    not_visited_children = filter(lambda node: node._visited == False, self.children)
-    if not_visited_children:
-
-        child_index = self.children.index(not_visited_children[0])
-        self.children[child_index]._visited = True
-        child = self.children[child_index]
-        indent_level += 1
-        
-        parsed_output += self.createTag(child.name, child.attrs, child.text, indent_level)
-        parsed_output = child.prettyPrint(indent_level, parsed_output)
-        indent_level -=1
-        parsed_output = self.prettyPrint(indent_level, parsed_output)
-        return parsed_output
-        
+        self.serialize(out)
     else:
-        if self.children:
-           parsed_output += '\n' + indent_level*'\t' + '</%s>' % (self.name)
+        out.write(parsed_output)
+        self._serialize(out.write, indent_level, False)
+    return out.getvalue()
+
+  # ---------------------------------------
+  def serialize(self, out, encoding = None):
+    """
+    writes this node and everything below it as xml to the file like object
+    'out', in the format of prettyPrint, in a single pass. Text and attribute
+    values are escaped, and unicode is encoded with 'encoding' if given.
+    The tree is not modified, so a tree may be serialized by several threads
+    at once
+    """
+    if encoding:
+      def write(s):
+        if isinstance(s, unicode):
+          s = s.encode(encoding)
+        out.write(s)
+    else:
+      write = out.write
+    write('<?xml version = "1.0"?>\n')
+    self._serialize(write, 0, True)
+
+  # ---------------------------------------------------
+  def _serialize(self, write, indent_level, opening):
+    """
+    helper function for serialize, writes the opening tag of this node if
+    'opening' is True, then the children and the closing tag
+    """
+    if opening:
+      write(openTag(self, indent_level))
+      write('\n')
+    # (node, its indent level, iterator over the children still to write)
+    stack = [(self, indent_level, iter(self.children))]
+    while stack:
+      node, level, children = stack[-1]
+      for child in children:
+        write(openTag(child, level + 1))
+        stack.append((child, level + 1, iter(child.children)))
+        break
+      else:
+        stack.pop()
+        if node.children:
+          write('\n' + level*'\t' + '</%s>' % node.name)
         else:
-           parsed_output += '</%s>' % (self.name)
-        
-        return parsed_output
-    
+          write('</%s>' % node.name)
+
+# ---------------------------------
+def openTag(node, indent_level):
+  """
+  returns the indented, escaped opening tag and text of 'node' as written by
+  Node.serialize
+  """
+  parts = ['\n', indent_level*'\t', '<%s ' % node.name]
+  if node.attrs:
+    for attr in node.attrs.keys():
+      parts.append('%s="%s" ' % (attr, escape(node.attrs[attr], {'"': '&quot;'})))
+  parts.append('>')
+  if node.text:
+    parts.append(escape(node.text.strip()))
+  return ''.join(parts)
+
+# shared result of named() for names without children
+NONE = ()
+
+# axes of the steps of a query
+SELF, CHILD, DESCENDANT = range(3)
+
+QUERY_STEP = re.compile(r"\s*(\*|[^\[\]/\s]+)\s*((?:\[[^\]]*\]\s*)*)")
+QUERY_PREDICATE = re.compile(r"\[\s*@([^\s=\]]+)\s*"
+                             r"(?:=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\]]*?))\s*)?\]\s*")
+
+# compiled queries, by path
+QUERIES = {}
+QUERY_CACHE_SIZE = 1024
+
+# -------------------------
+def compile_query(path):
+  """
+  returns the compiled Query for 'path', from a cache of the queries already
+  compiled. A path is a sequence of steps separated by '/', each step a node
+  name or '*' for any name, optionally followed by predicates on attributes:
+
+    amqp/class[@name=basic]/method[@synchronous]/field
+    class/method[@name="declare-ok"]
+    //rule[@test]
+
+  '[@attr]' requires the attribute, '[@attr=value]' (value optionally quoted)
+  its value. A step preceded by '//' matches at any depth below the nodes of
+  the previous step. Relative paths are evaluated from the node they are given,
+  a leading '/' or '//' starts from the root of its tree (whose name is 'root',
+  see parse)
+  """
+  try:
+    return QUERIES[path]
+  except KeyError:
+    pass
+  query = Query(path)
+  if len(QUERIES) >= QUERY_CACHE_SIZE:
+    QUERIES.clear()
+  QUERIES[path] = query
+  return query
+
+# ---------------
+# ---------------
+class Query:
+  """
+  a compiled path query, see compile_query
+  """
+
+  # ------------------------
+  def __init__(self, path):
+    """
+    compiles 'path' into a list of (axis, name, predicates) steps, name being
+    None for '*' and predicates a list of (attr, value) pairs, value being None
+    when only the presence of the attribute is required
+    """
+    self.path = path
+    self.absolute = path[:1] == "/"
+    self.steps = []
+    if path[:2] == "//":
+      axis, pos = DESCENDANT, 2
+    elif path[:1] == "/":
+      axis, pos = SELF, 1
+    else:
+      axis, pos = CHILD, 0
+    while True:
+      m = QUERY_STEP.match(path, pos)
+      if not m:
+        raise ValueError("invalid query: %r" % (path,))
+      name = m.group(1)
+      if name == "*":
+        name = None
+      self.steps.append((axis, name, self.predicates(m.group(2))))
+      pos = m.end()
+      if pos == len(path):
+        break
+      if path.startswith("//", pos):
+        axis, pos = DESCENDANT, pos + 2
+      elif path.startswith("/", pos):
+        axis, pos = CHILD, pos + 1
+      else:
+        raise ValueError("invalid query: %r" % (path,))
+
+  # ---------------------------------
+  def predicates(self, source):
+    """
+    returns the list of (attr, value) predicates of a step
+    """
+    result = []
+    pos = 0
+    while pos < len(source):
+      m = QUERY_PREDICATE.match(source, pos)
+      if not m:
+        raise ValueError("invalid query: %r" % (self.path,))
+      attr, quoted, single, plain = m.groups()
+      for value in (quoted, single, plain):
+        if value is not None:
+          break
+      result.append((attr, value))
+      pos = m.end()
+    return result
+
+  # -------------------------
+  def evaluate(self, node):
+    """
+    returns the list of nodes matched by the query, evaluated from 'node'
+    """
+    if self.absolute:
+      while node.parent != None:
+        node = node.parent
+    nodes = [node]
+    for axis, name, predicates in self.steps:
+      result = []
+      seen = {}
+      for n in nodes:
+        rest = predicates
+        if axis == CHILD:
+          if predicates and predicates[0][1] is not None:
+            # the first value predicate is answered by the attribute index
+            attr, value = predicates[0]
+            candidates = n.keyed(name, attr).get(value, NONE)
+            rest = predicates[1:]
+          elif name is None:
+            candidates = n.children
+          else:
+            candidates = n.named(name)
+        elif axis == DESCENDANT:
+          candidates = [d for d in n.walk(tag = name) if d is not n]
+        elif name is None or n.name == name:
+          candidates = [n]
+        else:
+          continue
+        for c in candidates:
+          if rest and not matches(c, rest):
+            continue
+          if axis == DESCENDANT:
+            # nested descendants can be reached from several nodes
+            if seen.has_key(c):
+              continue
+            seen[c] = True
+          result.append(c)
+      nodes = result
+    return nodes
+
+  # ----------------------
+  def first(self, node):
+    """
+    returns the first node matched by the query, or None
+    """
+    nodes = self.evaluate(node)
+    if nodes:
+      return nodes[0]
+    return None
+
+# -------------------------------
+def matches(node, predicates):
+  """
+  returns True if the attributes of 'node' satisfy all the (attr, value)
+  'predicates' of a query step
+  """
+  attrs = node.attrs
+  for attr, value in predicates:
+    if not attrs or not attrs.has_key(attr):
+      return False
+    if value is not None and attrs[attr] != value:
+      return False
+  return True
+
 # -----------------------------
 # -----------------------------
 class Builder(ContentHandler):
@@ -247,12 +542,15 @@ class Builder(ContentHandler):
   ContentHandler class which handles the creation of the tree representation of the xml doc
   """
 
-  # -------------------------------- 
-  def __init__(self, start = None):
+  # ----------------------------------------------
+  def __init__(self, start = None, prune = None):
     """
     initialization...
     """
     self.node = start
+    self.prune = prune
+    # depth within an element being left out
+    self.skipping = 0
 
   # ------------------------------------
   def __setitem__(self, element, type):
@@ -267,23 +565,436 @@ class Builder(ContentHandler):
     called by the sax parser whenever start of an element is encountered
     creates a new Node object of the tag encountered
     """
-    self.node = Node(name, attrs, None, self.node)
+    if self.skipping:
+      self.skipping += 1
+    elif self.prune and self.prune(self.node, name, attrs):
+      self.skipping = 1
+    else:
+      self.node = Node(name, attrs, None, self.node)
 
   # --------------------------
   def endElement(self, name):
     """
     called by the sax parser whenever end of an element is encountered
     """
-    self.node = self.node.parent
+    if self.skipping:
+      self.skipping -= 1
+    else:
+      self.node = self.node.parent
 
   # -----------------------------
   def characters(self, content):
     """
     assigns the content of the xml tag to the Node object
     """
+    if self.skipping:
+      return
     if self.node.text == None:
       self.node.text = content
     else:
       self.node.text += content
       
 
+
+# ---------------------
+# ---------------------
+class CompactTree:
+  """
+  a whole document kept in flat arrays rather than one object per element.
+  Elements are numbered in document order, the root (named 'root' like the
+  root Node returned by parse) being 0. For element i:
+
+    names[name[i]]                    -- its name
+    parent[i]                         -- the number of its parent, -1 for the root
+    children[first[i]:first[i + 1]]   -- the numbers of its children, in order
+    position[i]                       -- its position among its siblings
+    attributes[attrs[i]]              -- a tuple of its (name, value) pairs,
+                                         -1 for the root which has none
+    text[text_start[i]:text_end[i]]   -- its text, -1 if it has none
+
+  Equal strings and equal attribute tuples are only stored once. The
+  elements are accessed through CompactNode objects, created on demand
+  """
+
+  # ------------------
+  def __init__(self):
+    """
+    initializations, the tree holds only the root until built by a
+    CompactBuilder
+    """
+    self.names = []
+    self.name_ids = {}
+    self.strings = {}
+    self.attributes = []
+    self.attribute_ids = {}
+    self.name = array("i")
+    self.parent = array("i")
+    self.attrs = array("i")
+    self.first = array("i")
+    self.children = array("i")
+    self.position = array("i")
+    self.text = u""
+    self.text_start = array("i")
+    self.text_end = array("i")
+    # attribute value indexes, see CompactNode.keyed
+    self.index = {}
+    self.add("root", None, -1)
+
+  # ---------------------
+  def __len__(self):
+    """
+    returns the number of elements, the root included
+    """
+    return len(self.name)
+
+  # -----------------------
+  def node(self, i):
+    """
+    returns the CompactNode for element 'i'
+    """
+    return CompactNode(self, i)
+
+  # ------------------------------------
+  def add(self, name, attrs, parent):
+    """
+    appends an element named 'name' with the SAX attributes 'attrs' (or None)
+    below element 'parent' and returns its number
+    """
+    strings = self.strings
+    try:
+      nid = self.name_ids[name]
+    except KeyError:
+      nid = self.name_ids[name] = len(self.names)
+      self.names.append(strings.setdefault(name, name))
+    if attrs is None:
+      aid = -1
+    else:
+      key = tuple([(strings.setdefault(k, k), strings.setdefault(v, v))
+                   for k, v in attrs.items()])
+      try:
+        aid = self.attribute_ids[key]
+      except KeyError:
+        aid = self.attribute_ids[key] = len(self.attributes)
+        self.attributes.append(key)
+    self.name.append(nid)
+    self.parent.append(parent)
+    self.attrs.append(aid)
+    return len(self.name) - 1
+
+  # ---------------------------
+  def finish(self, chunks):
+    """
+    lays out the child ranges and the text once all the elements have been
+    added. 'chunks' maps element numbers to the list of their text fragments
+    """
+    n = len(self.name)
+    # elements are numbered in document order, so placing each one after the
+    # siblings placed before it keeps the children in order
+    counts = [0] * (n + 1)
+    for p in self.parent[1:]:
+      counts[p + 1] += 1
+    for i in xrange(n):
+      counts[i + 1] += counts[i]
+    self.first = array("i", counts)
+    fill = counts[:-1]
+    children = [0] * (n - 1)
+    position = [0] * n
+    for i in xrange(1, n):
+      p = self.parent[i]
+      children[fill[p]] = i
+      position[i] = fill[p] - counts[p]
+      fill[p] += 1
+    self.children = array("i", children)
+    self.position = array("i", position)
+
+    start = [-1] * n
+    end = [-1] * n
+    pieces = []
+    offset = 0
+    for i in sorted(chunks.keys()):
+      text = "".join(chunks[i])
+      start[i] = offset
+      offset += len(text)
+      end[i] = offset
+      pieces.append(text)
+    self.text = u"".join(pieces)
+    self.text_start = array("i", start)
+    self.text_end = array("i", end)
+    self.strings = {}
+
+# ------------------------------------
+# ------------------------------------
+class CompactBuilder(ContentHandler):
+  """
+  ContentHandler filling a CompactTree, see Builder
+  """
+
+  # ---------------------------------------
+  def __init__(self, tree, prune = None):
+    """
+    initialization...
+    """
+    self.tree = tree
+    self.prune = prune
+    self.current = 0
+    self.skipping = 0
+    self.chunks = {}
+
+  # -----------------------------------
+  def startElement(self, name, attrs):
+    """
+    adds the element to the tree, unless it is pruned
+    """
+    if self.skipping:
+      self.skipping += 1
+    elif self.prune and self.prune(self.tree.node(self.current), name, attrs):
+      self.skipping = 1
+    else:
+      self.current = self.tree.add(name, attrs, self.current)
+
+  # --------------------------
+  def endElement(self, name):
+    """
+    goes back up to the parent element
+    """
+    if self.skipping:
+      self.skipping -= 1
+    else:
+      self.current = self.tree.parent[self.current]
+
+  # -----------------------------
+  def characters(self, content):
+    """
+    collects the text of the current element
+    """
+    if self.skipping:
+      return
+    try:
+      self.chunks[self.current].append(content)
+    except KeyError:
+      self.chunks[self.current] = [content]
+
+  # -----------------------
+  def endDocument(self):
+    """
+    lays out the tree
+    """
+    self.tree.finish(self.chunks)
+    self.chunks = None
+
+# ---------------------------
+# ---------------------------
+class CompactNode(object):
+  """
+  lightweight view of one element of a CompactTree, with the interface of
+  Node. Views are created on demand, so two views of the same element are
+  equal but not necessarily the same object
+  """
+
+  __slots__ = ["tree", "i"]
+
+  # ---------------------------
+  def __init__(self, tree, i):
+    """
+    initializations...
+    """
+    self.tree = tree
+    self.i = i
+
+  # ------------------
+  def getName(self):
+    """
+    returns the name of the element
+    """
+    return self.tree.names[self.tree.name[self.i]]
+
+  # -------------------
+  def getAttrs(self):
+    """
+    returns the attributes of the element as SAX attributes, or None for the
+    root
+    """
+    aid = self.tree.attrs[self.i]
+    if aid < 0:
+      return None
+    return AttributesImpl(dict(self.tree.attributes[aid]))
+
+  # ------------------
+  def getText(self):
+    """
+    returns the text of the element, or None
+    """
+    start = self.tree.text_start[self.i]
+    if start < 0:
+      return None
+    return self.tree.text[start:self.tree.text_end[self.i]]
+
+  # --------------------
+  def getParent(self):
+    """
+    returns the parent of the element, or None for the root
+    """
+    p = self.tree.parent[self.i]
+    if p < 0:
+      return None
+    return CompactNode(self.tree, p)
+
+  # ----------------------
+  def getChildren(self):
+    """
+    returns a new list of the children of the element
+    """
+    tree = self.tree
+    return [CompactNode(tree, c)
+            for c in tree.children[tree.first[self.i]:tree.first[self.i + 1]]]
+
+  name = property(getName)
+  attrs = property(getAttrs)
+  text = property(getText)
+  parent = property(getParent)
+  children = property(getChildren)
+
+  # ------------------------
+  def __eq__(self, other):
+    """
+    views are equal if they are of the same element
+    """
+    return isinstance(other, CompactNode) and self.tree is other.tree and \
+           self.i == other.i
+
+  # ------------------------
+  def __ne__(self, other):
+    """
+    see __eq__
+    """
+    return not self.__eq__(other)
+
+  # ------------------
+  def __hash__(self):
+    """
+    views of the same element hash alike
+    """
+    return hash(self.i)
+
+  # ----------------------
+  def __getstate__(self):
+    """
+    needed to pickle a slotted object
+    """
+    return (self.tree, self.i)
+
+  # -----------------------------
+  def __setstate__(self, state):
+    """
+    see __getstate__
+    """
+    self.tree, self.i = state
+
+  # ---------------------------
+  def __getstr__(self, name):
+    """
+    returns the value of the attribute '@name', or the list of children named
+    'name'
+    """
+    tree = self.tree
+    if name[:1] == "@":
+      aid = tree.attrs[self.i]
+      if aid >= 0:
+        attr = name[1:]
+        for k, v in tree.attributes[aid]:
+          if k == attr:
+            return v
+      raise KeyError(name[1:])
+    return self.named(name)
+
+  # ---------------------------
+  def __getint__(self, index):
+    """
+    returns the child indexed by 'index'
+    """
+    tree = self.tree
+    children = tree.children[tree.first[self.i]:tree.first[self.i + 1]]
+    return CompactNode(tree, children[index])
+
+  # -----------------------
+  def named(self, name):
+    """
+    returns a new list of the children named 'name'
+    """
+    tree = self.tree
+    nid = tree.name_ids.get(name)
+    if nid is None:
+      return []
+    names = tree.name
+    return [CompactNode(tree, c)
+            for c in tree.children[tree.first[self.i]:tree.first[self.i + 1]]
+            if names[c] == nid]
+
+  # ----------------------------
+  def keyed(self, name, attr):
+    """
+    as Node.keyed, the index being kept by the tree
+    """
+    key = (self.i, name, attr)
+    try:
+      return self.tree.index[key]
+    except KeyError:
+      pass
+    if name is None:
+      children = self.children
+    else:
+      children = self.named(name)
+    tree = self.tree
+    result = {}
+    for child in children:
+      aid = tree.attrs[child.i]
+      if aid < 0:
+        continue
+      for k, v in tree.attributes[aid]:
+        if k == attr:
+          try:
+            result[v].append(child)
+          except KeyError:
+            result[v] = [child]
+          break
+    tree.index[key] = result
+    return result
+
+  # ---------------
+  def index(self):
+    """
+    returns the position of the node in the children list of it's parent
+    """
+    return self.tree.position[self.i]
+
+  # --------------
+  def path(self):
+    """
+    returns the path to the node, starting from the root e.g. /root/a/b/c
+    """
+    tree = self.tree
+    names = []
+    i = self.i
+    while i >= 0:
+      names.append(tree.names[tree.name[i]])
+      i = tree.parent[i]
+    names.reverse()
+    return "/" + "/".join(names)
+
+  # ------------------
+  def __iter__(self):
+    """
+    iterates over the children
+    """
+    return iter(self.getChildren())
+
+  # the rest only relies on the above, and is shared with Node
+  __getitem__ = Node.__dict__["__getitem__"]
+  get = Node.__dict__["get"]
+  get_bool = Node.__dict__["get_bool"]
+  has = Node.__dict__["has"]
+  query = Node.__dict__["query"]
+  walk = Node.__dict__["walk"]
+  prettyPrint = Node.__dict__["prettyPrint"]
+  serialize = Node.__dict__["serialize"]
+  _serialize = Node.__dict__["_serialize"]
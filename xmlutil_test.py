@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import unittest, pickle
+from cStringIO import StringIO
+from qpid import xmlutil
+from qpid.testlib import SPEC_XML, run
+
+__doc__ = """
+
+    Unit tests for qpid/xmlutil.py: parsing, walking, querying and serializing xml trees
+
+    To run standalone:
+    -------------------
+
+        python xmlutil_test.py
+
+        A brief output will be printed on screen, the verbose output is placed in a file called
+        xmlutil_unit_test_output.txt.
+
+"""
+
+# --------------------------------------
+# --------------------------------------
+class XmlUtilTestCase(unittest.TestCase):
+
+    """
+    Handles the xml trees the spec is loaded from (qpid/xmlutil.py)
+    """
+
+    DOC = '<a x="1"><b>t&amp;</b><c y="q&quot;"><b n="2"/><d/></c></a>'
+
+    # ---------------
+    def setUp(self):
+        """
+        parses a small document
+        """
+        self.doc = xmlutil.parse(StringIO(self.DOC))
+
+    # ---------------------------------
+    def test_walk_and_path(self):
+        """
+        walks go through the tree in either order without recursing, paths are cached
+        """
+        self.failUnlessEqual([n.name for n in self.doc.walk()], ['root', 'a', 'b', 'c', 'b', 'd'], 'pre order FAILED...')
+        self.failUnlessEqual([n.name for n in self.doc.walk(order='post')], ['b', 'b', 'd', 'c', 'a', 'root'], 'post order FAILED...')
+        self.failUnlessEqual([n.get('@n') for n in self.doc.walk(tag='b')], [None, '2'], 'tag FAILED...')
+        self.failUnlessEqual([n.name for n in self.doc.walk(prune=lambda n: n.name == 'c')], ['root', 'a', 'b', 'c'], 'prune FAILED...')
+        self.failUnlessRaises(ValueError, list, self.doc.walk(order='in'))
+        node = self.doc['a'][0]['c'][0]['b'][0]
+        self.failUnlessEqual(node.path(), '/root/a/c/b', 'path FAILED...')
+        self.failUnless(node.path() is node.path(), 'path cache FAILED...')
+        deep = xmlutil.Node('root')
+        for i in range(5000):
+            deep = xmlutil.Node('n', None, None, deep)
+        self.failUnlessEqual(len(list(deep.parent.parent.walk(order='post'))), 3, 'deep walk FAILED...')
+        self.failUnlessEqual(len(deep.path()), len('/root') + 5000 * 2, 'deep path FAILED...')
+        root = deep
+        while root.parent != None:
+            root = root.parent
+        self.failUnlessEqual(len(list(root.walk())), 5001, 'deep tree walk FAILED...')
+
+    # ---------------------------------
+    def test_serialize(self):
+        """
+        serialize writes indented, escaped xml in one pass, the same as prettyPrint
+        """
+        out = StringIO()
+        self.doc.serialize(out)
+        expected = '<?xml version = "1.0"?>\n\n<root >\n\n\t<a x="1" >\n\t\t<b >t&amp;</b>\n\t\t<c y="q&quot;" >' \
+                   '\n\t\t\t<b n="2" ></b>\n\t\t\t<d ></d>\n\t\t</c>\n\t</a>\n</root>'
+        self.failUnlessEqual(out.getvalue(), expected, 'serialize FAILED...')
+        self.failUnlessEqual(self.doc.prettyPrint(), expected, 'prettyPrint FAILED...')
+        c = self.doc['a'][0]['c'][0]
+        self.failUnlessEqual(self.doc.createTag(c.name, c.attrs, ' x ', 2), '\n\t\t<c y="q&quot;" >x', 'createTag FAILED...')
+        self.failUnlessEqual(self.doc.createTag('e', None, None, 0), '\n<e >', 'createTag without attributes FAILED...')
+        self.failUnlessEqual(xmlutil.parse(StringIO(out.getvalue()))['root'][0]['a'][0]['c'][0]['@y'], 'q"', 'escaped attribute FAILED...')
+        doc = xmlutil.parse(StringIO('<a>caf\xc3\xa9</a>'))
+        out = StringIO()
+        doc.serialize(out, 'utf8')
+        self.failUnless(out.getvalue().endswith('<a >caf\xc3\xa9</a>\n</root>'), 'encoding FAILED...')
+
+    # ---------------------------------
+    def test_query(self):
+        """
+        queries select nodes by name, attributes and depth, and are compiled once
+        """
+        spec = xmlutil.parse(StringIO(SPEC_XML))
+        names = lambda nodes: [n['@name'] for n in nodes]
+        self.failUnlessEqual(names(spec.query('amqp/class')), ['channel', 'queue', 'basic', 'test'], 'child steps FAILED...')
+        self.failUnlessEqual(names(spec.query('amqp/class[@name=basic]/method')), ['publish', 'ack'], 'value predicate FAILED...')
+        self.failUnlessEqual(names(spec.query('amqp/class/method[@content]')), ['publish'], 'presence predicate FAILED...')
+        self.failUnlessEqual(names(spec.query('amqp/class/method[@synchronous="1"][@index=\'11\']')), ['open-ok', 'declare-ok'], 'quoted predicates FAILED...')
+        self.failUnlessEqual(len(spec.query('//field[@type=bit]')), 18, 'descendant step FAILED...')
+        channel = spec.query('amqp/class[@name=channel]')[0]
+        self.failUnlessEqual(names(channel.query('*[@name=close]/field')), ['reply code', 'reply text', 'class id', 'method id'], 'relative query FAILED...')
+        self.failUnlessEqual(names(channel.query('/root/amqp/domain')), ['queue name', 'reply code'], 'absolute query FAILED...')
+        self.failUnlessEqual(len(channel.query('//doc')), 3, 'absolute descendant FAILED...')
+        self.failUnlessEqual(channel.query('method[@name=nonesuch]'), [], 'no match FAILED...')
+        query = xmlutil.compile_query('amqp/constant')
+        self.failUnless(xmlutil.compile_query('amqp/constant') is query, 'query cache FAILED...')
+        self.failUnlessEqual(query.first(spec)['@value'], '1', 'first FAILED...')
+        for bad in ('a[name=x]', 'a//', 'a[@x'):
+            self.failUnlessRaises(ValueError, xmlutil.compile_query, bad)
+
+    # ---------------------------------
+    def test_compact(self):
+        """
+        a CompactTree gives the same names, attributes, text, paths, queries and xml as a tree of Nodes
+        """
+        node = xmlutil.parse(StringIO(SPEC_XML))
+        compact = xmlutil.parse(StringIO(SPEC_XML), compact=True)
+        describe = lambda root: [(n.name, sorted((n.attrs or {}).items()), n.text, n.path(), n.index()) for n in root.walk()]
+        self.failUnlessEqual(describe(compact), describe(node), 'compact tree FAILED...')
+        path = 'amqp/class[@name=queue]/method/field[@type=bit]'
+        self.failUnlessEqual([n.path() for n in compact.query(path)], [n.path() for n in node.query(path)], 'compact query FAILED...')
+        self.failUnlessEqual(compact.prettyPrint(), node.prettyPrint(), 'compact serialize FAILED...')
+        field = compact.query(path)[0]
+        self.failUnless(field == compact.query(path)[0] and field.parent == compact.query(path)[1].parent, 'compact node equality FAILED...')
+        self.failUnlessEqual(field['@name'], 'passive', 'compact attribute FAILED...')
+        self.failUnlessRaises(KeyError, field.__getitem__, '@nonesuch')
+        self.failUnlessEqual(pickle.loads(pickle.dumps(field, 2)).path(), field.path(), 'compact pickle FAILED...')
+        pruned = xmlutil.parse(StringIO(SPEC_XML), lambda parent, name, attrs: name == 'doc', True)
+        self.failUnlessEqual(pruned.query('//doc'), [], 'compact prune FAILED...')
+
+# ---------------------------
+# ---------------------------
+if __name__ == '__main__':
+    run([XmlUtilTestCase], 'xmlutil_unit_test_output.txt')